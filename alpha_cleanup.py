@@ -0,0 +1,117 @@
+"""
+Alpha Cleanup
+Pre-encode pass that removes invisible detail from RGBA frames: colour left
+under fully transparent pixels is zeroed, and near-transparent / near-opaque
+alpha noise is snapped to 0 / 255. Encoders then spend neither bits nor time
+on data nobody can see.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:  # pragma: no cover - optional dependencies
+    np = None
+    Image = None
+
+from png_probe import ALPHA_COLOR_TYPES, PNGProbeError, read_png_header
+
+# Alpha at or below LOW becomes 0, at or above HIGH becomes 255
+DEFAULT_ALPHA_LOW = 2
+DEFAULT_ALPHA_HIGH = 253
+
+# Cleaned frames are only read back by FFmpeg, so favour write speed
+_PNG_COMPRESS_LEVEL = 1
+
+
+def _require_dependencies():
+    if np is None or Image is None:
+        raise RuntimeError('Alpha cleanup requires NumPy and Pillow (pip install numpy Pillow)')
+
+
+def _place(path: str, output_path: str) -> None:
+    """Put an unchanged frame at output_path (hard link, or a copy across filesystems)"""
+    try:
+        os.link(path, output_path)
+    except OSError:
+        shutil.copyfile(path, output_path)
+
+
+def clean_frame(path: str, output_path: Optional[str] = None, low: int = DEFAULT_ALPHA_LOW,
+                high: int = DEFAULT_ALPHA_HIGH) -> bool:
+    """
+    Clean one frame, writing it to output_path (default: replace path)
+
+    Only 8-bit frames with an alpha channel are touched; 16-bit frames are
+    left alone rather than being narrowed by Pillow. The replacement is
+    written to a new file and renamed over the target, so hard-linked copies
+    of the original (e.g. in the frame store) are never modified. Returns
+    whether the frame changed.
+    """
+    output_path = output_path or path
+    try:
+        header = read_png_header(path)
+    except PNGProbeError:
+        header = None
+    if not header or header['color_type'] not in ALPHA_COLOR_TYPES or header['bit_depth'] != 8:
+        if output_path != path:
+            _place(path, output_path)
+        return False
+
+    with Image.open(path) as img:
+        mode = img.mode
+        pixels = np.array(img)
+
+    alpha = pixels[..., -1]
+    transparent = alpha <= low
+    opaque = alpha >= high
+    changed = bool(
+        np.any(alpha[transparent]) or np.any(alpha[opaque] != 255) or np.any(pixels[transparent, :-1])
+    )
+    if not changed:
+        if output_path != path:
+            _place(path, output_path)
+        return False
+
+    alpha[transparent] = 0
+    alpha[opaque] = 255
+    pixels[transparent, :-1] = 0
+
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output_path)), suffix='.png')
+    os.close(fd)
+    try:
+        Image.fromarray(pixels, mode).save(temp_path, compress_level=_PNG_COMPRESS_LEVEL)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return True
+
+
+def clean_frames(paths: Iterable[str], output_paths: Optional[Iterable[str]] = None,
+                 low: int = DEFAULT_ALPHA_LOW, high: int = DEFAULT_ALPHA_HIGH,
+                 max_workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Clean a sequence in parallel (in place unless output_paths is given)
+    Pillow decoding/encoding and NumPy masking release the GIL, so threads scale.
+
+    Returns {'frames', 'changed', 'seconds'}.
+    """
+    _require_dependencies()
+    if not 0 <= low < high <= 255:
+        raise ValueError('Alpha thresholds must satisfy 0 <= low < high <= 255')
+
+    start = time.time()
+    paths = list(paths)
+    targets: List[Optional[str]] = list(output_paths) if output_paths is not None else [None] * len(paths)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        changed = list(executor.map(lambda p: clean_frame(p[0], p[1], low, high), zip(paths, targets)))
+
+    return {'frames': len(paths), 'changed': sum(changed), 'seconds': time.time() - start}
@@ -0,0 +1,110 @@
+"""
+Alpha-Aware Auto-Crop
+Finds the union bounding box of visible pixels across a PNG sequence so that
+fully transparent borders can be cropped away before encoding
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:  # pragma: no cover - optional dependencies
+    np = None
+    Image = None
+
+BBox = Tuple[int, int, int, int]  # left, top, right, bottom (right/bottom exclusive)
+
+
+def _require_dependencies():
+    if np is None or Image is None:
+        raise RuntimeError('Auto-crop requires NumPy and Pillow (pip install numpy Pillow)')
+
+
+def frame_alpha_bbox(path: str) -> Tuple[Optional[BBox], Tuple[int, int]]:
+    """
+    Bounding box of non-zero alpha in a single frame
+
+    Returns (bbox, (width, height)). bbox is None for a fully transparent
+    frame; frames without an alpha channel are treated as fully visible.
+    """
+    with Image.open(path) as img:
+        size = img.size
+        if img.mode not in ('RGBA', 'LA', 'PA') and 'transparency' not in img.info:
+            return (0, 0, size[0], size[1]), size
+        if 'A' not in img.getbands():
+            img = img.convert('RGBA')
+        alpha = np.asarray(img.getchannel('A'))
+
+    # Collapse to per-row / per-column visibility, then take the extremes
+    rows = np.flatnonzero(alpha.any(axis=1))
+    if rows.size == 0:
+        return None, size
+    cols = np.flatnonzero(alpha.any(axis=0))
+    return (int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1), size
+
+
+def union_alpha_bbox(paths: Iterable[str], max_workers: Optional[int] = None) -> Tuple[Optional[BBox], Tuple[int, int]]:
+    """
+    Union bounding box of visible pixels across all frames, computed in parallel
+    Pillow decoding and NumPy reductions release the GIL, so threads scale.
+    """
+    _require_dependencies()
+    paths = list(paths)
+    if not paths:
+        raise ValueError('No frames to analyse')
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results: List[Tuple[Optional[BBox], Tuple[int, int]]] = list(executor.map(frame_alpha_bbox, paths))
+
+    size = results[0][1]
+    boxes = [bbox for bbox, _ in results if bbox is not None]
+    if not boxes:
+        return None, size
+
+    return (
+        min(b[0] for b in boxes),
+        min(b[1] for b in boxes),
+        max(b[2] for b in boxes),
+        max(b[3] for b in boxes),
+    ), size
+
+
+def compute_crop(paths: Iterable[str], max_workers: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Crop rectangle covering every visible pixel of the sequence
+
+    Edges are aligned to even pixels so 4:2:0 encoders don't lose a chroma
+    row. Returns None when cropping would not remove anything (or when every
+    frame is fully transparent).
+    Result keys: x, y, width, height, source_width, source_height.
+    """
+    bbox, (source_width, source_height) = union_alpha_bbox(paths, max_workers)
+    if bbox is None:
+        return None
+
+    left, top, right, bottom = bbox
+    left -= left % 2
+    top -= top % 2
+    right = min(source_width, right + right % 2)
+    bottom = min(source_height, bottom + bottom % 2)
+
+    if (left, top, right, bottom) == (0, 0, source_width, source_height):
+        return None
+
+    return {
+        'x': left,
+        'y': top,
+        'width': right - left,
+        'height': bottom - top,
+        'source_width': source_width,
+        'source_height': source_height,
+    }
+
+
+def crop_filter(crop: Optional[Dict[str, Any]]) -> Optional[str]:
+    """FFmpeg crop filter expression for a compute_crop() result"""
+    if not crop:
+        return None
+    return f"crop={crop['width']}:{crop['height']}:{crop['x']}:{crop['y']}"
@@ -15,6 +15,8 @@ from pathlib import Path
 import threading
 import time
 
+from encoding_profiles import build_codec_args, output_extension
+
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max upload
 app.config['UPLOAD_FOLDER'] = tempfile.gettempdir()
@@ -109,12 +111,7 @@ def process_job(job_id, fps, codec, quality):
             os.rename(old_path, new_path)
         
         # Determine output format
-        if codec in ['vp9', 'vp8']:
-            output_ext = 'webm'
-        elif codec == 'gif':
-            output_ext = 'gif'
-        else:
-            output_ext = 'mov'
+        output_ext = output_extension(codec)
         
         output_file = os.path.join(job['dir'], f'output.{output_ext}')
         
@@ -151,20 +148,8 @@ def process_job(job_id, fps, codec, quality):
                 '-gifflags', '+transdiff',
                 output_file
             ]
-        elif codec == 'vp9':
-            cmd.extend(['-c:v', 'libvpx-vp9', '-pix_fmt', 'yuva420p'])
-            if quality == 'best':
-                cmd.extend(['-deadline', 'best', '-cpu-used', '0'])
-            elif quality == 'good':
-                cmd.extend(['-deadline', 'good', '-cpu-used', '1'])
-            else:
-                cmd.extend(['-deadline', 'realtime', '-cpu-used', '5'])
-        elif codec == 'vp8':
-            cmd.extend(['-c:v', 'libvpx', '-pix_fmt', 'yuva420p'])
-        elif codec == 'prores':
-            cmd.extend(['-c:v', 'prores_ks', '-profile:v', '4444', '-pix_fmt', 'yuva444p10le'])
-        elif codec == 'qtrle':
-            cmd.extend(['-c:v', 'qtrle'])
+        else:
+            cmd.extend(build_codec_args(codec, quality))
         
         if codec != 'gif':
             cmd.append(output_file)
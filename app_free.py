@@ -8,8 +8,14 @@ from flask import Flask, render_template, jsonify, request
 import os
 from datetime import datetime
 
+from static_assets import StaticAssets
+
 app = Flask(__name__)
 
+# Hashed URLs and precompressed variants for the FFmpeg.wasm bundle and app assets
+static_assets = StaticAssets(app.static_folder, os.getenv('STATIC_CACHE_FOLDER'))
+static_assets.init_app(app)
+
 @app.after_request
 def add_security_headers(response):
     """Add security headers for SharedArrayBuffer support (required for FFmpeg.wasm)"""
@@ -4,15 +4,15 @@ Consolidated Transparent Video Creator
 Modern Flask backend with feature flags, proper error handling, and security
 """
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, redirect, render_template, request, jsonify, send_file
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from werkzeug.utils import secure_filename
 import os
+import json
 import tempfile
 import shutil
-import subprocess
 import uuid
 import logging
 import time
@@ -22,6 +22,21 @@ from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
 
 from config import Config
+from cost_model import OVERHEAD_SECONDS, CostModel, count_runs, job_features
+from encode_pipeline import (encode_chunk, job_snapshot, join_chunks, output_storage, rename_frames, run_job,
+                             run_transcode)
+from encoding_profiles import normalize_codec, normalize_quality, streaming_args
+from ffmpeg_capabilities import capability_summary, get_capabilities, has_codec, resolve_codec
+from frame_dedupe import frame_digest
+from frame_store import FrameStore, is_digest
+from job_queue import CHUNKED, TERMINAL_STATES, JobQueue
+from output_storage import parse_range
+from png_probe import PNGProbeError, probe_sequence, read_png_header
+from segments import is_segmentable, segment_ranges
+from staging import StagingArea, default_memory_root
+from static_assets import StaticAssets
+from target_size import TARGET_SIZE_CODECS
+from transcode import SOURCE_EXTENSIONS, plan_transcode, probe_source
 
 # Configure logging
 logging.basicConfig(
@@ -42,6 +57,10 @@ limiter = Limiter(
     storage_uri="memory://"
 )
 
+# Hashed URLs and precompressed variants for everything under static/
+static_assets = StaticAssets(app.static_folder, Config.STATIC_CACHE_FOLDER)
+static_assets.init_app(app)
+
 # Global state
 processing_jobs: Dict[str, Dict[str, Any]] = {}
 app_stats = {
@@ -49,26 +68,74 @@ app_stats = {
     'total_jobs': 0,
     'active_jobs': 0,
     'completed_jobs': 0,
-    'failed_jobs': 0
+    'failed_jobs': 0,
+    'cancelled_jobs': 0
 }
 
+staging = StagingArea(
+    disk_root=Config.UPLOAD_FOLDER,
+    memory_root=Config.STAGING_MEMORY_FOLDER or default_memory_root(),
+    memory_budget_bytes=Config.STAGING_MEMORY_BUDGET_MB * 1024 * 1024
+)
+
+# Shared queue for standalone encode workers (None: encode in-process)
+job_queue: Optional[JobQueue] = JobQueue(
+    Config.JOB_QUEUE_PATH,
+    lease_seconds=Config.JOB_LEASE_SECONDS,
+    max_attempts=Config.JOB_MAX_ATTEMPTS
+) if Config.JOB_QUEUE_PATH else None
+
+# Content-addressed store shared by every job's frames (None: disabled)
+frame_store: Optional[FrameStore] = FrameStore(
+    Config.FRAME_STORE_FOLDER,
+    max_bytes=Config.FRAME_STORE_BUDGET_MB * 1024 * 1024
+) if Config.FRAME_STORE_BUDGET_MB > 0 else None
+if frame_store and not frame_store.same_filesystem(staging.disk_root):
+    logger.warning(
+        "FRAME_STORE_FOLDER and UPLOAD_FOLDER are on different filesystems; "
+        "frames will be copied instead of hard-linked"
+    )
+
+# Encode-time predictions, calibrated from this deployment's completed jobs
+cost_model = CostModel(Config.COST_MODEL_PATH or None)
+
+# Probe FFmpeg's encoders at startup (re-probed only when the binary changes)
+ffmpeg_capabilities = get_capabilities(cache_path=Config.FFMPEG_CAPABILITIES_PATH or None)
+if not ffmpeg_capabilities['available']:
+    logger.warning("FFmpeg not found; server-side encodes will fail")
+
 ALLOWED_EXTENSIONS = {'png'}
 
+# Progressive downloads: read size and how often to look for new output
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_POLL_SECONDS = 0.25
+STREAM_MIMETYPES = {'webm': 'video/webm', 'mov': 'video/quicktime'}
+
+# Share of a chunk invocation's time limit planned for encoding; the rest
+# covers cold starts, reading frames from shared storage and the response
+CHUNK_TIME_BUDGET = 0.5
+
+# Web codec names offered as alternatives when a job is rejected
+ADMISSION_ALTERNATIVES = ['vp9', 'webp', 'vp8', 'qtrle', 'prores', 'gif']
+
 def allowed_file(filename: str) -> bool:
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def validate_files(files: List) -> tuple[bool, str, int]:
-    """Validate uploaded files"""
+def validate_files(files: List) -> tuple[bool, str, int, Optional[Dict[str, Any]]]:
+    """
+    Validate uploaded files
+    Also probes the PNG headers, returning the sequence summary on success
+    """
     if not files or files[0].filename == '':
-        return False, 'No files selected', 400
+        return False, 'No files selected', 400, None
 
     valid_files = [f for f in files if f and allowed_file(f.filename)]
     if not valid_files:
-        return False, 'No valid PNG files uploaded', 400
+        return False, 'No valid PNG files uploaded', 400, None
 
     if len(valid_files) > Config.MAX_FRAME_COUNT:
-        return False, f'Too many files. Maximum {Config.MAX_FRAME_COUNT} frames allowed', 400
+        return False, f'Too many files. Maximum {Config.MAX_FRAME_COUNT} frames allowed', 400, None
 
     # Check total file size (approximate)
     total_size = sum(len(f.read()) for f in valid_files if f)
@@ -76,9 +143,15 @@ def validate_files(files: List) -> tuple[bool, str, int]:
         f.seek(0)  # Reset file pointers
 
     if total_size > Config.MAX_CONTENT_LENGTH:
-        return False, f'Total file size exceeds {Config.MAX_FILE_SIZE_MB}MB limit', 400
+        return False, f'Total file size exceeds {Config.MAX_FILE_SIZE_MB}MB limit', 400, None
+
+    # Pre-flight: reject mismatched frame sizes before anything is queued
+    try:
+        probe = probe_sequence(valid_files)
+    except PNGProbeError as e:
+        return False, str(e), 400, None
 
-    return True, 'Valid', 200
+    return True, 'Valid', 200, probe
 
 @app.before_request
 def log_request():
@@ -198,7 +271,9 @@ def health_check():
 @app.route('/api/config')
 def get_config():
     """Return client-safe configuration"""
-    return jsonify(Config.get_client_config())
+    config = Config.get_client_config()
+    config['ffmpeg'] = capability_summary(get_capabilities(cache_path=Config.FFMPEG_CAPABILITIES_PATH or None))
+    return jsonify(config)
 
 @app.route('/api/stats')
 def get_stats():
@@ -210,6 +285,11 @@ def get_stats():
         'active_jobs': app_stats['active_jobs'],
         'completed_jobs': app_stats['completed_jobs'],
         'failed_jobs': app_stats['failed_jobs'],
+        'cancelled_jobs': app_stats['cancelled_jobs'],
+        'staging': staging.stats(),
+        'queue': job_queue.stats() if job_queue else None,
+        'cost_model': cost_model.stats(),
+        'frame_store': frame_store.stats() if frame_store else None,
         'success_rate': (
             app_stats['completed_jobs'] / max(app_stats['total_jobs'], 1) * 100
             if app_stats['total_jobs'] > 0 else 100
@@ -242,70 +322,189 @@ def log_event():
         return jsonify({'error': 'Failed to log event'}), 500
 
 # Server-side processing routes (legacy support)
+@app.route('/upload/check', methods=['POST'])
+@limiter.limit("10 per minute")
+def check_frames():
+    """
+    Hash-first upload, step 1: report which frames the server still needs
+    Takes {"digests": [...]} (SHA-256 hex of each frame file) and returns {"missing": [...]}.
+    """
+    if not Config.ENABLE_FILE_UPLOADS:
+        return jsonify({'error': 'File uploads are disabled'}), 403
+    if not frame_store:
+        return jsonify({'error': 'Frame store is disabled'}), 404
+
+    data = request.get_json() or {}
+    digests = data.get('digests')
+    if not isinstance(digests, list) or not digests or not all(is_digest(d) for d in digests):
+        return jsonify({'error': 'digests must be a list of SHA-256 hex digests'}), 400
+    if len(digests) > Config.MAX_FRAME_COUNT:
+        return jsonify({'error': f'Too many files. Maximum {Config.MAX_FRAME_COUNT} frames allowed'}), 400
+
+    return jsonify({'missing': frame_store.missing(digests)})
+
 @app.route('/upload', methods=['POST'])
 @limiter.limit("5 per minute")
 def upload_files():
-    """Upload files for server-side processing (if enabled)"""
+    """
+    Upload files for server-side processing (if enabled)
+
+    With a 'manifest' form field (JSON list of {"name", "digest"} for every
+    frame, in order) only the frames reported missing by /upload/check need
+    to be sent; the rest are linked from the frame store.
+    """
     if not Config.ENABLE_FILE_UPLOADS:
         return jsonify({
             'error': 'File uploads are disabled. Use client-side processing instead.'
         }), 403
 
+    if 'manifest' in request.form and frame_store:
+        return _upload_from_store(request.form['manifest'], request.files.getlist('files'))
+
     if 'files' not in request.files:
         return jsonify({'error': 'No files provided'}), 400
 
     files = request.files.getlist('files')
-    is_valid, message, status_code = validate_files(files)
+    is_valid, message, status_code, probe = validate_files(files)
 
     if not is_valid:
         return jsonify({'error': message}), status_code
 
-    # Create unique job ID
+    # Create unique job ID and stage it in memory when the budget allows
     job_id = str(uuid.uuid4())
-    job_dir = os.path.join(Config.UPLOAD_FOLDER, f'job_{job_id}')
+    expected_bytes = int((request.content_length or 0) * Config.STAGING_SIZE_FACTOR)
+    job_dir = None
 
     try:
-        os.makedirs(job_dir, exist_ok=True)
+        job_dir, in_memory = staging.allocate(job_id, expected_bytes)
 
-        # Save uploaded files
+        # Save uploaded files, hashing each one so held frames can be
+        # collapsed at encode time
         saved_files = []
+        digests = {}
         for file in files:
             if file and allowed_file(file.filename):
                 filename = secure_filename(file.filename)
                 filepath = os.path.join(job_dir, filename)
+                digests[filename] = frame_digest(file)
                 file.save(filepath)
                 saved_files.append(filename)
 
-        # Sort files to ensure correct order
-        saved_files.sort()
-
-        # Store job info
-        processing_jobs[job_id] = {
-            'status': 'uploaded',
-            'files': saved_files,
-            'dir': job_dir,
-            'progress': 0,
-            'created_at': datetime.utcnow(),
-            'updated_at': datetime.utcnow()
-        }
+                # Make the frame available to later hash-first uploads
+                if frame_store:
+                    frame_store.adopt(filepath, digests[filename])
 
-        app_stats['total_jobs'] += 1
-        app_stats['active_jobs'] += 1
+        if frame_store:
+            frame_store.acquire(job_id, digests.values())
+        return _register_job(job_id, job_dir, in_memory, sorted(saved_files), digests, probe)
 
-        logger.info(f"Job {job_id} created with {len(saved_files)} files")
+    except Exception as e:
+        logger.error(f"Error uploading files: {e}")
+        if job_dir and os.path.exists(job_dir):
+            shutil.rmtree(job_dir)
+        staging.release(job_id)
+        return jsonify({'error': 'Failed to upload files'}), 500
 
-        return jsonify({
-            'job_id': job_id,
-            'file_count': len(saved_files),
-            'files': saved_files[:5] + (['...'] if len(saved_files) > 5 else [])
-        })
+def _upload_from_store(manifest: str, files: List) -> Any:
+    """Hash-first upload, step 2: store the sent frames and link the whole sequence into a job"""
+    try:
+        frames = json.loads(manifest)
+    except ValueError:
+        return jsonify({'error': 'Invalid manifest'}), 400
+
+    if (not isinstance(frames, list) or not frames
+            or not all(isinstance(f, dict) and allowed_file(str(f.get('name', ''))) and is_digest(f.get('digest'))
+                       for f in frames)):
+        return jsonify({'error': 'Manifest must list {"name", "digest"} for every PNG frame'}), 400
+    if len(frames) > Config.MAX_FRAME_COUNT:
+        return jsonify({'error': f'Too many files. Maximum {Config.MAX_FRAME_COUNT} frames allowed'}), 400
+
+    digests = {secure_filename(f['name']): f['digest'] for f in frames}
+    if len(digests) != len(frames):
+        return jsonify({'error': 'Frame names must be unique'}), 400
+
+    job_id = str(uuid.uuid4())
+    job_dir = None
+    try:
+        # Store the frames the client sent; the digest is computed here, so
+        # a client can't place content under someone else's digest
+        for file in files:
+            if file and allowed_file(file.filename):
+                read_png_header(file)
+                frame_store.add(file)
+
+        missing = frame_store.missing(digests.values())
+        if missing:
+            return jsonify({'error': 'Frames missing from the store; upload them', 'missing': missing}), 409
+
+        # Pin before linking so the frames can't be evicted underneath us
+        frame_store.acquire(job_id, digests.values())
+        stored = [frame_store.path(d) for d in dict.fromkeys(digests.values())]
+        total_size = sum(os.path.getsize(path) for path in stored)
+        if total_size > Config.MAX_CONTENT_LENGTH:
+            frame_store.release(job_id)
+            return jsonify({'error': f'Total file size exceeds {Config.MAX_FILE_SIZE_MB}MB limit'}), 400
+
+        probe = probe_sequence(stored)
+        probe['frame_count'] = len(frames)
+
+        # On disk, next to the store, the frames are hard links; in memory
+        # each one would be a copy charged against the staging budget
+        job_dir, in_memory = staging.allocate(
+            job_id, int(total_size * Config.STAGING_SIZE_FACTOR), memory=False
+        )
+        for filename, digest in digests.items():
+            frame_store.link(digest, os.path.join(job_dir, filename))
 
+        return _register_job(job_id, job_dir, in_memory, sorted(digests), digests, probe)
+
+    except PNGProbeError as e:
+        frame_store.release(job_id)
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error uploading files: {e}")
-        if os.path.exists(job_dir):
+        if job_dir and os.path.exists(job_dir):
             shutil.rmtree(job_dir)
+        staging.release(job_id)
+        frame_store.release(job_id)
         return jsonify({'error': 'Failed to upload files'}), 500
 
+def _register_job(job_id: str, job_dir: str, in_memory: bool, saved_files: List[str],
+                  digests: Dict[str, str], probe: Dict[str, Any]) -> Any:
+    """Record a newly uploaded job and build the /upload response"""
+    processing_jobs[job_id] = {
+        'id': job_id,
+        'status': 'uploaded',
+        'files': saved_files,
+        'digests': [digests[f] for f in saved_files],
+        'dir': job_dir,
+        'staging': 'memory' if in_memory else 'disk',
+        'progress': 0,
+        'width': probe['width'],
+        'height': probe['height'],
+        'has_alpha': probe['has_alpha'],
+        'created_at': datetime.utcnow(),
+        'updated_at': datetime.utcnow()
+    }
+
+    app_stats['total_jobs'] += 1
+    app_stats['active_jobs'] += 1
+
+    # Any instance sharing the queue can then start and report the job
+    if job_queue:
+        job_queue.register(job_id, job_snapshot(processing_jobs[job_id]))
+
+    logger.info(f"Job {job_id} created with {len(saved_files)} files ({processing_jobs[job_id]['staging']} staging)")
+
+    return jsonify({
+        'job_id': job_id,
+        'file_count': len(saved_files),
+        'files': saved_files[:5] + (['...'] if len(saved_files) > 5 else []),
+        'width': probe['width'],
+        'height': probe['height'],
+        'has_alpha': probe['has_alpha']
+    })
+
 @app.route('/process/<job_id>', methods=['POST'])
 @limiter.limit("3 per minute")
 def process_video(job_id: str):
@@ -315,28 +514,171 @@ def process_video(job_id: str):
             'error': 'Server-side processing is disabled'
         }), 403
 
-    if job_id not in processing_jobs:
+    job = _find_job(job_id)
+    if job is None:
         return jsonify({'error': 'Job not found'}), 404
-
-    job = processing_jobs[job_id]
     if job['status'] != 'uploaded':
         return jsonify({'error': 'Job already processing or completed'}), 400
+    if job_id not in processing_jobs:
+        # Uploaded through another instance; this one tracks it from here on
+        processing_jobs[job_id] = job
+        app_stats['active_jobs'] += 1
 
     try:
         # Get parameters with validation
         data = request.get_json() or {}
         fps = max(1, min(60, data.get('fps', 24)))  # Clamp FPS
         codec = data.get('codec', 'vp9')
-        quality = data.get('quality', 'good')
+        quality = normalize_quality(data.get('quality'))
+        auto_crop = bool(data.get('auto_crop', False))
+        alpha_cleanup = bool(data.get('alpha_cleanup', Config.ALPHA_CLEANUP))
+        collapse_duplicates = bool(data.get('collapse_duplicates', Config.COLLAPSE_DUPLICATE_FRAMES))
+        preview = bool(data.get('preview', Config.ENABLE_PREVIEW))
+        try:
+            preview_frame_step = int(data.get('preview_frame_step', Config.PREVIEW_FRAME_STEP))
+        except (TypeError, ValueError):
+            preview_frame_step = 0
+        if preview_frame_step <= 0:
+            return jsonify({'error': 'preview_frame_step must be a positive integer'}), 400
 
         # Validate codec
-        if codec not in ['vp9', 'vp8', 'gif', 'prores', 'qtrle']:
+        if codec not in ['vp9', 'vp8', 'gif', 'prores', 'qtrle', 'webp', 'webp_lossless', 'apng', 'ffv1', 'h264_stacked']:
             return jsonify({'error': 'Invalid codec'}), 400
 
+        # Check the codec against this FFmpeg build before any work is queued;
+        # a missing encoder is replaced by the fastest equivalent unless the
+        # client opts out. Workers on other hosts are assumed to match.
+        codec_substituted_from = None
+        capabilities = get_capabilities(cache_path=Config.FFMPEG_CAPABILITIES_PATH or None)
+        if not capabilities['available'] and not job_queue:
+            return jsonify({'error': 'FFmpeg is not installed on the server'}), 503
+        if capabilities['available'] and not has_codec(capabilities, codec):
+            resolved = resolve_codec(capabilities, codec) if data.get('allow_codec_fallback', True) else None
+            if resolved is None:
+                return jsonify({
+                    'error': f'This server\'s FFmpeg cannot encode {codec}',
+                    'available_codecs': [c for c, ok in capability_summary(capabilities)['codecs'].items() if ok]
+                }), 422
+            codec_substituted_from = codec
+            codec = 'prores' if resolved == 'prores_ks' else resolved
+            logger.info(f"Job {job_id}: {codec_substituted_from} encoder missing, using {codec}")
+
+        # Optional maximum output size, replacing the quality tier's rate control
+        target_size = None
+        if data.get('target_size_mb') is not None:
+            try:
+                target_size = int(float(data['target_size_mb']) * 1024 * 1024)
+            except (TypeError, ValueError):
+                target_size = 0
+            if target_size <= 0:
+                return jsonify({'error': 'target_size_mb must be a positive number'}), 400
+            if codec not in TARGET_SIZE_CODECS:
+                return jsonify({
+                    'error': f"target_size_mb is only supported for {', '.join(TARGET_SIZE_CODECS)}"
+                }), 400
+
+        # Optional progressive download while the encode runs
+        stream_output = bool(data.get('stream', False))
+        if stream_output and not streaming_args(codec):
+            return jsonify({'error': 'Streaming is only supported for WebM and MOV outputs'}), 400
+        if stream_output and target_size:
+            return jsonify({'error': 'stream and target_size_mb cannot be combined'}), 400
+
+        # Chunked mode: the job is split into segments that each fit one
+        # short invocation of /process/<job_id>/chunk
+        chunked = bool(Config.CHUNKED_ENCODING and job_queue)
+        if chunked:
+            if not is_segmentable(codec):
+                return jsonify({'error': f'{codec} output cannot be encoded in chunks'}), 400
+            if target_size or stream_output or auto_crop:
+                return jsonify({
+                    'error': 'target_size_mb, stream and auto_crop are not available for chunked encodes'
+                }), 400
+            collapse_duplicates = preview = False
+
+        # Admission control: predict the encode time and downgrade the
+        # quality tier, or reject, jobs that can't finish within the limit
+        downgraded_from = None
+        features = job_features(
+            codec, quality,
+            (collapse_duplicates and count_runs(job.get('digests'))) or len(job['files']),
+            job.get('width'), job.get('height'), job.get('has_alpha', True),
+            preview_frame_step if preview else 0, Config.PREVIEW_WIDTH, bool(target_size)
+        )
+
+        # A preview only arrives ahead of the output when the full encode
+        # is slower than realtime
+        if preview and cost_model.encode_seconds(features) <= len(job['files']) / fps:
+            preview = False
+            features['preview_megapixel_frames'] = 0.0
+
+        estimate = cost_model.estimate(features)
+        if Config.ENABLE_ADMISSION_CONTROL and not chunked:
+            limit = Config.MAX_PROCESSING_TIME_SECONDS * Config.ADMISSION_HEADROOM
+            if estimate > limit and data.get('allow_downgrade', True):
+                for cheaper in cost_model.cheaper_tiers(features):
+                    cheaper_estimate = cost_model.estimate(cheaper)
+                    if cheaper_estimate <= limit:
+                        downgraded_from, quality = quality, cheaper['quality']
+                        features, estimate = cheaper, cheaper_estimate
+                        break
+
+            if estimate > limit:
+                logger.info(f"Rejected job {job_id}: estimated {estimate:.0f}s exceeds {limit:.0f}s")
+                return jsonify({
+                    'error': 'Job would exceed the processing time limit',
+                    'estimated_seconds': round(estimate),
+                    'limit_seconds': Config.MAX_PROCESSING_TIME_SECONDS,
+                    'suggestions': _admission_suggestions(features, limit)
+                }), 422
+
+        job['cost_features'] = features
+        job['estimated_seconds'] = round(estimate, 1)
+
+        params = {
+            'fps': fps,
+            'codec': codec,
+            'quality': quality,
+            'auto_crop': auto_crop,
+            'collapse_duplicates': collapse_duplicates,
+            'preview_frame_step': preview_frame_step if preview else 0,
+            'target_size': target_size,
+            'stream_output': stream_output,
+            'alpha_cleanup': alpha_cleanup
+        }
+
+        if chunked:
+            rename_frames(job)
+            job['status'] = 'queued'
+            job['started_at'] = time.time()
+            job['updated_at'] = datetime.utcnow()
+            ranges = segment_ranges(0, len(job['files']), _chunk_frames(features, len(job['files'])))
+            job_queue.enqueue_chunked(job_id, job_snapshot(job), params, ranges)
+            logger.info(f"Queued job {job_id} as {len(ranges)} chunks with codec {codec}")
+            response = _admission_response('queued', job, quality, downgraded_from)
+            response.update(chunks=len(ranges), chunk_url=f'/process/{job_id}/chunk')
+            if codec_substituted_from:
+                response.update(codec=codec, codec_substituted_from=codec_substituted_from)
+            return jsonify(response)
+
+        # Hand the job to the encode workers when a shared queue is configured
+        if job_queue:
+            job['status'] = 'queued'
+            job['updated_at'] = datetime.utcnow()
+            job_queue.enqueue(job_id, job_snapshot(job), params)
+            logger.info(f"Queued job {job_id} with codec {codec}")
+            response = _admission_response('queued', job, quality, downgraded_from)
+            if stream_output:
+                response['stream_url'] = f'/stream/{job_id}'
+            if codec_substituted_from:
+                response.update(codec=codec, codec_substituted_from=codec_substituted_from)
+            return jsonify(response)
+
         # Start processing in background
         thread = threading.Thread(
             target=process_job,
-            args=(job_id, fps, codec, quality),
+            args=(job_id,),
+            kwargs=params,
             name=f"ProcessJob-{job_id[:8]}"
         )
         thread.daemon = True
@@ -344,186 +686,310 @@ def process_video(job_id: str):
 
         logger.info(f"Started processing job {job_id} with codec {codec}")
 
-        return jsonify({'status': 'processing'})
+        response = _admission_response('processing', job, quality, downgraded_from)
+        if stream_output:
+            response['stream_url'] = f'/stream/{job_id}'
+        if codec_substituted_from:
+            response.update(codec=codec, codec_substituted_from=codec_substituted_from)
+        return jsonify(response)
 
     except Exception as e:
         logger.error(f"Error starting processing for job {job_id}: {e}")
         return jsonify({'error': 'Failed to start processing'}), 500
 
-def process_job(job_id: str, fps: int, codec: str, quality: str):
-    """Process video job with comprehensive error handling"""
+def _chunk_frames(features: Dict[str, Any], frames: int) -> int:
+    """Frames per segment so that one segment encodes within a chunk invocation"""
+    budget = Config.CHUNK_TIME_LIMIT_SECONDS * CHUNK_TIME_BUDGET - OVERHEAD_SECONDS
+    rate = cost_model.rate(features['codec'], features['quality'], features['has_alpha'])
+    seconds_per_frame = rate * features['megapixel_frames'] / max(frames, 1)
+    return max(1, int(budget / seconds_per_frame)) if seconds_per_frame > 0 else frames
+
+@app.route('/process/<job_id>/chunk', methods=['POST'])
+@limiter.limit("120 per minute")
+def process_chunk(job_id: str):
+    """
+    Encode one segment of a chunked job
+
+    Each call is one short unit of work, so serverless deployments can run
+    many in parallel. Clients keep calling until the status is final; the
+    call that finds every segment done joins them into the output. Any
+    instance sharing the job queue and upload folder can serve it.
+    """
+    if not (Config.CHUNKED_ENCODING and job_queue):
+        return jsonify({'error': 'Chunked encoding is disabled'}), 403
+
+    worker_id = f'chunk-{uuid.uuid4().hex[:12]}'
+    claimed = job_queue.claim_chunk(job_id, worker_id)
+    if claimed:
+        job, params = claimed['job']['job'], claimed['job']['params']
+        encoded = encode_chunk(job, params['fps'], params['codec'], params['quality'], claimed['start'],
+                               claimed['count'], claimed['index'], Config.CHUNK_TIME_LIMIT_SECONDS,
+                               params.get('alpha_cleanup', False))
+        job_queue.finish_chunk(job_id, claimed['index'], worker_id, encoded)
+        counts = job_queue.chunk_counts(job_id)
+        if not encoded or counts['done'] < counts['total']:
+            return jsonify({
+                'status': 'processing',
+                'chunk': claimed['index'],
+                'encoded': encoded,
+                'chunks_done': counts['done'],
+                'chunks': counts['total']
+            })
+
+    # No segment left to encode: join them if they are all done
+    record = job_queue.claim_finalize(job_id, worker_id)
+    if record:
+        job, params = record['job'], record['params']
+        status = join_chunks(job, params['codec'], params['quality'], job_queue.chunk_counts(job_id)['total'],
+                             Config.CHUNK_TIME_LIMIT_SECONDS)
+        job_queue.finish(job_id, worker_id, job)
+        logger.info(f"Joined chunks of job {job_id}: {status}")
+        return jsonify({'status': status, 'error': job.get('error')})
+
+    record = job_queue.get(job_id)
+    if record is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if record['status'] in TERMINAL_STATES:
+        return jsonify({'status': record['status'], 'error': record['job'].get('error')})
+
+    # Remaining segments (or the join) are running in other invocations
+    counts = job_queue.chunk_counts(job_id)
+    response = jsonify({'status': 'processing', 'chunks_done': counts['done'], 'chunks': counts['total']})
+    response.headers['Retry-After'] = '1'
+    return response, 202
+
+@app.route('/transcode', methods=['POST'])
+@limiter.limit("3 per minute")
+def transcode_video():
+    """
+    Convert an uploaded video (e.g. a MOV or WebM with alpha) to another codec or container
+
+    Form fields: 'file', plus optional 'codec', 'quality', 'container' and
+    'reencode'. A source already in the target codec is remuxed with a
+    stream copy; anything else is decoded once straight into the target
+    encoder, never through PNGs. Follow the job with /status and /download.
+    """
+    if not Config.ENABLE_FILE_UPLOADS:
+        return jsonify({'error': 'Server-side processing is disabled'}), 403
+
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'error': 'No file provided'}), 400
+    extension = upload.filename.rsplit('.', 1)[-1].lower() if '.' in upload.filename else ''
+    if extension not in SOURCE_EXTENSIONS:
+        return jsonify({'error': f"Expected a video file ({', '.join(sorted(SOURCE_EXTENSIONS))})"}), 400
+
+    codec = request.form.get('codec', 'vp9')
+    if codec not in ['vp9', 'vp8', 'gif', 'prores', 'qtrle', 'webp', 'webp_lossless', 'apng', 'ffv1', 'h264_stacked']:
+        return jsonify({'error': 'Invalid codec'}), 400
+    quality = normalize_quality(request.form.get('quality'))
+    container = request.form.get('container') or None
+    reencode = request.form.get('reencode', 'false').lower() == 'true'
+
+    # The upload is probed here even when a worker runs the transcode
+    capabilities = get_capabilities(cache_path=Config.FFMPEG_CAPABILITIES_PATH or None)
+    if not capabilities['available']:
+        return jsonify({'error': 'FFmpeg is not installed on the server'}), 503
+
+    job_id = str(uuid.uuid4())
+    job_dir = None
+    try:
+        job_dir, in_memory = staging.allocate(job_id, request.content_length or 0)
+        source = f'source.{extension}'
+        upload.save(os.path.join(job_dir, source))
+
+        error = None
+        try:
+            source_info = probe_source(os.path.join(job_dir, source))
+            plan = plan_transcode(source_info, codec, quality, container, reencode)
+            if plan['mode'] == 'encode' and not has_codec(capabilities, codec):
+                error = (f'This server\'s FFmpeg cannot encode {codec}', 422)
+        except ValueError as e:
+            error = (str(e), 400)
+        if error:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            staging.release(job_id)
+            return jsonify({'error': error[0]}), error[1]
+    except Exception as e:
+        logger.error(f"Error uploading video for transcode: {e}")
+        if job_dir and os.path.exists(job_dir):
+            shutil.rmtree(job_dir)
+        staging.release(job_id)
+        return jsonify({'error': 'Failed to upload video'}), 500
+
+    job = processing_jobs[job_id] = {
+        'id': job_id,
+        'type': 'transcode',
+        'status': 'uploaded',
+        'files': [],
+        'source': source,
+        'source_info': source_info,
+        'dir': job_dir,
+        'staging': 'memory' if in_memory else 'disk',
+        'progress': 0,
+        'width': source_info['width'],
+        'height': source_info['height'],
+        'has_alpha': source_info['has_alpha'],
+        'created_at': datetime.utcnow(),
+        'updated_at': datetime.utcnow()
+    }
+    app_stats['total_jobs'] += 1
+    app_stats['active_jobs'] += 1
+
+    params = {'codec': codec, 'quality': quality, 'container': plan['container'], 'reencode': reencode}
+    if job_queue:
+        job['status'] = 'queued'
+        job_queue.enqueue(job_id, job_snapshot(job), dict(params, transcode=True))
+    else:
+        job['status'] = 'processing'
+        thread = threading.Thread(
+            target=transcode_job,
+            args=(job_id,),
+            kwargs=params,
+            name=f"TranscodeJob-{job_id[:8]}"
+        )
+        thread.daemon = True
+        thread.start()
+    logger.info(f"Started transcode job {job_id}: {source_info['codec']} to {codec} by {plan['mode']}")
+
+    return jsonify({
+        'job_id': job_id,
+        'status': job['status'],
+        'mode': plan['mode'],
+        'source': {k: source_info[k] for k in ('codec', 'width', 'height', 'fps', 'duration', 'has_alpha')},
+        'codec': codec,
+        'container': plan['container']
+    })
+
+def _admission_suggestions(features: Dict[str, Any], limit: float) -> List[Dict[str, Any]]:
+    """Fastest-fitting alternatives for a rejected job: best tier per codec that fits"""
+    suggestions = []
+    capabilities = get_capabilities(cache_path=Config.FFMPEG_CAPABILITIES_PATH or None)
+    for codec in ADMISSION_ALTERNATIVES:
+        if capabilities['available'] and not has_codec(capabilities, codec):
+            continue
+        for quality in ('best', 'good', 'realtime'):
+            alternative = dict(features, codec=normalize_codec(codec), quality=quality)
+            estimate = cost_model.estimate(alternative)
+            if estimate <= limit:
+                suggestions.append({'codec': codec, 'quality': quality, 'estimated_seconds': round(estimate)})
+                break
+    return suggestions
+
+def _eta_seconds(job: Dict[str, Any]) -> Optional[float]:
+    """Predicted seconds until a queued or processing job finishes"""
+    if 'estimated_seconds' not in job:
+        return None
+    if job['status'] == 'processing' and job.get('started_at'):
+        return max(0.0, job['started_at'] + job['estimated_seconds'] - time.time())
+
+    # In-process encodes share the CPUs with the jobs already running
+    running = 0 if job_queue else sum(1 for j in processing_jobs.values() if j['status'] == 'processing')
+    return job['estimated_seconds'] * max(1.0, (running + 1) / (os.cpu_count() or 1))
+
+def _admission_response(status: str, job: Dict[str, Any], quality: str,
+                        downgraded_from: Optional[str]) -> Dict[str, Any]:
+    """/process response with the cost estimate and any quality downgrade"""
+    response = {
+        'status': status,
+        'quality': quality,
+        'estimated_seconds': job['estimated_seconds'],
+        'eta_seconds': round(_eta_seconds(job), 1)
+    }
+    if downgraded_from:
+        response['downgraded_from'] = downgraded_from
+    return response
+
+def _record_cost(job: Dict[str, Any]) -> None:
+    """Calibrate the cost model from a completed job"""
+    if job['status'] == 'completed' and job.get('cost_features') and job.get('processing_time'):
+        cost_model.record(job['cost_features'], job['processing_time'])
+
+def process_job(job_id: str, fps: int, codec: str, quality: str, auto_crop: bool = False,
+                collapse_duplicates: bool = False, preview_frame_step: int = 0,
+                target_size: Optional[int] = None, stream_output: bool = False, alpha_cleanup: bool = False):
+    """Process video job in this process (see encode_pipeline.run_job)"""
     job = processing_jobs[job_id]
     job['status'] = 'processing'
     job['updated_at'] = datetime.utcnow()
 
-    start_time = time.time()
-
     try:
-        logger.info(f"Processing job {job_id}: {len(job['files'])} frames at {fps} FPS")
-
-        # Rename files to sequential pattern
-        files = sorted(job['files'])
-        for i, filename in enumerate(files):
-            old_path = os.path.join(job['dir'], filename)
-            new_path = os.path.join(job['dir'], f'frame_{i:04d}.png')
-            if os.path.exists(old_path):
-                os.rename(old_path, new_path)
-
-        # Determine output format
-        output_ext = {
-            'vp9': 'webm',
-            'vp8': 'webm',
-            'gif': 'gif',
-            'prores': 'mov',
-            'qtrle': 'mov'
-        }.get(codec, 'webm')
-
-        output_file = os.path.join(job['dir'], f'output.{output_ext}')
-
-        # Build FFmpeg command with timeout protection
-        success = False
-        if codec == 'gif':
-            success = _process_gif(job, fps, output_file, files)
-        else:
-            success = _process_video(job, fps, codec, quality, output_file, files)
-
-        processing_time = time.time() - start_time
-
-        if success and os.path.exists(output_file):
-            job['status'] = 'completed'
-            job['output'] = output_file
-            job['output_size'] = os.path.getsize(output_file)
-            job['processing_time'] = processing_time
-            job['updated_at'] = datetime.utcnow()
+        status = run_job(job, fps, codec, quality, auto_crop, collapse_duplicates, preview_frame_step,
+                         target_size, stream_output, alpha_cleanup)
+        job['updated_at'] = datetime.utcnow()
+        app_stats[f'{status}_jobs'] += 1
+        _record_cost(job)
+    finally:
+        app_stats['active_jobs'] -= 1
 
-            app_stats['completed_jobs'] += 1
-            logger.info(f"Job {job_id} completed in {processing_time:.1f}s")
-        else:
-            job['status'] = 'failed'
-            job['error'] = 'FFmpeg processing failed'
-            app_stats['failed_jobs'] += 1
-            logger.error(f"Job {job_id} failed after {processing_time:.1f}s")
+def transcode_job(job_id: str, codec: str, quality: str, container: Optional[str] = None,
+                  reencode: bool = False):
+    """Transcode an uploaded video in this process (see encode_pipeline.run_transcode)"""
+    job = processing_jobs[job_id]
+    job['status'] = 'processing'
+    job['updated_at'] = datetime.utcnow()
 
-    except Exception as e:
-        job['status'] = 'failed'
-        job['error'] = str(e)
+    try:
+        status = run_transcode(job, codec, quality, container, reencode)
         job['updated_at'] = datetime.utcnow()
-        app_stats['failed_jobs'] += 1
-        logger.error(f"Job {job_id} failed with exception: {e}")
-
+        app_stats[f'{status}_jobs'] += 1
     finally:
         app_stats['active_jobs'] -= 1
 
-def _process_gif(job: Dict, fps: int, output_file: str, files: List[str]) -> bool:
-    """Process GIF with palette optimization"""
-    try:
-        job_dir = job['dir']
-        palette_file = os.path.join(job_dir, 'palette.png')
-
-        # First pass: generate palette
-        palette_cmd = [
-            'ffmpeg', '-y', '-v', 'error',
-            '-framerate', str(fps),
-            '-i', os.path.join(job_dir, 'frame_%04d.png'),
-            '-vf', f'fps={fps},scale=640:-1:flags=lanczos,palettegen=stats_mode=diff:transparency_color=ffffff',
-            palette_file
-        ]
-
-        result = subprocess.run(
-            palette_cmd,
-            timeout=Config.MAX_PROCESSING_TIME_SECONDS // 2,
-            capture_output=True,
-            text=True
-        )
+def _apply_queue_record(job_id: str, job: Dict[str, Any], record: Dict[str, Any]) -> None:
+    """Copy the state published in a job's queue record onto the job"""
+    job.update(record['job'])
+    job['status'] = record['status']
+    job['updated_at'] = datetime.utcfromtimestamp(record['updated_at'])
 
-        if result.returncode != 0:
-            logger.error(f"Palette generation failed: {result.stderr}")
-            return False
-
-        # Second pass: create GIF
-        gif_cmd = [
-            'ffmpeg', '-y', '-v', 'error',
-            '-framerate', str(fps),
-            '-i', os.path.join(job_dir, 'frame_%04d.png'),
-            '-i', palette_file,
-            '-lavfi', f'fps={fps},scale=640:-1:flags=lanczos [x]; [x][1:v] paletteuse=dither=bayer:bayer_scale=5:diff_mode=rectangle',
-            '-gifflags', '+transdiff',
-            output_file
-        ]
-
-        result = subprocess.run(
-            gif_cmd,
-            timeout=Config.MAX_PROCESSING_TIME_SECONDS,
-            capture_output=True,
-            text=True
-        )
+    # Chunked jobs report how many of their segments are encoded
+    if record['status'] == CHUNKED:
+        counts = job_queue.chunk_counts(job_id)
+        job['status'] = 'processing'
+        job['progress'] = int(counts['done'] * 100 / max(counts['total'], 1))
 
-        return result.returncode == 0
+def _sync_from_queue(job_id: str, job: Dict[str, Any]) -> None:
+    """Refresh a queued job's record with the state its worker published"""
+    if not job_queue or job['status'] not in ('uploaded', 'queued', 'processing'):
+        return
 
-    except subprocess.TimeoutExpired:
-        logger.error(f"GIF processing timeout for job {job.get('id', 'unknown')}")
-        return False
-    except Exception as e:
-        logger.error(f"GIF processing error: {e}")
-        return False
+    record = job_queue.get(job_id)
+    if record is None:
+        return
 
-def _process_video(job: Dict, fps: int, codec: str, quality: str, output_file: str, files: List[str]) -> bool:
-    """Process video with codec-specific options"""
-    try:
-        job_dir = job['dir']
-
-        cmd = [
-            'ffmpeg', '-y', '-v', 'error',
-            '-framerate', str(fps),
-            '-i', os.path.join(job_dir, 'frame_%04d.png')
-        ]
-
-        # Add codec-specific options
-        if codec == 'vp9':
-            cmd.extend(['-c:v', 'libvpx-vp9', '-pix_fmt', 'yuva420p'])
-            if quality == 'best':
-                cmd.extend(['-deadline', 'best', '-cpu-used', '0'])
-            elif quality == 'good':
-                cmd.extend(['-deadline', 'good', '-cpu-used', '1'])
-            else:
-                cmd.extend(['-deadline', 'realtime', '-cpu-used', '5'])
-        elif codec == 'vp8':
-            cmd.extend(['-c:v', 'libvpx', '-pix_fmt', 'yuva420p'])
-        elif codec == 'prores':
-            cmd.extend(['-c:v', 'prores_ks', '-profile:v', '4444', '-pix_fmt', 'yuva444p10le'])
-        elif codec == 'qtrle':
-            cmd.extend(['-c:v', 'qtrle'])
-
-        cmd.append(output_file)
-
-        # Run with timeout and progress monitoring
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True
-        )
+    _apply_queue_record(job_id, job, record)
 
-        # Simple timeout handling
-        try:
-            stdout, _ = process.communicate(timeout=Config.MAX_PROCESSING_TIME_SECONDS)
-            return process.returncode == 0
-        except subprocess.TimeoutExpired:
-            process.kill()
-            logger.error(f"Video processing timeout for job {job.get('id', 'unknown')}")
-            return False
+    # Only jobs this instance tracks count towards its stats
+    if job['status'] in TERMINAL_STATES and processing_jobs.get(job_id) is job:
+        app_stats[f"{job['status']}_jobs"] += 1
+        app_stats['active_jobs'] -= 1
+        _record_cost(job)
 
-    except Exception as e:
-        logger.error(f"Video processing error: {e}")
-        return False
+def _find_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    A job by ID, synced with the queue, or None
+
+    Serverless platforms send each request to any instance, so a job this
+    instance never saw is rebuilt from its shared queue record.
+    """
+    job = processing_jobs.get(job_id)
+    if job is not None:
+        _sync_from_queue(job_id, job)
+        return job
+
+    record = job_queue.get(job_id) if job_queue else None
+    if record is None:
+        return None
+    job = {'created_at': datetime.utcfromtimestamp(record['created_at'])}
+    _apply_queue_record(job_id, job, record)
+    return job
 
 @app.route('/status/<job_id>')
 def get_status(job_id: str):
     """Get job status with detailed information"""
-    if job_id not in processing_jobs:
+    job = _find_job(job_id)
+    if job is None:
         return jsonify({'error': 'Job not found'}), 404
-
-    job = processing_jobs[job_id]
     response = {
         'status': job['status'],
         'progress': job.get('progress', 0),
@@ -531,10 +997,32 @@ def get_status(job_id: str):
         'updated_at': job['updated_at'].isoformat()
     }
 
+    if 'preview_status' in job:
+        response['preview_status'] = job['preview_status']
+        if job['preview_status'] == 'ready':
+            response['preview_url'] = f'/preview/{job_id}'
+
+    if 'target_size' in job:
+        response['target_size'] = job['target_size']
+
+    if 'alpha_layout' in job:
+        response['alpha_layout'] = job['alpha_layout']
+
+    if 'transcode_mode' in job:
+        response['transcode_mode'] = job['transcode_mode']
+
+    if 'stream_path' in job and job['status'] == 'processing':
+        response['stream_url'] = f'/stream/{job_id}'
+
+    if job['status'] in ('queued', 'processing') and 'estimated_seconds' in job:
+        response['estimated_seconds'] = job['estimated_seconds']
+        response['eta_seconds'] = round(_eta_seconds(job), 1)
+
     if job['status'] == 'completed':
         response.update({
             'output_size': job.get('output_size', 0),
-            'processing_time': job.get('processing_time', 0)
+            'processing_time': job.get('processing_time', 0),
+            'crop': job.get('crop')
         })
     elif job['status'] == 'failed':
         response['error'] = job.get('error', 'Unknown error')
@@ -544,19 +1032,22 @@ def get_status(job_id: str):
 @app.route('/download/<job_id>')
 def download_video(job_id: str):
     """Download processed video with security checks"""
-    if job_id not in processing_jobs:
+    job = _find_job(job_id)
+    if job is None:
         return jsonify({'error': 'Job not found'}), 404
 
-    job = processing_jobs[job_id]
     if job['status'] != 'completed' or 'output' not in job:
         return jsonify({'error': 'Video not ready'}), 400
 
     output_file = job['output']
+    filename = f'transparent_video_{job_id[:8]}{Path(output_file).suffix}'
+    if job.get('output_key') and output_storage:
+        logger.info(f"Serving stored download for job {job_id}")
+        return _send_stored_output(job['output_key'], filename)
+
     if not os.path.exists(output_file):
         return jsonify({'error': 'Output file not found'}), 404
 
-    filename = f'transparent_video_{job_id[:8]}.{Path(output_file).suffix}'
-
     # Schedule cleanup
     threading.Timer(60, cleanup_job, args=[job_id]).start()
 
@@ -569,6 +1060,162 @@ def download_video(job_id: str):
         mimetype='application/octet-stream'
     )
 
+def _send_stored_output(key: str, filename: str):
+    """
+    Serve an output from the output storage
+
+    Local files are sent directly; otherwise the client is redirected to a
+    presigned URL, or (OUTPUT_DOWNLOAD_MODE=proxy) the object is streamed
+    through this node with Range support. Stored outputs outlive the 60s
+    download cleanup and are removed with the job.
+    """
+    path = output_storage.local_path(key)
+    if path:
+        return send_file(path, as_attachment=True, download_name=filename,
+                         mimetype='application/octet-stream', conditional=True)
+
+    if Config.OUTPUT_DOWNLOAD_MODE == 'redirect':
+        url = output_storage.download_url(key, filename, Config.OUTPUT_URL_EXPIRY_SECONDS)
+        if url:
+            return redirect(url, code=302)
+
+    size = output_storage.size(key)
+    if size is None:
+        return jsonify({'error': 'Output file not found'}), 404
+    try:
+        byte_range = parse_range(request.headers.get('Range'), size)
+    except ValueError:
+        return Response(status=416, headers={'Content-Range': f'bytes */{size}'})
+
+    start, end = byte_range or (0, size - 1)
+    headers = {
+        'Content-Disposition': f'attachment; filename={filename}',
+        'Content-Length': str(end - start + 1),
+        'Accept-Ranges': 'bytes'
+    }
+    if byte_range:
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return Response(output_storage.read(key, start, end) if size else iter(()),
+                    status=206 if byte_range else 200, mimetype='application/octet-stream', headers=headers)
+
+@app.route('/stream/<job_id>')
+def stream_video(job_id: str):
+    """
+    Progressive download: send the output while it is being encoded
+
+    Only for jobs started with "stream": true. The response ends when the
+    encoder exits; if the encode fails the connection is dropped before the
+    final chunk, so clients see a truncated transfer instead of a short file.
+    """
+    job = _find_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] == 'completed' and 'output' in job:
+        return download_video(job_id)
+    if job['status'] in ('queued', 'uploaded') or (job['status'] == 'processing' and 'stream_path' not in job):
+        response = jsonify({'status': job['status'], 'error': 'Encode has not started streaming yet'})
+        response.headers['Retry-After'] = '2'
+        return response, 202
+    if job['status'] != 'processing':
+        return jsonify({'error': job.get('error', f"Job {job['status']}")}), 400
+
+    path = job['stream_path']
+    mimetype = STREAM_MIMETYPES.get(Path(path).suffix.lstrip('.'), 'application/octet-stream')
+    logger.info(f"Streaming output for job {job_id}")
+
+    return Response(
+        _tail_output(job_id, job, path),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename=transparent_video_{job_id[:8]}{Path(path).suffix}',
+            'Cache-Control': 'no-store',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+def _tail_output(job_id: str, job: Dict[str, Any], path: str):
+    """Yield a growing output file until its encode finishes"""
+    last_sync = time.monotonic()
+
+    # FFmpeg creates the file as soon as it starts writing
+    while not os.path.exists(path):
+        if job['status'] != 'processing':
+            raise RuntimeError(f"Job {job_id} {job['status']} before producing output")
+        time.sleep(STREAM_POLL_SECONDS)
+        _sync_from_queue(job_id, job)
+
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(STREAM_CHUNK_SIZE)
+            if chunk:
+                yield chunk
+                continue
+
+            if job['status'] == 'completed':
+                # The encoder has exited; send whatever it wrote last
+                for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b''):
+                    yield chunk
+                break
+            if job['status'] != 'processing':
+                logger.warning(f"Aborting stream for job {job_id}: {job['status']}")
+                raise RuntimeError(f"Job {job_id} {job['status']} while streaming")
+
+            time.sleep(STREAM_POLL_SECONDS)
+            if time.monotonic() - last_sync >= 1:
+                _sync_from_queue(job_id, job)
+                last_sync = time.monotonic()
+
+    # A stored output stays downloadable until the periodic cleanup
+    if not (job.get('output_key') and output_storage):
+        threading.Timer(60, cleanup_job, args=[job_id]).start()
+
+@app.route('/preview/<job_id>')
+def download_preview(job_id: str):
+    """Serve the low-resolution preview while the full encode continues"""
+    job = _find_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.get('preview_status') != 'ready' or 'preview' not in job:
+        return jsonify({'error': 'Preview not ready'}), 400
+
+    if not os.path.exists(job['preview']):
+        return jsonify({'error': 'Preview file not found'}), 404
+
+    return send_file(job['preview'], mimetype='video/webm')
+
+@app.route('/cancel/<job_id>', methods=['POST'])
+def cancel_job(job_id: str):
+    """Cancel a job, killing its running encode"""
+    job = _find_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    if job['status'] in ('uploaded', 'queued') and (
+        not job_queue or job_queue.request_cancel(job_id) == 'cancelled'
+    ):
+        # Never started, so nothing else will release the active slot
+        job['status'] = 'cancelled'
+        job['updated_at'] = datetime.utcnow()
+        if job_id in processing_jobs:
+            app_stats['active_jobs'] -= 1
+            app_stats['cancelled_jobs'] += 1
+    elif job['status'] in ('queued', 'processing') and job_queue:
+        # A worker has it; it stops on its next heartbeat
+        job_queue.request_cancel(job_id)
+        job['cancel_requested'] = True
+    elif job['status'] == 'processing':
+        job['cancel_requested'] = True
+        process = job.get('process')
+        if process and process.poll() is None:
+            process.kill()
+    else:
+        return jsonify({'error': f"Job already {job['status']}"}), 400
+
+    threading.Timer(60, cleanup_job, args=[job_id]).start()
+    logger.info(f"Cancelled job {job_id}")
+
+    return jsonify({'status': 'cancelled'})
+
 def cleanup_job(job_id: str):
     """Clean up job files and data"""
     if job_id in processing_jobs:
@@ -579,6 +1226,16 @@ def cleanup_job(job_id: str):
                 logger.debug(f"Cleaned up job {job_id}")
             except Exception as e:
                 logger.error(f"Failed to cleanup job {job_id}: {e}")
+        staging.release(job_id)
+        if frame_store:
+            frame_store.release(job_id)
+        if job.get('output_key') and output_storage:
+            try:
+                output_storage.delete(job['output_key'])
+            except Exception as e:
+                logger.error(f"Failed to delete stored output of job {job_id}: {e}")
+        if job_queue:
+            job_queue.delete(job_id)
         del processing_jobs[job_id]
 
 def cleanup_old_jobs():
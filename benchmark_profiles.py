@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Encoding Profile Benchmark
+Encodes a PNG sequence with every (codec, quality) profile and reports
+wall time, CPU time, encode speed and output size
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from encoding_profiles import OUTPUT_EXTENSIONS, PROFILES, QUALITY_TIERS, build_codec_args
+from merge_transparent_video import find_sequence_pattern, list_sequence_files
+from png_probe import probe_sequence
+
+
+def _children_cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def benchmark_profile(input_pattern, start_number, frame_count, probe, codec, quality, fps, output_dir):
+    """Run a single encode and return its measurements"""
+    output_file = os.path.join(output_dir, f'{codec}_{quality}.{OUTPUT_EXTENSIONS[codec]}')
+    codec_args = build_codec_args(codec, quality, probe['width'], probe['height'], probe['has_alpha'])
+    cmd = [
+        'ffmpeg', '-y', '-v', 'error',
+        '-framerate', str(fps), '-start_number', str(start_number), '-i', input_pattern,
+    ] + codec_args + [output_file]
+
+    cpu_before = _children_cpu_seconds()
+    started = time.perf_counter()
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    cpu = _children_cpu_seconds() - cpu_before
+
+    return {
+        'codec': codec,
+        'quality': quality,
+        'ok': result.returncode == 0,
+        'error': result.stderr.strip()[-500:] if result.returncode != 0 else None,
+        'wall_seconds': round(wall, 3),
+        'cpu_seconds': round(cpu, 3),
+        'encode_fps': round(frame_count / wall, 2) if wall > 0 else None,
+        'output_bytes': os.path.getsize(output_file) if os.path.exists(output_file) else 0,
+        'args': codec_args,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the shared encoding profiles on a PNG sequence')
+    parser.add_argument('-i', '--input', required=True, help='Directory containing the PNG sequence')
+    parser.add_argument('-c', '--codecs', nargs='+', default=sorted(PROFILES),
+                        choices=sorted(PROFILES), help='Codecs to benchmark (default: all)')
+    parser.add_argument('-q', '--qualities', nargs='+', default=list(QUALITY_TIERS),
+                        choices=list(QUALITY_TIERS), help='Quality tiers to benchmark (default: all)')
+    parser.add_argument('-fps', '--framerate', type=int, default=24, help='Frame rate (default: 24)')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    pattern, start, end, _ = find_sequence_pattern(args.input)
+    if pattern is None:
+        print("Error: No PNG files found in directory")
+        return 1
+
+    input_pattern = os.path.join(args.input, pattern)
+    frames = list_sequence_files(input_pattern, start)
+    probe = probe_sequence(frames)
+    print(f"Benchmarking {len(frames)} frames at {probe['width']}x{probe['height']} "
+          f"(alpha: {'yes' if probe['has_alpha'] else 'no'})\n")
+    print(f"{'codec':<10} {'quality':<9} {'wall s':>8} {'cpu s':>8} {'fps':>8} {'size KB':>10}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        for codec in args.codecs:
+            for quality in args.qualities:
+                r = benchmark_profile(input_pattern, start, len(frames), probe, codec, quality,
+                                      args.framerate, output_dir)
+                results.append(r)
+                if r['ok']:
+                    print(f"{codec:<10} {quality:<9} {r['wall_seconds']:>8.2f} {r['cpu_seconds']:>8.2f} "
+                          f"{r['encode_fps']:>8.1f} {r['output_bytes'] / 1024:>10.1f}")
+                else:
+                    print(f"{codec:<10} {quality:<9} failed: {r['error']}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'frames': len(frames), 'probe': probe, 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    return 0 if all(r['ok'] for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
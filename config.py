@@ -33,19 +33,90 @@ class Config:
     ENABLE_USAGE_TRACKING: bool = os.getenv('ENABLE_USAGE_TRACKING', 'true').lower() == 'true'
     ENABLE_FILE_UPLOADS: bool = os.getenv('ENABLE_FILE_UPLOADS', 'true').lower() == 'true'
 
+    # Per-client request limits (Flask-Limiter reads this; load_test.py turns it off)
+    RATELIMIT_ENABLED: bool = os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true'
+
     # Processing Limits
     MAX_FILE_SIZE_MB: int = int(os.getenv('MAX_FILE_SIZE_MB', '500'))
     MAX_PROCESSING_TIME_SECONDS: int = int(os.getenv('MAX_PROCESSING_TIME_SECONDS', '300'))
     MAX_FRAME_COUNT: int = int(os.getenv('MAX_FRAME_COUNT', '1000'))
 
+    # Encoding
+    COLLAPSE_DUPLICATE_FRAMES: bool = os.getenv('COLLAPSE_DUPLICATE_FRAMES', 'true').lower() == 'true'
+    ENABLE_PREVIEW: bool = os.getenv('ENABLE_PREVIEW', 'true').lower() == 'true'
+    PREVIEW_WIDTH: int = int(os.getenv('PREVIEW_WIDTH', '320'))
+    PREVIEW_FRAME_STEP: int = int(os.getenv('PREVIEW_FRAME_STEP', '1'))
+    # Encode longer jobs as checkpointed segments of this many frames so
+    # reclaimed jobs resume where they stopped (0 disables)
+    RESUMABLE_SEGMENT_FRAMES: int = int(os.getenv('RESUMABLE_SEGMENT_FRAMES', '300'))
+    TARGET_SIZE_CORRECTION_PASS: bool = os.getenv('TARGET_SIZE_CORRECTION_PASS', 'true').lower() == 'true'
+    # Pre-encode alpha cleanup default: alpha <= LOW becomes 0 (and its colour
+    # is zeroed), alpha >= HIGH becomes 255
+    ALPHA_CLEANUP: bool = os.getenv('ALPHA_CLEANUP', 'false').lower() == 'true'
+    ALPHA_CLEANUP_LOW: int = int(os.getenv('ALPHA_CLEANUP_LOW', '2'))
+    ALPHA_CLEANUP_HIGH: int = int(os.getenv('ALPHA_CLEANUP_HIGH', '253'))
+
     # Security
     CORS_ORIGINS: list = os.getenv('CORS_ORIGINS', 'http://localhost:3000,http://localhost:5555').split(',')
     RATE_LIMIT_PER_MINUTE: int = int(os.getenv('RATE_LIMIT_PER_MINUTE', '10'))
 
+    # Shared job queue: when set, /process only enqueues and encode_worker.py
+    # processes run the encodes (job folders must be visible to the workers)
+    JOB_QUEUE_PATH: Optional[str] = os.getenv('JOB_QUEUE_PATH')
+    JOB_LEASE_SECONDS: int = int(os.getenv('JOB_LEASE_SECONDS', '60'))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+    WORKER_POLL_INTERVAL: float = float(os.getenv('WORKER_POLL_INTERVAL', '1.0'))
+    # Chunked encoding for serverless deployments: segments small enough to
+    # encode within one invocation's time limit, claimed via /process/<id>/chunk
+    CHUNKED_ENCODING: bool = os.getenv('CHUNKED_ENCODING', 'false').lower() == 'true'
+    CHUNK_TIME_LIMIT_SECONDS: int = int(os.getenv('CHUNK_TIME_LIMIT_SECONDS', '30'))
+
     # File Upload Configuration
     MAX_CONTENT_LENGTH: int = MAX_FILE_SIZE_MB * 1024 * 1024  # Convert to bytes
     UPLOAD_FOLDER: str = os.getenv('UPLOAD_FOLDER', '/tmp')
 
+    # RAM-backed job staging (defaults to /dev/shm when available); set the
+    # budget to 0 to always stage on disk
+    STAGING_MEMORY_FOLDER: Optional[str] = os.getenv('STAGING_MEMORY_FOLDER')
+    STAGING_MEMORY_BUDGET_MB: int = int(os.getenv('STAGING_MEMORY_BUDGET_MB', '512'))
+    # Expected job footprint as a multiple of the upload size (frames + outputs)
+    STAGING_SIZE_FACTOR: float = float(os.getenv('STAGING_SIZE_FACTOR', '2.0'))
+
+    # Content-addressed frame store for hash-first uploads (0 disables it).
+    # Keep it on the same filesystem as job folders so frames are hard-linked
+    FRAME_STORE_FOLDER: str = os.getenv('FRAME_STORE_FOLDER', os.path.join(UPLOAD_FOLDER, 'frame_store'))
+    FRAME_STORE_BUDGET_MB: int = int(os.getenv('FRAME_STORE_BUDGET_MB', '2048'))
+
+    # Admission control: jobs predicted to exceed MAX_PROCESSING_TIME_SECONDS
+    # (times the headroom) are downgraded to a faster tier or rejected up front
+    ENABLE_ADMISSION_CONTROL: bool = os.getenv('ENABLE_ADMISSION_CONTROL', 'true').lower() == 'true'
+    ADMISSION_HEADROOM: float = float(os.getenv('ADMISSION_HEADROOM', '0.9'))
+    # Calibration of the encode cost model from completed jobs ('' keeps it in memory)
+    COST_MODEL_PATH: str = os.getenv('COST_MODEL_PATH', os.path.join(UPLOAD_FOLDER, 'cost_model.json'))
+
+    # Cached FFmpeg encoder/pixel format probe, refreshed when the binary changes ('' keeps it in memory)
+    FFMPEG_CAPABILITIES_PATH: str = os.getenv(
+        'FFMPEG_CAPABILITIES_PATH', os.path.join(UPLOAD_FOLDER, 'ffmpeg_capabilities.json')
+    )
+
+    # Where finished outputs are kept: '' (the job folder on the encoding
+    # node), 'local' (OUTPUT_STORAGE_PATH, shareable between nodes) or 's3'
+    # (any S3-compatible bucket). Stored outputs are downloaded through a
+    # presigned redirect ('redirect') or ranged reads via the web node ('proxy').
+    OUTPUT_STORAGE: str = os.getenv('OUTPUT_STORAGE', '').lower()
+    OUTPUT_STORAGE_PATH: str = os.getenv('OUTPUT_STORAGE_PATH', os.path.join(UPLOAD_FOLDER, 'outputs'))
+    OUTPUT_S3_BUCKET: Optional[str] = os.getenv('OUTPUT_S3_BUCKET')
+    OUTPUT_S3_PREFIX: str = os.getenv('OUTPUT_S3_PREFIX', 'outputs')
+    OUTPUT_S3_ENDPOINT_URL: Optional[str] = os.getenv('OUTPUT_S3_ENDPOINT_URL')
+    OUTPUT_S3_REGION: Optional[str] = os.getenv('OUTPUT_S3_REGION')
+    OUTPUT_S3_PART_SIZE_MB: int = int(os.getenv('OUTPUT_S3_PART_SIZE_MB', '8'))
+    OUTPUT_DOWNLOAD_MODE: str = os.getenv('OUTPUT_DOWNLOAD_MODE', 'redirect').lower()
+    OUTPUT_URL_EXPIRY_SECONDS: int = int(os.getenv('OUTPUT_URL_EXPIRY_SECONDS', '3600'))
+
+    # Brotli/gzip variants of static assets, keyed by content hash
+    # (default: static/.precompressed; fill it at build time with static_assets.py)
+    STATIC_CACHE_FOLDER: Optional[str] = os.getenv('STATIC_CACHE_FOLDER')
+
     @classmethod
     def validate_config(cls) -> Dict[str, Any]:
         """Validate configuration and return status"""
@@ -0,0 +1,170 @@
+"""
+Encode Cost Model
+Predicts how long a job will take to encode from its frame count, resolution,
+alpha usage and codec profile, and calibrates itself from completed jobs
+"""
+
+import json
+import math
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+from encoding_profiles import QUALITY_TIERS, normalize_codec, normalize_quality
+
+# Prior encode cost in seconds per megapixel-frame (single job on a modern
+# x86 core), used until a profile has completed-job history
+DEFAULT_RATES = {
+    'vp9': {'realtime': 0.01, 'good': 0.06, 'best': 0.2},
+    'vp8': {'realtime': 0.01, 'good': 0.03, 'best': 0.08},
+    'prores_ks': {'realtime': 0.01, 'good': 0.01, 'best': 0.015},
+    'qtrle': {'realtime': 0.01, 'good': 0.01, 'best': 0.01},
+    'png': {'realtime': 0.02, 'good': 0.04, 'best': 0.1},
+    'apng': {'realtime': 0.02, 'good': 0.04, 'best': 0.1},
+    'webp': {'realtime': 0.02, 'good': 0.05, 'best': 0.12},
+    'webp_lossless': {'realtime': 0.05, 'good': 0.15, 'best': 0.6},
+    'gif': {'realtime': 0.03, 'good': 0.03, 'best': 0.03},
+    'ffv1': {'realtime': 0.004, 'good': 0.006, 'best': 0.01},
+    # Per source megapixel; the stacked frame is twice the area
+    'h264_stacked': {'realtime': 0.006, 'good': 0.012, 'best': 0.03},
+}
+FALLBACK_RATE = 0.05
+
+# Encoding an alpha plane costs roughly this much more than opaque frames
+ALPHA_COST_FACTOR = 1.3
+
+# Fixed per-job cost (process start-up, muxing, file I/O)
+OVERHEAD_SECONDS = 1.0
+
+# GIF output is scaled to this width before palette generation
+GIF_WIDTH = 640
+
+# Weight of each new observation in the running calibration
+CALIBRATION_WEIGHT = 0.3
+
+# Sample encodes run by target-size mode (see target_size)
+TARGET_SIZE_PROBE_ENCODES = 3
+TARGET_SIZE_SAMPLE_FRAMES = 24
+
+
+def count_runs(digests: Optional[Sequence[str]]) -> Optional[int]:
+    """Frames left after collapsing runs of identical digests"""
+    if not digests:
+        return None
+    return 1 + sum(1 for prev, cur in zip(digests, digests[1:]) if cur != prev)
+
+
+def job_features(codec: str, quality: Optional[str], frames: int, width: Optional[int], height: Optional[int],
+                 has_alpha: bool = True, preview_frame_step: int = 0, preview_width: int = 0,
+                 target_size: bool = False) -> Dict[str, Any]:
+    """Everything the model needs to know about a job, as a JSON-friendly dict"""
+    codec = normalize_codec(codec)
+    width, height = width or 1280, height or 720
+    if codec == 'gif' and width > GIF_WIDTH:
+        width, height = GIF_WIDTH, round(height * GIF_WIDTH / width)
+
+    features = {
+        'codec': codec,
+        'quality': normalize_quality(quality),
+        'has_alpha': bool(has_alpha),
+        'megapixel_frames': frames * width * height / 1e6,
+        'preview_megapixel_frames': 0.0,
+        'probe_megapixel_frames': 0.0,
+    }
+    if preview_frame_step and preview_width:
+        preview_width = min(preview_width, width)
+        preview_height = height * preview_width / width
+        features['preview_megapixel_frames'] = (
+            math.ceil(frames / preview_frame_step) * preview_width * preview_height / 1e6
+        )
+    if target_size:
+        features['probe_megapixel_frames'] = (
+            TARGET_SIZE_PROBE_ENCODES * min(frames, TARGET_SIZE_SAMPLE_FRAMES) * width * height / 1e6
+        )
+    return features
+
+
+class CostModel:
+    """
+    Per-profile encode rates, calibrated from completed jobs
+
+    Each (codec, quality, alpha) profile keeps an exponentially weighted
+    average of observed seconds per megapixel-frame. When a path is given
+    the calibration is persisted as JSON so it survives restarts.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._profiles: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._profiles = json.load(f)
+            except (OSError, ValueError):
+                self._profiles = {}
+
+    @staticmethod
+    def _key(codec: str, quality: str, has_alpha: bool) -> str:
+        return f"{codec}/{quality}/{'alpha' if has_alpha else 'opaque'}"
+
+    def rate(self, codec: str, quality: str, has_alpha: bool) -> float:
+        """Seconds per megapixel-frame for a profile"""
+        with self._lock:
+            profile = self._profiles.get(self._key(codec, quality, has_alpha))
+        if profile:
+            return profile['rate']
+        prior = DEFAULT_RATES.get(codec, {}).get(quality, FALLBACK_RATE)
+        return prior * ALPHA_COST_FACTOR if has_alpha else prior
+
+    def _secondary_seconds(self, features: Dict[str, Any], rate: float) -> float:
+        """Cost of the preview and target-size sample encodes"""
+        preview = features['preview_megapixel_frames'] * self.rate('vp9', 'realtime', features['has_alpha'])
+        return preview + features['probe_megapixel_frames'] * rate
+
+    def encode_seconds(self, features: Dict[str, Any]) -> float:
+        """Predicted seconds for the full encode alone"""
+        return features['megapixel_frames'] * self.rate(features['codec'], features['quality'], features['has_alpha'])
+
+    def estimate(self, features: Dict[str, Any]) -> float:
+        """Predicted wall-clock seconds for a job running alone"""
+        rate = self.rate(features['codec'], features['quality'], features['has_alpha'])
+        return OVERHEAD_SECONDS + features['megapixel_frames'] * rate + self._secondary_seconds(features, rate)
+
+    def record(self, features: Dict[str, Any], seconds: float) -> None:
+        """Fold a completed job's processing time into its profile's rate"""
+        if features['megapixel_frames'] <= 0:
+            return
+        rate = self.rate(features['codec'], features['quality'], features['has_alpha'])
+        main_seconds = max(0.0, seconds - OVERHEAD_SECONDS - self._secondary_seconds(features, rate))
+        observed = main_seconds / (features['megapixel_frames'] + features['probe_megapixel_frames'])
+
+        # Start from the prior so a single unusual job can't swing the estimate
+        key = self._key(features['codec'], features['quality'], features['has_alpha'])
+        with self._lock:
+            profile = self._profiles.setdefault(key, {'rate': rate, 'samples': 0})
+            profile['rate'] += CALIBRATION_WEIGHT * (observed - profile['rate'])
+            profile['samples'] += 1
+            snapshot = json.dumps(self._profiles)
+
+        if self.path:
+            tmp_path = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            try:
+                with open(tmp_path, 'w') as f:
+                    f.write(snapshot)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                pass
+
+    def cheaper_tiers(self, features: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """The same job at each faster quality tier, fastest last"""
+        index = QUALITY_TIERS.index(features['quality'])
+        return [dict(features, quality=tier) for tier in reversed(QUALITY_TIERS[:index])]
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Calibrated profiles for the stats endpoint"""
+        with self._lock:
+            return {
+                key: {'rate': round(p['rate'], 4), 'samples': int(p['samples'])}
+                for key, p in self._profiles.items()
+            }
@@ -0,0 +1,608 @@
+"""
+Encode Pipeline
+Runs a server-side encode job: frame renaming, alpha cleanup, preview,
+auto-crop, duplicate collapsing and the final FFmpeg encode, or one segment
+of a chunked job, or the transcode of an uploaded video.
+Shared by the web app's in-process threads and the standalone encode worker.
+"""
+
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from alpha_cleanup import clean_frames
+from alpha_crop import compute_crop, crop_filter
+from config import Config
+from encoding_profiles import (build_codec_args, join_filter_args, output_extension, stacked_alpha_layout,
+                               streaming_args)
+from frame_dedupe import VFR_OUTPUT_ARGS, collapse_runs, concat_input_args, write_ffconcat
+from output_storage import create_storage
+from segments import concat_segments, encode_resumable, encode_segment, is_segmentable
+from target_size import correct_plan, plan_summary, plan_target_size
+from transcode import plan_transcode, transcode_command
+
+logger = logging.getLogger(__name__)
+
+# Keys that only make sense inside the running process
+TRANSIENT_JOB_KEYS = {'process', 'created_at', 'updated_at'}
+
+# Shared storage for finished outputs (None: outputs stay in the job folder)
+output_storage = create_storage(
+    Config.OUTPUT_STORAGE, Config.OUTPUT_STORAGE_PATH, Config.OUTPUT_S3_BUCKET, Config.OUTPUT_S3_PREFIX,
+    Config.OUTPUT_S3_ENDPOINT_URL, Config.OUTPUT_S3_REGION, Config.OUTPUT_S3_PART_SIZE_MB * 1024 * 1024
+)
+
+
+def job_snapshot(job: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-serializable copy of a job record (for the shared queue)"""
+    # dict() copies atomically, so this is safe while the encode thread
+    # is still updating the job
+    return {k: v for k, v in dict(job).items() if k not in TRANSIENT_JOB_KEYS}
+
+
+def run_job(job: Dict[str, Any], fps: int, codec: str, quality: str, auto_crop: bool = False,
+            collapse_duplicates: bool = False, preview_frame_step: int = 0,
+            target_size: Optional[int] = None, stream_output: bool = False, alpha_cleanup: bool = False,
+            on_update: Optional[Callable[[Dict[str, Any]], None]] = None) -> str:
+    """
+    Encode a job in place and return its final status
+
+    The job dict needs 'dir' and 'files' (plus optional 'digests', 'width',
+    'height', 'has_alpha'); results are written back onto it. When
+    preview_frame_step is set, a quick low-resolution preview using every
+    Nth frame is encoded alongside the full encode so users can check (or
+    cancel) the job early.
+    target_size (bytes) replaces the quality tier's rate control with a
+    setting chosen from sample encodes (see target_size). stream_output
+    writes a container that can be downloaded while it grows, at
+    job['stream_path']. alpha_cleanup first zeroes colour under transparent
+    pixels and snaps alpha noise (see alpha_cleanup).
+    on_update is called after each stage so callers can publish progress.
+
+    Returns 'completed', 'failed' or 'cancelled'.
+    """
+    job_id = job.get('id', 'unknown')
+    notify = on_update or (lambda _job: None)
+    start_time = time.time()
+    job['started_at'] = start_time
+    finish_upload = None
+    finish_preview = None
+
+    try:
+        logger.info(f"Processing job {job_id}: {len(job['files'])} frames at {fps} FPS")
+
+        # Rename files to sequential pattern (once; a reclaimed job resumes
+        # with frames already renamed)
+        files = sorted(job['files'])
+        if not job.get('frames_renamed'):
+            rename_frames(job)
+            notify(job)
+
+        if alpha_cleanup and job.get('has_alpha', True) and not job.get('alpha_cleaned'):
+            _clean_alpha(job, [os.path.join(job['dir'], f'frame_{i:04d}.png') for i in range(len(files))])
+            notify(job)
+
+        if preview_frame_step:
+            finish_preview = _start_preview(job, fps, preview_frame_step, notify)
+
+        # Determine output format
+        output_ext = output_extension(codec)
+
+        output_file = os.path.join(job['dir'], f'output.{output_ext}')
+
+        # Streamed outputs are uploaded to the output storage as they grow
+        if stream_output and streaming_args(codec) and output_storage:
+            finish_upload = _start_streaming_upload(job, output_file)
+
+        # Optionally crop to the visible area; clients position the output
+        # using the reported offset
+        crop = None
+        if auto_crop and job.get('has_alpha', True):
+            crop = compute_crop(
+                os.path.join(job['dir'], f'frame_{i:04d}.png') for i in range(len(files))
+            )
+            job['crop'] = crop
+
+        # Hold identical consecutive frames instead of encoding them again
+        if collapse_duplicates and job.get('digests'):
+            frame_paths = [os.path.join(job['dir'], f'frame_{i:04d}.png') for i in range(len(files))]
+            runs = collapse_runs(frame_paths, job['digests'])
+            if len(runs) < len(files):
+                job['manifest'] = write_ffconcat(runs, fps, os.path.join(job['dir'], 'frames.ffconcat'))
+                job['encoded_frames'] = len(runs)
+                logger.info(f"Job {job_id}: collapsed {len(files)} frames into {len(runs)} runs")
+
+        # Build FFmpeg command with timeout protection
+        success = False
+        if codec == 'gif':
+            success = _process_gif(job, fps, output_file, files, crop)
+        else:
+            success = _process_video(job, fps, codec, quality, output_file, files, crop, target_size,
+                                     stream_output)
+
+        processing_time = time.time() - start_time
+        job['processing_time'] = processing_time
+
+        if job.get('cancel_requested'):
+            job['status'] = 'cancelled'
+            logger.info(f"Job {job_id} cancelled after {processing_time:.1f}s")
+        elif success and os.path.exists(output_file) and not store_output(job, output_file, finish_upload):
+            job['status'] = 'failed'
+            job['error'] = 'Storing the output failed'
+        elif success and os.path.exists(output_file):
+            job['status'] = 'completed'
+            job['output'] = output_file
+            job['output_size'] = os.path.getsize(output_file)
+            logger.info(f"Job {job_id} completed in {processing_time:.1f}s")
+        else:
+            job['status'] = 'failed'
+            job['error'] = 'FFmpeg processing failed'
+            logger.error(f"Job {job_id} failed after {processing_time:.1f}s")
+
+    except Exception as e:
+        job['status'] = 'failed'
+        job['error'] = str(e)
+        logger.error(f"Job {job_id} failed with exception: {e}")
+
+    if finish_upload and job['status'] != 'completed':
+        finish_upload(False)
+    if finish_preview:
+        finish_preview(job['status'] == 'cancelled')
+    notify(job)
+    return job['status']
+
+
+def run_transcode(job: Dict[str, Any], codec: str, quality: str, container: Optional[str] = None,
+                  reencode: bool = False, on_update: Optional[Callable[[Dict[str, Any]], None]] = None) -> str:
+    """
+    Transcode a job's uploaded video and return its final status
+
+    The job dict needs 'dir', 'source' (file name in dir) and 'source_info'
+    (transcode.probe_source). The video is stream-copied when it already
+    uses the target codec, otherwise decoded once into the target encoder.
+
+    Returns 'completed', 'failed' or 'cancelled'.
+    """
+    job_id = job.get('id', 'unknown')
+    start_time = time.time()
+    job['started_at'] = start_time
+
+    try:
+        plan = plan_transcode(job['source_info'], codec, quality, container, reencode)
+        job['transcode_mode'] = plan['mode']
+        if 'alpha_layout' in plan:
+            job['alpha_layout'] = plan['alpha_layout']
+        output_file = os.path.join(job['dir'], f"output.{plan['container']}")
+        logger.info(f"Transcoding job {job_id} to {plan['codec']} ({plan['container']}) by {plan['mode']}")
+
+        cmd = transcode_command(os.path.join(job['dir'], job['source']), output_file, plan)
+        try:
+            result = run_ffmpeg(job, cmd, Config.MAX_PROCESSING_TIME_SECONDS)
+        except subprocess.TimeoutExpired:
+            result = subprocess.CompletedProcess(cmd, -1, '', 'Transcode timed out')
+
+        job['processing_time'] = time.time() - start_time
+        if job.get('cancel_requested'):
+            job['status'] = 'cancelled'
+        elif result.returncode == 0 and os.path.exists(output_file) and not store_output(job, output_file):
+            job['status'] = 'failed'
+            job['error'] = 'Storing the output failed'
+        elif result.returncode == 0 and os.path.exists(output_file):
+            job['status'] = 'completed'
+            job['output'] = output_file
+            job['output_size'] = os.path.getsize(output_file)
+            job['progress'] = 100
+            logger.info(f"Job {job_id} transcoded in {job['processing_time']:.1f}s")
+        else:
+            job['status'] = 'failed'
+            job['error'] = 'FFmpeg transcode failed'
+            logger.error(f"Transcode of job {job_id} failed: {result.stderr}")
+
+    except Exception as e:
+        job['status'] = 'failed'
+        job['error'] = str(e)
+        logger.error(f"Job {job_id} failed with exception: {e}")
+
+    if on_update:
+        on_update(job)
+    return job['status']
+
+
+def _output_key(job: Dict[str, Any], output_file: str) -> str:
+    return f"{job.get('id', 'unknown')}/{os.path.basename(output_file)}"
+
+
+def store_output(job: Dict[str, Any], output_file: str,
+                 finish_upload: Optional[Callable[[bool], None]] = None) -> bool:
+    """
+    Put a finished output into the output storage, if one is configured
+
+    Called before a job is marked completed, so every completed job has its
+    job['output_key'] and any web node can serve the download. finish_upload
+    is the callable from _start_streaming_upload when the output was uploaded
+    while it was encoded. Returns False if the output couldn't be stored.
+    """
+    if not output_storage:
+        return True
+    key = _output_key(job, output_file)
+    try:
+        if finish_upload:
+            finish_upload(True)
+        else:
+            output_storage.upload_file(key, output_file)
+    except Exception as e:
+        logger.error(f"Storing the output of job {job.get('id', 'unknown')} failed: {e}")
+        return False
+    job['output_key'] = key
+    job['output_storage'] = output_storage.name
+    return True
+
+
+def _start_streaming_upload(job: Dict[str, Any], output_file: str) -> Callable[[bool], None]:
+    """
+    Upload an output to the output storage while it is being encoded
+
+    Returns a function to call once FFmpeg has exited: finish(True) waits
+    for the upload to catch up (raising if it failed), finish(False) deletes
+    the partial object after a failed encode.
+    """
+    key = _output_key(job, output_file)
+    encode_done = threading.Event()
+    errors: List[Exception] = []
+
+    def upload() -> None:
+        try:
+            output_storage.upload_growing_file(key, output_file, encode_done.is_set)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=upload, daemon=True, name=f"Upload-{job.get('id', 'unknown')[:8]}")
+    thread.start()
+
+    def finish(success: bool) -> None:
+        encode_done.set()
+        thread.join()
+        if success and not errors:
+            return
+        try:
+            output_storage.delete(key)
+        except Exception:
+            pass
+        if success:
+            raise errors[0]
+
+    return finish
+
+
+def rename_frames(job: Dict[str, Any]) -> None:
+    """Rename a job's uploaded frames to the frame_%04d.png pattern, in name order"""
+    for i, filename in enumerate(sorted(job['files'])):
+        old_path = os.path.join(job['dir'], filename)
+        new_path = os.path.join(job['dir'], f'frame_{i:04d}.png')
+        if os.path.exists(old_path):
+            os.rename(old_path, new_path)
+    job['frames_renamed'] = True
+
+
+def _clean_alpha(job: Dict[str, Any], frame_paths: List[str]) -> None:
+    """Alpha cleanup of a job's frames in place, with the configured thresholds"""
+    result = clean_frames(frame_paths, low=Config.ALPHA_CLEANUP_LOW, high=Config.ALPHA_CLEANUP_HIGH)
+    job['alpha_cleaned'] = True
+    logger.info(f"Job {job.get('id', 'unknown')}: alpha cleanup changed {result['changed']} of "
+                f"{result['frames']} frames in {result['seconds']:.1f}s")
+
+
+def _chunk_file(job: Dict[str, Any], codec: str, index: int) -> str:
+    return os.path.join(job['dir'], 'chunks', f'segment_{index:05d}.{output_extension(codec)}')
+
+
+def encode_chunk(job: Dict[str, Any], fps: int, codec: str, quality: str, start: int, count: int,
+                 index: int, timeout: int, alpha_cleanup: bool = False) -> bool:
+    """
+    Encode one segment of a chunked job (frames already renamed)
+
+    Every segment uses the same codec arguments, so they can be joined with
+    a stream copy. A segment that already exists was finished by an earlier
+    invocation and is kept. Alpha cleanup, if requested, covers only this
+    segment's frames (it is idempotent, so a retried segment can redo it).
+    """
+    segment_file = _chunk_file(job, codec, index)
+    if os.path.exists(segment_file):
+        return True
+    os.makedirs(os.path.dirname(segment_file), exist_ok=True)
+
+    if alpha_cleanup and job.get('has_alpha', True):
+        try:
+            _clean_alpha(job, [os.path.join(job['dir'], f'frame_{i:04d}.png') for i in range(start, start + count)])
+        except (OSError, RuntimeError) as e:
+            logger.error(f"Alpha cleanup for segment {index} of job {job.get('id', 'unknown')} failed: {e}")
+            return False
+
+    codec_args = build_codec_args(codec, quality, job.get('width'), job.get('height'), job.get('has_alpha', True))
+    try:
+        result = encode_segment(
+            os.path.join(job['dir'], 'frame_%04d.png'), start, count, fps, codec_args, segment_file,
+            run=lambda cmd: run_ffmpeg(job, cmd, timeout)
+        )
+    except subprocess.TimeoutExpired:
+        logger.error(f"Segment {index} of job {job.get('id', 'unknown')} timed out")
+        return False
+    if result.returncode != 0:
+        logger.error(f"Segment {index} of job {job.get('id', 'unknown')} failed: {result.stderr}")
+    return result.returncode == 0
+
+
+def join_chunks(job: Dict[str, Any], codec: str, quality: str, chunk_count: int, timeout: int) -> str:
+    """Concatenate a chunked job's segments into its output; returns the job's final status"""
+    output_file = os.path.join(job['dir'], f'output.{output_extension(codec)}')
+    segment_files = [_chunk_file(job, codec, index) for index in range(chunk_count)]
+    codec_args = build_codec_args(codec, quality, job.get('width'), job.get('height'), job.get('has_alpha', True))
+    try:
+        result = concat_segments(segment_files, output_file, run=lambda cmd: run_ffmpeg(job, cmd, timeout),
+                                 codec_args=codec_args)
+    except subprocess.TimeoutExpired:
+        result = subprocess.CompletedProcess([], -1, '', 'Joining segments timed out')
+
+    if result.returncode == 0 and os.path.exists(output_file) and not store_output(job, output_file):
+        job['status'] = 'failed'
+        job['error'] = 'Storing the output failed'
+    elif result.returncode == 0 and os.path.exists(output_file):
+        job['status'] = 'completed'
+        job['output'] = output_file
+        job['output_size'] = os.path.getsize(output_file)
+        job['processing_time'] = time.time() - job.get('started_at', time.time())
+        if codec == 'h264_stacked':
+            job['alpha_layout'] = stacked_alpha_layout(job.get('width'), job.get('height'))
+        shutil.rmtree(os.path.dirname(segment_files[0]), ignore_errors=True)
+    else:
+        job['status'] = 'failed'
+        job['error'] = 'Joining segments failed'
+        logger.error(f"Joining segments of job {job.get('id', 'unknown')} failed: {result.stderr}")
+    return job['status']
+
+
+def run_ffmpeg(job: Dict, cmd: List[str], timeout: int) -> subprocess.CompletedProcess:
+    """
+    Run FFmpeg as the job's current process so a cancel request can kill it
+    Raises subprocess.TimeoutExpired after killing the process on timeout.
+    """
+    if job.get('cancel_requested'):
+        return subprocess.CompletedProcess(cmd, -1, '', 'Job cancelled')
+
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    job['process'] = process
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        raise
+    finally:
+        job.pop('process', None)
+
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
+def _start_preview(job: Dict, fps: int, frame_step: int,
+                   notify: Callable[[Dict[str, Any]], None]) -> Callable[[bool], None]:
+    """
+    Encode the preview in a background thread while the full encode runs
+    Returns finish(cancel), which waits for the preview, killing it first
+    when cancel is set.
+    """
+    # The preview's FFmpeg process is tracked apart from job['process'],
+    # which belongs to the full encode
+    preview_run: Dict[str, Any] = {}
+    job['preview_status'] = 'processing'
+    notify(job)
+
+    def encode():
+        start_time = time.time()
+        if _process_preview(job, fps, frame_step, preview_run):
+            job['preview_status'] = 'ready'
+            logger.info(f"Job {job.get('id', 'unknown')} preview ready after {time.time() - start_time:.1f}s")
+        else:
+            job['preview_status'] = 'failed'
+        notify(job)
+
+    thread = threading.Thread(target=encode, daemon=True, name=f"Preview-{job.get('id', 'unknown')[:8]}")
+    thread.start()
+
+    def finish(cancel: bool) -> None:
+        if cancel:
+            preview_run['cancel_requested'] = True
+            process = preview_run.get('process')
+            if process and process.poll() is None:
+                process.kill()
+        thread.join()
+
+    return finish
+
+
+def _process_preview(job: Dict, fps: int, frame_step: int, preview_run: Dict) -> bool:
+    """Encode a small realtime VP9 preview from every Nth frame (preview_run tracks its process)"""
+    try:
+        width = min(Config.PREVIEW_WIDTH, job.get('width') or Config.PREVIEW_WIDTH)
+        height = None
+        if job.get('width') and job.get('height'):
+            height = round(job['height'] * width / job['width'])
+
+        preview_file = os.path.join(job['dir'], 'preview.webm')
+        cmd = [
+            'ffmpeg', '-y', '-v', 'error',
+            '-framerate', str(fps),
+            '-i', os.path.join(job['dir'], 'frame_%04d.png'),
+            '-vf', f'framestep={frame_step},scale={width}:-2'
+        ] + build_codec_args('vp9', 'realtime', width, height, job.get('has_alpha', True)) + [preview_file]
+
+        result = run_ffmpeg(preview_run, cmd, Config.MAX_PROCESSING_TIME_SECONDS)
+        if result.returncode != 0:
+            logger.error(f"Preview encoding failed: {result.stderr}")
+            return False
+
+        job['preview'] = preview_file
+        return True
+
+    except subprocess.TimeoutExpired:
+        logger.error(f"Preview timeout for job {job.get('id', 'unknown')}")
+        return False
+    except Exception as e:
+        logger.error(f"Preview processing error: {e}")
+        return False
+
+
+def _input_args(job: Dict, fps: int) -> List[str]:
+    """FFmpeg input options: the collapsed-frame manifest if present, else the frame pattern"""
+    if 'manifest' in job:
+        return concat_input_args(job['manifest'])
+    return ['-framerate', str(fps), '-i', os.path.join(job['dir'], 'frame_%04d.png')]
+
+
+def _process_gif(job: Dict, fps: int, output_file: str, files: List[str],
+                 crop: Optional[Dict[str, Any]] = None) -> bool:
+    """Process GIF with palette optimization"""
+    try:
+        job_dir = job['dir']
+        palette_file = os.path.join(job_dir, 'palette.png')
+        pre_chain = f'{crop_filter(crop)},' if crop else ''
+        if 'manifest' not in job:
+            pre_chain += f'fps={fps},'
+
+        # First pass: generate palette
+        palette_cmd = ['ffmpeg', '-y', '-v', 'error'] + _input_args(job, fps) + [
+            '-vf', f'{pre_chain}scale=640:-1:flags=lanczos,palettegen=stats_mode=diff:transparency_color=ffffff',
+            palette_file
+        ]
+
+        result = run_ffmpeg(job, palette_cmd, Config.MAX_PROCESSING_TIME_SECONDS // 2)
+
+        if result.returncode != 0:
+            logger.error(f"Palette generation failed: {result.stderr}")
+            return False
+
+        # Second pass: create GIF
+        gif_cmd = ['ffmpeg', '-y', '-v', 'error'] + _input_args(job, fps) + [
+            '-i', palette_file,
+            '-lavfi', f'{pre_chain}scale=640:-1:flags=lanczos [x]; [x][1:v] paletteuse=dither=bayer:bayer_scale=5:diff_mode=rectangle',
+            '-gifflags', '+transdiff',
+            output_file
+        ]
+
+        result = run_ffmpeg(job, gif_cmd, Config.MAX_PROCESSING_TIME_SECONDS)
+
+        return result.returncode == 0
+
+    except subprocess.TimeoutExpired:
+        logger.error(f"GIF processing timeout for job {job.get('id', 'unknown')}")
+        return False
+    except Exception as e:
+        logger.error(f"GIF processing error: {e}")
+        return False
+
+
+def _process_video(job: Dict, fps: int, codec: str, quality: str, output_file: str, files: List[str],
+                   crop: Optional[Dict[str, Any]] = None, target_size: Optional[int] = None,
+                   stream_output: bool = False) -> bool:
+    """Process video with codec-specific options"""
+    try:
+        # Tuned codec arguments for the output size; sequences without any
+        # transparency skip the alpha plane
+        width, height = (crop['width'], crop['height']) if crop else (job.get('width'), job.get('height'))
+        codec_args = build_codec_args(codec, quality, width, height, job.get('has_alpha', True))
+        filter_args = ['-vf', crop_filter(crop)] if crop else []
+
+        # Players need to know where stacked outputs keep the alpha plane
+        if codec == 'h264_stacked':
+            job['alpha_layout'] = stacked_alpha_layout(width, height)
+
+        # Pick the rate-control setting for a target size from sample encodes
+        plan = None
+        if target_size:
+            plan = plan_target_size(
+                codec, quality, target_size,
+                [os.path.join(job['dir'], f'frame_{i:04d}.png') for i in range(len(files))],
+                fps, job['dir'],
+                encoded_frames=job.get('encoded_frames'),
+                width=width, height=height, has_alpha=job.get('has_alpha', True),
+                filter_args=filter_args,
+                run=lambda cmd: run_ffmpeg(job, cmd, Config.MAX_PROCESSING_TIME_SECONDS // 2)
+            )
+            codec_args = plan['args']
+            job['target_size'] = plan_summary(plan)
+
+        # Long encodes run as checkpointed segments, so a worker that picks up
+        # a reclaimed job resumes after the last finished segment
+        segment_frames = Config.RESUMABLE_SEGMENT_FRAMES
+        if not (segment_frames and is_segmentable(codec) and 'manifest' not in job and len(files) > segment_frames):
+            segment_frames = 0
+
+        # Streamed outputs are written in one pass straight to the final file
+        if stream_output and streaming_args(codec):
+            codec_args = codec_args + streaming_args(codec)
+            segment_frames = 0
+            job['stream_path'] = output_file
+
+        def encode(args: List[str]) -> bool:
+            if segment_frames:
+                return _encode_segments(job, fps, args, filter_args, output_file, len(files), segment_frames)
+
+            cmd = ['ffmpeg', '-y', '-v', 'error'] + _input_args(job, fps) + join_filter_args(args, filter_args)
+            if 'manifest' in job:
+                cmd.extend(VFR_OUTPUT_ARGS)
+            cmd.append(output_file)
+
+            # Run with timeout; the process is tracked on the job for cancellation
+            result = run_ffmpeg(job, cmd, Config.MAX_PROCESSING_TIME_SECONDS)
+            if result.returncode != 0:
+                logger.error(f"Video encoding failed: {result.stderr}")
+            return result.returncode == 0
+
+        try:
+            if not encode(codec_args):
+                return False
+
+            # One correction pass if the full encode still missed the target
+            if plan and Config.TARGET_SIZE_CORRECTION_PASS:
+                corrected = correct_plan(plan, os.path.getsize(output_file))
+                if corrected:
+                    logger.info(f"Job {job.get('id', 'unknown')} missed target size; re-encoding "
+                                f"with {plan_summary(corrected)['setting']}")
+                    job['target_size'] = plan_summary(corrected)
+                    return encode(corrected['args'])
+            return True
+        except subprocess.TimeoutExpired:
+            logger.error(f"Video processing timeout for job {job.get('id', 'unknown')}")
+            return False
+
+    except Exception as e:
+        logger.error(f"Video processing error: {e}")
+        return False
+
+
+def _encode_segments(job: Dict, fps: int, codec_args: List[str], filter_args: List[str], output_file: str,
+                     frame_count: int, segment_frames: int) -> bool:
+    """Resumable encode (see segments.encode_resumable); the time limit covers this run's segments"""
+    work_dir = os.path.join(job['dir'], 'segments')
+    deadline = time.time() + Config.MAX_PROCESSING_TIME_SECONDS
+
+    def on_segment(index: int, total: int, resumed: bool) -> None:
+        job['progress'] = int((index + 1) * 100 / total)
+        if resumed:
+            logger.info(f"Job {job.get('id', 'unknown')}: resumed segment {index + 1}/{total} from checkpoint")
+
+    result = encode_resumable(
+        os.path.join(job['dir'], 'frame_%04d.png'), 0, frame_count, fps, codec_args, output_file,
+        work_dir, segment_frames, filter_args,
+        run=lambda cmd: run_ffmpeg(job, cmd, max(1, int(deadline - time.time()))),
+        on_segment=on_segment
+    )
+    if result.returncode != 0:
+        logger.error(f"Segment encoding failed: {result.stderr}")
+        return False
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return True
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Encode Worker
+Standalone process that claims jobs from the shared job queue and runs the
+encode, so encoding can scale independently of the web tier
+"""
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Any, Dict
+
+from config import Config
+from encode_pipeline import job_snapshot, run_job, run_transcode
+from job_queue import JobQueue
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('encode_worker')
+
+
+class Heartbeat(threading.Thread):
+    """Renews a job's lease while it encodes, and relays cancellation"""
+
+    def __init__(self, queue: JobQueue, job_id: str, worker_id: str, job: Dict[str, Any]):
+        super().__init__(daemon=True, name=f'Heartbeat-{job_id[:8]}')
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.job = job
+        self.interval = max(1.0, queue.lease_seconds / 3)
+        self.lost_lease = False
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.beat()
+
+    def beat(self, _job=None):
+        """Publish progress; stop the encode if cancelled or the lease was lost"""
+        try:
+            state = self.queue.heartbeat(self.job_id, self.worker_id, job_snapshot(self.job))
+        except Exception as e:
+            logger.warning(f"Heartbeat failed for job {self.job_id}: {e}")
+            return
+
+        if state['cancel_requested'] or not state['leased']:
+            self.lost_lease = not state['leased']
+            self.job['cancel_requested'] = True
+            process = self.job.get('process')
+            if process and process.poll() is None:
+                process.kill()
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def process_claimed(queue: JobQueue, record: Dict[str, Any], worker_id: str) -> None:
+    """Run one claimed job and write its result back to the queue"""
+    job_id = record['id']
+    job = record['job']
+    job['status'] = 'processing'
+    logger.info(f"Claimed job {job_id} (attempt {record['attempts']})")
+
+    heartbeat = Heartbeat(queue, job_id, worker_id, job)
+    heartbeat.start()
+    try:
+        # Transcode jobs are flagged in their parameters
+        params = dict(record['params'])
+        runner = run_transcode if params.pop('transcode', False) else run_job
+        runner(job, on_update=heartbeat.beat, **params)
+    finally:
+        heartbeat.stop()
+        process = job.get('process')
+        if process and process.poll() is None:
+            process.kill()
+
+    if heartbeat.lost_lease:
+        logger.warning(f"Lost lease on job {job_id}; discarding result")
+        return
+
+    if not queue.finish(job_id, worker_id, job_snapshot(job)):
+        logger.warning(f"Job {job_id} was reclaimed before it finished")
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Claim and encode jobs from the shared job queue')
+    parser.add_argument('--queue', default=Config.JOB_QUEUE_PATH,
+                        help='Path to the SQLite job queue (default: JOB_QUEUE_PATH)')
+    parser.add_argument('--worker-id', default=f'{socket.gethostname()}-{os.getpid()}',
+                        help='Identifier recorded on claimed jobs (default: host-pid)')
+    parser.add_argument('--poll-interval', type=float, default=Config.WORKER_POLL_INTERVAL,
+                        help='Seconds to wait when the queue is empty')
+    parser.add_argument('--once', action='store_true',
+                        help='Exit as soon as the queue is empty')
+    args = parser.parse_args()
+
+    if not args.queue:
+        print("Error: No job queue configured. Pass --queue or set JOB_QUEUE_PATH.")
+        return 1
+
+    queue = JobQueue(args.queue, lease_seconds=Config.JOB_LEASE_SECONDS,
+                     max_attempts=Config.JOB_MAX_ATTEMPTS)
+
+    # Treat SIGTERM like Ctrl-C so the running FFmpeg is killed; the job's
+    # lease then expires and another worker reclaims it
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+
+    logger.info(f"Worker {args.worker_id} polling {args.queue}")
+    try:
+        while True:
+            record = queue.claim(args.worker_id)
+            if record is None:
+                if args.once:
+                    break
+                time.sleep(args.poll_interval)
+                continue
+            process_claimed(queue, record, args.worker_id)
+    except KeyboardInterrupt:
+        logger.info(f"Worker {args.worker_id} shutting down")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,344 @@
+"""
+Encoding Profiles
+Single registry mapping (codec, quality tier, resolution) to tuned FFmpeg arguments,
+shared by the CLI and every web backend
+"""
+
+import math
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+QUALITY_TIERS = ('realtime', 'good', 'best')
+DEFAULT_QUALITY = 'good'
+
+# Web API codec names that differ from the CLI/FFmpeg names
+CODEC_ALIASES = {'prores': 'prores_ks'}
+
+OUTPUT_EXTENSIONS = {
+    'vp9': 'webm',
+    'vp8': 'webm',
+    'gif': 'gif',
+    'prores_ks': 'mov',
+    'qtrle': 'mov',
+    'png': 'mov',
+    'webp': 'webp',
+    'webp_lossless': 'webp',
+    'apng': 'apng',
+    'ffv1': 'mkv',
+    'h264_stacked': 'mp4',
+}
+
+# Muxer options for outputs that can be read while they are still being
+# written: WebM without seeking back for cues, fragmented MOV
+STREAMING_OUTPUT_ARGS = {
+    'webm': ['-live', '1'],
+    'mov': ['-movflags', 'frag_keyframe+empty_moov+default_base_moof'],
+}
+
+# VP9 constant-quality CRF by output height (libvpx VOD recommendations),
+# shifted per quality tier
+VP9_CRF_BY_HEIGHT = [(240, 37), (360, 36), (480, 33), (720, 32), (1080, 31), (1440, 24), (2160, 15)]
+VP9_CRF_OFFSET = {'realtime': 4, 'good': 0, 'best': -4}
+
+# libvpx speed settings. 'best' deliberately uses the 'good' deadline with
+# the lowest useful cpu-used instead of the much slower 'best' deadline, to
+# keep the top tier's encode time bounded. These values have not been
+# validated with recorded benchmark_profiles.py results yet; measure the
+# tiers on your own material before relying on them.
+VP9_SPEED = {
+    'realtime': ('realtime', 8),
+    'good': ('good', 4),
+    'best': ('good', 1),
+}
+VP8_SPEED = {
+    'realtime': ('realtime', 8),
+    'good': ('good', 2),
+    'best': ('good', 0),
+}
+VP8_CRF = {'realtime': 16, 'good': 10, 'best': 6}
+
+# VP8 CRF needs a bitrate ceiling; scale it with output height
+VP8_MAX_BITRATE_BY_HEIGHT = [(360, '1M'), (720, '2M'), (1080, '4M'), (2160, '8M')]
+
+# ProRes profile and pixel format per tier: 4444 (XQ for 'best') keeps the
+# alpha plane; opaque sequences drop to cheaper 4:2:2 profiles below 'best'
+PRORES_ALPHA = {
+    'realtime': ('4444', 'yuva444p10le'),
+    'good': ('4444', 'yuva444p10le'),
+    'best': ('4444xq', 'yuva444p10le'),
+}
+PRORES_OPAQUE = {
+    'realtime': ('standard', 'yuv422p10le'),
+    'good': ('hq', 'yuv422p10le'),
+    'best': ('4444', 'yuv444p10le'),
+}
+
+# PNG-in-MOV and APNG: prediction and zlib effort per tier
+PNG_SPEED = {
+    'realtime': ('none', 1),
+    'good': ('paeth', 6),
+    'best': ('mixed', 9),
+}
+
+# Animated WebP: (quality, compression_level) per tier. compression_level
+# 0-6 is libwebp's speed/size trade-off (method); for lossless output
+# quality sets the effort spent on the entropy coding instead of fidelity.
+WEBP_LOSSY = {
+    'realtime': (70, 0),
+    'good': (80, 4),
+    'best': (90, 6),
+}
+WEBP_LOSSLESS = {
+    'realtime': (0, 0),
+    'good': (50, 3),
+    'best': (100, 6),
+}
+
+# FFV1 level 3 (lossless, intra-only) coder per tier: (coder, context).
+# Golomb-Rice is fastest; the range coder and large context model trade
+# encode speed for smaller files
+FFV1_CODER = {
+    'realtime': (0, 0),
+    'good': (1, 0),
+    'best': (1, 1),
+}
+
+# Slices are encoded on separate threads. FFV1 only accepts these counts;
+# each slice keeps at least this many pixels so it still compresses well
+FFV1_SLICE_COUNTS = (4, 6, 9, 12, 16, 24)
+FFV1_MIN_SLICE_PIXELS = 256 * 256
+
+# Stacked H.264: color and alpha (as gray) packed into one opaque frame that
+# any hardware decoder can play; a player shader samples both halves.
+# (preset, crf) per tier; alpha edges need a little more quality than usual
+H264_STACKED = {
+    'realtime': ('veryfast', 23),
+    'good': ('fast', 20),
+    'best': ('medium', 18),
+}
+
+# Largest frame dimension most hardware H.264 decoders accept; tall
+# sequences are packed side by side instead of on top of each other
+H264_MAX_DIMENSION = 4096
+
+# Animated image formats play once by default; loop forever like GIF
+WEBP_LOOP_ARGS = ['-loop', '0']
+APNG_LOOP_ARGS = ['-plays', '0']
+
+
+def normalize_codec(codec: str) -> str:
+    """Map web API codec names onto the registry names"""
+    return CODEC_ALIASES.get(codec, codec)
+
+
+def normalize_quality(quality: Optional[str]) -> str:
+    """Fall back to the default tier for unknown or missing quality names"""
+    return quality if quality in QUALITY_TIERS else DEFAULT_QUALITY
+
+
+def output_extension(codec: str) -> str:
+    """Container extension for a codec"""
+    return OUTPUT_EXTENSIONS.get(normalize_codec(codec), 'webm')
+
+
+def streaming_args(codec: str) -> Optional[List[str]]:
+    """Muxer options for a progressively readable output, or None if the container can't stream"""
+    return STREAMING_OUTPUT_ARGS.get(output_extension(codec))
+
+
+def _by_height(table, height: Optional[int]):
+    """Pick the first table entry whose height bound covers the output"""
+    if not height:
+        height = 720
+    for bound, value in table:
+        if height <= bound:
+            return value
+    return table[-1][1]
+
+
+def vp9_tile_columns(width: Optional[int]) -> int:
+    """log2 of the tile column count; VP9 tiles must be at least 256px wide"""
+    if not width or width < 512:
+        return 0
+    return min(6, int(math.log2(width / 256)))
+
+
+def ffv1_slices(width: Optional[int], height: Optional[int], cpu_count: Optional[int] = None) -> int:
+    """About one slice per core, limited by the frame size"""
+    cores = cpu_count or os.cpu_count() or 1
+    max_slices = (width or 1280) * (height or 720) // FFV1_MIN_SLICE_PIXELS
+    counts = [n for n in FFV1_SLICE_COUNTS if n <= max_slices] or [FFV1_SLICE_COUNTS[0]]
+    return next((n for n in counts if n >= cores), counts[-1])
+
+
+def _vp9_args(quality: str, width: Optional[int], height: Optional[int], has_alpha: bool) -> List[str]:
+    deadline, cpu_used = VP9_SPEED[quality]
+    crf = max(0, min(63, _by_height(VP9_CRF_BY_HEIGHT, height) + VP9_CRF_OFFSET[quality]))
+    return [
+        '-c:v', 'libvpx-vp9', '-pix_fmt', 'yuva420p' if has_alpha else 'yuv420p',
+        '-deadline', deadline, '-cpu-used', str(cpu_used),
+        '-crf', str(crf), '-b:v', '0',
+        '-row-mt', '1', '-tile-columns', str(vp9_tile_columns(width)),
+    ]
+
+
+def _vp8_args(quality: str, width: Optional[int], height: Optional[int], has_alpha: bool) -> List[str]:
+    deadline, cpu_used = VP8_SPEED[quality]
+    return [
+        '-c:v', 'libvpx', '-pix_fmt', 'yuva420p' if has_alpha else 'yuv420p',
+        '-deadline', deadline, '-cpu-used', str(cpu_used),
+        '-crf', str(VP8_CRF[quality]), '-b:v', _by_height(VP8_MAX_BITRATE_BY_HEIGHT, height),
+    ]
+
+
+def _prores_args(quality: str, width: Optional[int], height: Optional[int], has_alpha: bool) -> List[str]:
+    profile, pix_fmt = (PRORES_ALPHA if has_alpha else PRORES_OPAQUE)[quality]
+    return ['-c:v', 'prores_ks', '-profile:v', profile, '-pix_fmt', pix_fmt, '-vendor', 'apl0']
+
+
+def _qtrle_args(quality: str, width: Optional[int], height: Optional[int], has_alpha: bool) -> List[str]:
+    return ['-c:v', 'qtrle', '-pix_fmt', 'argb' if has_alpha else 'rgb24']
+
+
+def _png_args(quality: str, width: Optional[int], height: Optional[int], has_alpha: bool) -> List[str]:
+    pred, level = PNG_SPEED[quality]
+    return [
+        '-c:v', 'png', '-pix_fmt', 'rgba' if has_alpha else 'rgb24',
+        '-pred', pred, '-compression_level', str(level),
+    ]
+
+
+def _webp_args(quality: str, width: Optional[int], height: Optional[int], has_alpha: bool) -> List[str]:
+    q, level = WEBP_LOSSY[quality]
+    return [
+        '-c:v', 'libwebp', '-pix_fmt', 'yuva420p' if has_alpha else 'yuv420p',
+        '-lossless', '0', '-quality', str(q), '-compression_level', str(level),
+    ] + WEBP_LOOP_ARGS
+
+
+def _webp_lossless_args(quality: str, width: Optional[int], height: Optional[int], has_alpha: bool) -> List[str]:
+    q, level = WEBP_LOSSLESS[quality]
+    # libwebp takes no RGB format without alpha; an all-opaque alpha plane
+    # costs next to nothing in lossless mode
+    return [
+        '-c:v', 'libwebp', '-pix_fmt', 'bgra',
+        '-lossless', '1', '-quality', str(q), '-compression_level', str(level),
+    ] + WEBP_LOOP_ARGS
+
+
+def _apng_args(quality: str, width: Optional[int], height: Optional[int], has_alpha: bool) -> List[str]:
+    pred, level = PNG_SPEED[quality]
+    return [
+        '-c:v', 'apng', '-pix_fmt', 'rgba' if has_alpha else 'rgb24',
+        '-pred', pred, '-compression_level', str(level), '-f', 'apng',
+    ] + APNG_LOOP_ARGS
+
+
+def _ffv1_args(quality: str, width: Optional[int], height: Optional[int], has_alpha: bool) -> List[str]:
+    coder, context = FFV1_CODER[quality]
+    return [
+        '-c:v', 'ffv1', '-level', '3', '-pix_fmt', 'bgra' if has_alpha else 'gbrp',
+        '-coder', str(coder), '-context', str(context), '-g', '1',
+        '-slices', str(ffv1_slices(width, height)), '-slicecrc', '1',
+    ]
+
+
+def stacked_alpha_layout(width: Optional[int], height: Optional[int]) -> Dict[str, Any]:
+    """
+    Where a stacked H.264 frame keeps color and alpha
+
+    Rectangles are [x, y, width, height] in pixels of the decoded frame; the
+    alpha half is gray, so any channel holds the (straight, not
+    premultiplied) alpha value. Frames are padded to even dimensions.
+    """
+    width, height = width or 1280, height or 720
+    width, height = width + width % 2, height + height % 2
+    vertical = 2 * height <= H264_MAX_DIMENSION or 2 * width > H264_MAX_DIMENSION
+    return {
+        'layout': 'vertical' if vertical else 'horizontal',
+        'width': width,
+        'height': height,
+        'color': [0, 0, width, height],
+        'alpha': [0, height, width, height] if vertical else [width, 0, width, height],
+        'premultiplied': False,
+    }
+
+
+def _h264_stacked_args(quality: str, width: Optional[int], height: Optional[int], has_alpha: bool) -> List[str]:
+    preset, crf = H264_STACKED[quality]
+    layout = stacked_alpha_layout(width, height)['layout']
+    stack = 'vstack' if layout == 'vertical' else 'hstack'
+    return [
+        '-vf', (
+            'format=rgba,pad=ceil(iw/2)*2:ceil(ih/2)*2:color=black@0,split[color][mask];'
+            f'[mask]alphaextract,format=rgba[alpha];[color][alpha]{stack},format=yuv420p'
+        ),
+        '-c:v', 'libx264', '-preset', preset, '-crf', str(crf), '-pix_fmt', 'yuv420p',
+        '-movflags', '+faststart+use_metadata_tags', '-metadata', f'alpha_layout={layout}',
+    ]
+
+
+ProfileBuilder = Callable[[str, Optional[int], Optional[int], bool], List[str]]
+
+PROFILES: Dict[str, ProfileBuilder] = {
+    'vp9': _vp9_args,
+    'vp8': _vp8_args,
+    'prores_ks': _prores_args,
+    'qtrle': _qtrle_args,
+    'png': _png_args,
+    'webp': _webp_args,
+    'webp_lossless': _webp_lossless_args,
+    'apng': _apng_args,
+    'ffv1': _ffv1_args,
+    'h264_stacked': _h264_stacked_args,
+}
+
+
+def build_codec_args(codec: str, quality: Optional[str] = DEFAULT_QUALITY, width: Optional[int] = None,
+                     height: Optional[int] = None, has_alpha: bool = True) -> List[str]:
+    """
+    FFmpeg output arguments for a codec profile
+
+    Args:
+        codec: Registry or web API codec name; unknown codecs are passed
+               straight to -c:v
+        quality: Quality tier ('realtime', 'good' or 'best')
+        width, height: Output dimensions (after any crop), used for tiling
+                       and rate control; None assumes 720p
+        has_alpha: Whether to keep the alpha plane
+    """
+    codec = normalize_codec(codec)
+    builder = PROFILES.get(codec)
+    if builder is None:
+        return ['-c:v', codec]
+    return builder(normalize_quality(quality), width, height, has_alpha)
+
+
+def container_args(codec_args: List[str]) -> List[str]:
+    """
+    The container options (movflags, metadata tags) in a profile's arguments
+
+    A stream-copy join of segments has to repeat these, or the joined file
+    loses e.g. faststart and the alpha_layout tag of stacked H.264.
+    """
+    args: List[str] = []
+    for index, option in enumerate(codec_args[:-1]):
+        if option in ('-movflags', '-metadata'):
+            args += [option, codec_args[index + 1]]
+    return args
+
+
+def join_filter_args(codec_args: List[str], filter_args: Optional[List[str]]) -> List[str]:
+    """
+    Codec arguments plus output filters (e.g. a crop)
+
+    Profiles that bring their own -vf chain get the filters prepended to it,
+    since FFmpeg only honours one -vf per output.
+    """
+    if not filter_args:
+        return codec_args
+    if '-vf' not in codec_args or '-vf' not in filter_args:
+        return codec_args + filter_args
+    index = codec_args.index('-vf') + 1
+    chain = filter_args[filter_args.index('-vf') + 1]
+    return codec_args[:index] + [f'{chain},{codec_args[index]}'] + codec_args[index + 1:]
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Fake FFmpeg
+Stand-in for ffmpeg/ffprobe that simulates encode time and CPU load without
+encoding anything, so load tests can measure the web tier on its own.
+
+Install shims named ffmpeg and ffprobe into a directory and put it first on
+the server's (and workers') PATH:
+
+    python fake_ffmpeg.py --install /tmp/fake-ffmpeg
+    PATH=/tmp/fake-ffmpeg:$PATH python app_new.py
+
+Tuned with environment variables:
+    FAKE_FFMPEG_SECONDS_PER_FRAME  simulated encode time per frame (default 0.01)
+    FAKE_FFMPEG_CPU                share of that time spent busy on a CPU, 0-1 (default 1.0)
+    FAKE_FFMPEG_BYTES_PER_FRAME    output bytes written per frame (default 20000)
+    FAKE_FFMPEG_FAIL_RATE          probability that an encode fails, 0-1 (default 0)
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import stat
+import sys
+import time
+
+# Encoders and pixel formats reported to the capability probe
+ENCODERS = ['libvpx-vp9', 'libvpx', 'prores_ks', 'qtrle', 'png', 'libwebp', 'apng', 'gif', 'ffv1', 'libx264']
+PIX_FMTS = ['yuva420p', 'yuva444p10le', 'rgba', 'bgra', 'gbrap', 'yuv420p']
+
+# Frames assumed for video inputs (transcodes, which don't state a count)
+DEFAULT_INPUT_FRAMES = 100
+
+# Output is written in this many pieces over the simulated encode time, so
+# progressive downloads see it grow
+WRITE_STEPS = 10
+
+_SHIM = '#!/bin/sh\nexec "{python}" "{script}" --as {tool} "$@"\n'
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _option(args, name):
+    """Value following the last occurrence of an option, or None"""
+    for index in range(len(args) - 2, -1, -1):
+        if args[index] == name:
+            return args[index + 1]
+    return None
+
+
+def count_input_frames(args) -> int:
+    """Frames the real FFmpeg would read for this command"""
+    limit = _option(args, '-frames:v')
+    if limit is not None:
+        return int(limit)
+
+    source = _option(args, '-i') or ''
+    if _option(args, '-f') == 'concat' and os.path.exists(source):
+        with open(source) as f:
+            return sum(1 for line in f if line.startswith('file '))
+
+    # Image sequence pattern, e.g. frame_%04d.png
+    pattern = re.sub(r'%0?(\d*)d', lambda m: '[0-9]' * int(m.group(1) or 1), source)
+    if pattern != source:
+        return len(glob.glob(pattern)) or 1
+    return DEFAULT_INPUT_FRAMES
+
+
+def simulate(seconds: float, cpu_share: float) -> None:
+    """Spend seconds of wall time, cpu_share of it busy on one core"""
+    busy_until = time.perf_counter() + seconds * cpu_share
+    while time.perf_counter() < busy_until:
+        pass
+    idle = seconds * (1 - cpu_share)
+    if idle > 0:
+        time.sleep(idle)
+
+
+def run_ffmpeg(args) -> int:
+    if '-version' in args:
+        print('ffmpeg version 0.0-fake Copyright (c) load-test stand-in')
+        return 0
+    if '-encoders' in args:
+        print('Encoders:\n V..... = Video\n ------')
+        for name in ENCODERS:
+            print(f' V....D {name:<20} simulated')
+        return 0
+    if '-pix_fmts' in args:
+        print('Pixel formats:\nFLAGS NAME NB_COMPONENTS BITS_PER_PIXEL BIT_DEPTHS\n-----')
+        for name in PIX_FMTS:
+            print(f'IO... {name:<20} 4 32 8-8-8-8')
+        return 0
+    if not args:
+        return 1
+
+    output_file = args[-1]
+    frames = count_input_frames(args)
+    seconds = frames * _env_float('FAKE_FFMPEG_SECONDS_PER_FRAME', 0.01)
+    cpu_share = min(1.0, max(0.0, _env_float('FAKE_FFMPEG_CPU', 1.0)))
+    size = int(frames * _env_float('FAKE_FFMPEG_BYTES_PER_FRAME', 20000))
+    fail = random.random() < _env_float('FAKE_FFMPEG_FAIL_RATE', 0.0)
+    progress = '-progress' in args
+
+    with open(output_file, 'wb') as f:
+        for step in range(WRITE_STEPS):
+            simulate(seconds / WRITE_STEPS, cpu_share)
+            if fail and step == WRITE_STEPS // 2:
+                print('Simulated encoder failure', file=sys.stderr)
+                return 1
+            f.write(b'\0' * (size * (step + 1) // WRITE_STEPS - size * step // WRITE_STEPS))
+            f.flush()
+            if progress:
+                print(f'frame={frames * (step + 1) // WRITE_STEPS}\nprogress=continue', flush=True)
+    if progress:
+        print('progress=end', flush=True)
+    return 0
+
+
+def run_ffprobe(args) -> int:
+    """A 2-second 320x240 ProRes 4444 clip for any existing file"""
+    if not args or not os.path.exists(args[-1]):
+        print(f'{args[-1] if args else ""}: No such file or directory', file=sys.stderr)
+        return 1
+    print(json.dumps({
+        'streams': [{
+            'codec_name': 'prores', 'pix_fmt': 'yuva444p10le', 'width': 320, 'height': 240,
+            'r_frame_rate': '24/1', 'avg_frame_rate': '24/1', 'nb_frames': '48',
+        }],
+        'format': {'format_name': 'mov,mp4,m4a,3gp,3g2,mj2', 'duration': '2.000000'},
+    }))
+    return 0
+
+
+def install(directory: str) -> None:
+    """Write ffmpeg and ffprobe shims that run this script into directory"""
+    os.makedirs(directory, exist_ok=True)
+    for tool in ('ffmpeg', 'ffprobe'):
+        path = os.path.join(directory, tool)
+        with open(path, 'w') as f:
+            f.write(_SHIM.format(python=sys.executable, script=os.path.abspath(__file__), tool=tool))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == '--as':
+        tool, args = sys.argv[2], sys.argv[3:]
+        return run_ffprobe(args) if tool == 'ffprobe' else run_ffmpeg(args)
+
+    parser = argparse.ArgumentParser(description='Simulated FFmpeg for load tests')
+    parser.add_argument('--install', metavar='DIR', required=True,
+                        help='Write ffmpeg and ffprobe shims into DIR (put it first on PATH)')
+    args = parser.parse_args()
+    install(args.install)
+    print(f"Installed fake ffmpeg and ffprobe in {args.install}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+FFmpeg Capabilities
+Probes the installed FFmpeg once for its version, encoders and pixel formats,
+caches the result on disk keyed by the binary's path and modification time,
+and maps requested codecs onto encoders the build actually has
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+from typing import Any, Dict, List, Optional
+
+from encoding_profiles import normalize_codec
+
+# FFmpeg encoder behind each registry codec
+CODEC_ENCODERS = {
+    'vp9': 'libvpx-vp9',
+    'vp8': 'libvpx',
+    'prores_ks': 'prores_ks',
+    'qtrle': 'qtrle',
+    'png': 'png',
+    'webp': 'libwebp',
+    'webp_lossless': 'libwebp',
+    'apng': 'apng',
+    'gif': 'gif',
+    'ffv1': 'ffv1',
+    'h264_stacked': 'libx264',
+}
+
+# Alpha-capable substitutes when a codec's encoder is missing: same
+# container first, then fastest to encode first. Both WebP variants need
+# libwebp, so they never stand in for each other.
+CODEC_FALLBACKS = {
+    'vp9': ['vp8'],
+    'vp8': ['vp9'],
+    'prores_ks': ['qtrle', 'png'],
+    'qtrle': ['png', 'prores_ks'],
+    'png': ['qtrle', 'prores_ks'],
+    'webp': ['apng', 'gif'],
+    'webp_lossless': ['apng', 'gif'],
+    'apng': ['webp_lossless', 'gif'],
+    'gif': ['apng', 'webp'],
+    'ffv1': ['qtrle', 'png'],
+}
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.getenv('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'transparent-video', 'ffmpeg_capabilities.json'
+)
+
+# Table rows of `ffmpeg -encoders` ("V....D libvpx-vp9  description") and
+# `ffmpeg -pix_fmts` ("IO... yuva420p  4  20  8-8-8-8")
+_ENCODER_LINE = re.compile(r'^\s*([VAS][.A-Z]{5})\s+(\S+)')
+_PIX_FMT_LINE = re.compile(r'^\s*([.A-Z]{5})\s+(\S+)\s+\d+\s+\d+')
+
+_cache: Dict[str, Dict[str, Any]] = {}
+_lock = threading.Lock()
+
+
+def _run(args: List[str]) -> str:
+    return subprocess.run(args, capture_output=True, text=True, timeout=30).stdout
+
+
+def _table_rows(output: str) -> List[str]:
+    """Lines after the dashed separator that ends FFmpeg's legend"""
+    lines = output.splitlines()
+    for index, line in enumerate(lines):
+        if line.strip().startswith('---'):
+            return lines[index + 1:]
+    return lines
+
+
+def parse_encoders(output: str) -> List[str]:
+    """Video encoder names from `ffmpeg -encoders`"""
+    return sorted(m.group(2) for m in map(_ENCODER_LINE.match, _table_rows(output))
+                  if m and m.group(1).startswith('V'))
+
+
+def parse_pix_fmts(output: str) -> List[str]:
+    """Pixel formats FFmpeg can write (-pix_fmts rows flagged O)"""
+    return sorted(m.group(2) for m in map(_PIX_FMT_LINE.match, _table_rows(output))
+                  if m and m.group(1)[1] == 'O')
+
+
+def probe(binary: str) -> Dict[str, Any]:
+    """Run FFmpeg to list what it can do (uncached)"""
+    version_line = _run([binary, '-hide_banner', '-version']).partition('\n')[0]
+    version = re.match(r'ffmpeg version (\S+)', version_line)
+    return {
+        'available': True,
+        'version': version.group(1) if version else version_line,
+        'encoders': parse_encoders(_run([binary, '-hide_banner', '-encoders'])),
+        'pix_fmts': parse_pix_fmts(_run([binary, '-hide_banner', '-pix_fmts'])),
+    }
+
+
+def get_capabilities(binary: str = 'ffmpeg', cache_path: Optional[str] = DEFAULT_CACHE_PATH) -> Dict[str, Any]:
+    """
+    Capabilities of the FFmpeg on PATH (or at binary)
+
+    Probed once per binary path and mtime: results are kept in memory and,
+    when cache_path is set, in a JSON file shared across restarts, so
+    upgrading FFmpeg invalidates them. A missing binary reports
+    available=False.
+    """
+    path = shutil.which(binary)
+    if path is None:
+        return {'available': False, 'path': None, 'version': None, 'encoders': [], 'pix_fmts': []}
+    path = os.path.realpath(path)
+    key = f'{path}:{os.stat(path).st_mtime_ns}'
+
+    with _lock:
+        if key in _cache:
+            return _cache[key]
+
+        stored: Dict[str, Any] = {}
+        if cache_path:
+            try:
+                with open(cache_path) as f:
+                    stored = json.load(f)
+            except (OSError, ValueError):
+                stored = {}
+
+        capabilities = stored.get(key)
+        if capabilities is None:
+            try:
+                capabilities = dict(probe(path), path=path)
+            except (OSError, subprocess.SubprocessError):
+                return {'available': False, 'path': path, 'version': None, 'encoders': [], 'pix_fmts': []}
+            if cache_path:
+                # Entries for other binaries (or older builds of this one) are dropped
+                stored = {k: v for k, v in stored.items() if not k.startswith(f'{path}:')}
+                stored[key] = capabilities
+                tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+                try:
+                    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+                    with open(tmp_path, 'w') as f:
+                        json.dump(stored, f)
+                    os.replace(tmp_path, cache_path)
+                except OSError:
+                    pass
+
+        _cache[key] = capabilities
+        return capabilities
+
+
+def has_codec(capabilities: Dict[str, Any], codec: str) -> bool:
+    """Whether FFmpeg has the encoder a registry codec needs"""
+    codec = normalize_codec(codec)
+    return CODEC_ENCODERS.get(codec, codec) in capabilities['encoders']
+
+
+def resolve_codec(capabilities: Dict[str, Any], codec: str) -> Optional[str]:
+    """The requested codec if available, else its first available fallback, else None"""
+    codec = normalize_codec(codec)
+    for candidate in [codec] + CODEC_FALLBACKS.get(codec, []):
+        if has_codec(capabilities, candidate):
+            return candidate
+    return None
+
+
+def capability_summary(capabilities: Dict[str, Any]) -> Dict[str, Any]:
+    """Client-facing view: FFmpeg version and which registry codecs can be encoded"""
+    return {
+        'available': capabilities['available'],
+        'version': capabilities['version'],
+        'codecs': {codec: has_codec(capabilities, codec) for codec in CODEC_ENCODERS},
+    }
@@ -0,0 +1,114 @@
+"""
+Duplicate Frame Collapsing
+Hashes frames on ingest and turns runs of identical consecutive frames into a
+single frame with a longer duration, described by an ffconcat manifest
+"""
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterable, List, Optional, Sequence, Tuple
+
+# Output option that keeps the per-frame durations from the manifest
+VFR_OUTPUT_ARGS = ['-fps_mode', 'vfr']
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def digest_hasher():
+    """
+    New hash object for frame digests
+    SHA-256, so browsers can compute the same digests with WebCrypto for
+    hash-first uploads (see frame_store)
+    """
+    return hashlib.sha256()
+
+
+def _hash_stream(stream: BinaryIO) -> str:
+    digest = digest_hasher()
+    for chunk in iter(lambda: stream.read(_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def frame_digest(source) -> str:
+    """
+    Content digest of a frame
+
+    Args:
+        source: File path, or a seekable binary stream (e.g. an uploaded file).
+                Streams are rewound to their original position afterwards.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return _hash_stream(f)
+
+    stream = getattr(source, 'stream', source)
+    position = stream.tell()
+    try:
+        return _hash_stream(stream)
+    finally:
+        stream.seek(position)
+
+
+def hash_frames(paths: Iterable[str], max_workers: Optional[int] = None) -> List[str]:
+    """Digest every frame in parallel (hashlib releases the GIL on large buffers)"""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(frame_digest, paths))
+
+
+def collapse_runs(paths: Sequence[str], digests: Sequence[str]) -> List[Tuple[str, int]]:
+    """
+    Group consecutive identical frames
+
+    Returns (path, frame_count) for each run. The final frame is always kept
+    as its own one-frame run so the output ends exactly like a constant
+    frame rate encode would.
+    """
+    if len(paths) != len(digests):
+        raise ValueError('Every frame needs a digest')
+
+    runs: List[Tuple[str, int]] = []
+    previous = None
+    for index, (path, digest) in enumerate(zip(paths, digests)):
+        is_last = index == len(paths) - 1
+        if digest == previous and not is_last:
+            runs[-1] = (runs[-1][0], runs[-1][1] + 1)
+        else:
+            runs.append((path, 1))
+        previous = digest
+    return runs
+
+
+def write_ffconcat(runs: Sequence[Tuple[str, int]], fps: float, manifest_path: str) -> str:
+    """
+    Write an ffconcat manifest giving each run its held duration
+
+    Durations are derived from cumulative frame boundaries rounded to whole
+    microseconds (the concat demuxer's precision), so rounding never drifts
+    across the sequence and total playback time matches the original.
+    Paths are written relative to the manifest when they share its directory.
+    """
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    lines = ['ffconcat version 1.0']
+    frame = 0
+    for path, count in runs:
+        start_us = round(frame * 1_000_000 / fps)
+        frame += count
+        end_us = round(frame * 1_000_000 / fps)
+
+        abs_path = os.path.abspath(path)
+        if os.path.dirname(abs_path) == manifest_dir:
+            abs_path = os.path.basename(abs_path)
+        escaped = abs_path.replace("'", "'\\''")
+        lines.append(f"file '{escaped}'")
+        lines.append(f'duration {(end_us - start_us) / 1_000_000:.6f}')
+
+    with open(manifest_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return manifest_path
+
+
+def concat_input_args(manifest_path: str) -> List[str]:
+    """FFmpeg input options for reading frames through an ffconcat manifest"""
+    return ['-f', 'concat', '-safe', '0', '-i', manifest_path]
@@ -0,0 +1,215 @@
+"""
+Content-Addressed Frame Store
+Keeps uploaded frames under their SHA-256 digest so repeated uploads of the
+same sequence only transfer the frames that changed. Job directories get hard
+links to stored frames; frames used by a live job are pinned, the rest are
+evicted least-recently-used once the store exceeds its size budget.
+"""
+
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from typing import BinaryIO, Dict, Iterable, List, Set
+
+from frame_dedupe import digest_hasher
+
+logger = logging.getLogger(__name__)
+
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def is_digest(value) -> bool:
+    """Whether value looks like a frame digest (lowercase hex SHA-256)"""
+    return isinstance(value, str) and bool(DIGEST_PATTERN.match(value))
+
+
+class FrameStore:
+    """
+    Reference-counted store of frames keyed by content digest
+
+    Stored files are read-only and shared by hard link, so they must never
+    be modified in place. Job directories on another filesystem (e.g. a
+    tmpfs staging area) get copies instead of links.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._entries: Dict[str, Dict[str, float]] = {}
+        self._refs: Dict[str, int] = {}
+        self._job_refs: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        self._warned_copy = False
+        os.makedirs(root, exist_ok=True)
+        self._scan()
+
+    def same_filesystem(self, path: str) -> bool:
+        """Whether frames can be hard-linked between the store and path"""
+        try:
+            return os.stat(self.root).st_dev == os.stat(path).st_dev
+        except OSError:
+            return False
+
+    def _scan(self) -> None:
+        """Rebuild the index from disk; modification time stands in for last use"""
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                digest = name.rsplit('.', 1)[0]
+                if not is_digest(digest):
+                    continue
+                stat = os.stat(os.path.join(dirpath, name))
+                self._entries[digest] = {'size': stat.st_size, 'last_used': stat.st_mtime}
+
+    def path(self, digest: str) -> str:
+        """Location of a stored frame (two-level fan-out keeps directories small)"""
+        return os.path.join(self.root, digest[:2], f'{digest}.png')
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return int(sum(e['size'] for e in self._entries.values()))
+
+    def missing(self, digests: Iterable[str]) -> List[str]:
+        """Digests not in the store (unique, in order); present ones count as used"""
+        now = time.time()
+        result: List[str] = []
+        seen: Set[str] = set()
+        with self._lock:
+            for digest in digests:
+                if digest in seen:
+                    continue
+                seen.add(digest)
+                entry = self._entries.get(digest)
+                if entry and os.path.exists(self.path(digest)):
+                    entry['last_used'] = now
+                else:
+                    self._entries.pop(digest, None)
+                    result.append(digest)
+        return result
+
+    def _insert(self, digest: str, temp_path: str) -> None:
+        """Move a fully written file into place (or drop it if already stored)"""
+        final_path = self.path(digest)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.chmod(temp_path, 0o444)
+        os.replace(temp_path, final_path)
+        with self._lock:
+            self._entries[digest] = {'size': os.path.getsize(final_path), 'last_used': time.time()}
+
+    def add(self, source: BinaryIO) -> str:
+        """
+        Store an uploaded frame, hashing it while it is written
+        Streams are rewound to their original position afterwards. Returns the digest.
+        """
+        stream = getattr(source, 'stream', source)
+        position = stream.tell()
+        hasher = digest_hasher()
+        fd, temp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in iter(lambda: stream.read(_CHUNK_SIZE), b''):
+                    hasher.update(chunk)
+                    out.write(chunk)
+            digest = hasher.hexdigest()
+            self._insert(digest, temp_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            stream.seek(position)
+
+        self.evict()
+        return digest
+
+    def adopt(self, path: str, digest: str) -> None:
+        """Add a frame already written elsewhere: a hard link, or a copy across filesystems"""
+        with self._lock:
+            if digest in self._entries:
+                return
+        temp_path = os.path.join(self.root, f'.{digest}.{threading.get_ident()}.tmp')
+        try:
+            os.link(path, temp_path)
+        except OSError:
+            if not self._warned_copy:
+                self._warned_copy = True
+                logger.warning(f"Frame store {self.root} can't hard-link {path}; copying frames instead")
+            try:
+                shutil.copyfile(path, temp_path)
+            except OSError as e:
+                # The job still has its frame; later uploads just resend it
+                logger.error(f"Failed to add frame {digest} to the store: {e}")
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                return
+        self._insert(digest, temp_path)
+        self.evict()
+
+    def link(self, digest: str, dest: str) -> None:
+        """Place a stored frame at dest: a hard link, or a copy across filesystems"""
+        source = self.path(digest)
+        try:
+            os.link(source, dest)
+        except OSError:
+            shutil.copyfile(source, dest)
+        with self._lock:
+            if digest in self._entries:
+                self._entries[digest]['last_used'] = time.time()
+
+    def acquire(self, job_id: str, digests: Iterable[str]) -> None:
+        """Pin a job's frames so they are not evicted while it runs"""
+        unique = list(dict.fromkeys(digests))
+        with self._lock:
+            for digest in unique:
+                self._refs[digest] = self._refs.get(digest, 0) + 1
+            self._job_refs.setdefault(job_id, []).extend(unique)
+
+    def release(self, job_id: str) -> None:
+        """Unpin a job's frames, then evict if the store is over budget"""
+        with self._lock:
+            for digest in self._job_refs.pop(job_id, []):
+                count = self._refs.get(digest, 0) - 1
+                if count > 0:
+                    self._refs[digest] = count
+                else:
+                    self._refs.pop(digest, None)
+        self.evict()
+
+    def evict(self) -> int:
+        """Remove least recently used unpinned frames until within budget; returns bytes freed"""
+        freed = 0
+        with self._lock:
+            total = sum(e['size'] for e in self._entries.values())
+            if total <= self.max_bytes:
+                return 0
+            candidates = sorted(
+                (e['last_used'], digest) for digest, e in self._entries.items() if digest not in self._refs
+            )
+            for _, digest in candidates:
+                if total <= self.max_bytes:
+                    break
+                size = self._entries.pop(digest)['size']
+                try:
+                    os.remove(self.path(digest))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                freed += size
+        return int(freed)
+
+    def stats(self) -> Dict[str, object]:
+        """Store usage for the stats endpoint"""
+        with self._lock:
+            total = sum(e['size'] for e in self._entries.values())
+            return {
+                'frames': len(self._entries),
+                'pinned_frames': len(self._refs),
+                'size_mb': round(total / (1024 * 1024), 1),
+                'budget_mb': round(self.max_bytes / (1024 * 1024), 1),
+            }
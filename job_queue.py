@@ -0,0 +1,375 @@
+"""
+Shared Job Queue
+SQLite-backed queue used to hand encode jobs from the web tier to standalone
+encode workers. Claimed jobs hold a lease that the worker renews with
+heartbeats; jobs whose lease expires (crashed or preempted worker) are
+reclaimed by the next worker to poll.
+
+Chunked jobs are split into frame segments that are leased individually,
+so many short-lived invocations (e.g. serverless functions) can encode one
+job in parallel and the last one joins the segments.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Queue states; 'processing' rows are leased to a worker. 'chunked' jobs
+# are never claimed whole: their segments are claimed from the chunks table.
+# 'uploaded' rows are never claimed; they let any instance start the job.
+UPLOADED = 'uploaded'
+QUEUED = 'queued'
+PROCESSING = 'processing'
+CHUNKED = 'chunked'
+DONE = 'done'
+TERMINAL_STATES = {'completed', 'failed', 'cancelled'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    job TEXT NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS chunks (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job_id, idx)
+);
+"""
+
+
+class JobQueue:
+    """
+    Job queue stored in a single SQLite file
+
+    The file can live on a filesystem shared by the web and worker hosts
+    (the default rollback journal is used rather than WAL, which needs shared
+    memory on a single host). Every operation opens its own connection, so
+    instances are safe to use from multiple threads.
+    """
+
+    def __init__(self, path: str, lease_seconds: int = 60, max_attempts: int = 3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        record = dict(row)
+        record['params'] = json.loads(record['params'])
+        record['job'] = json.loads(record['job'])
+        record['cancel_requested'] = bool(record['cancel_requested'])
+        return record
+
+    def register(self, job_id: str, job: Dict[str, Any]) -> None:
+        """Record an uploaded job that hasn't been submitted, so any instance can find and start it"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO jobs (id, status, params, job, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, UPLOADED, json.dumps({}), json.dumps(job), now, now)
+            )
+
+    def enqueue(self, job_id: str, job: Dict[str, Any], params: Dict[str, Any]) -> None:
+        """Add a job snapshot and its encode parameters to the queue"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO jobs (id, status, params, job, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, QUEUED, json.dumps(params), json.dumps(job), now, now)
+            )
+
+    def enqueue_chunked(self, job_id: str, job: Dict[str, Any], params: Dict[str, Any],
+                        ranges: List[Tuple[int, int]]) -> None:
+        """Add a job whose (start, count) frame ranges are claimed one at a time"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'INSERT OR REPLACE INTO jobs (id, status, params, job, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, CHUNKED, json.dumps(params), json.dumps(job), now, now)
+            )
+            conn.execute('DELETE FROM chunks WHERE job_id = ?', (job_id,))
+            conn.executemany(
+                'INSERT INTO chunks (job_id, idx, start, count, status) VALUES (?, ?, ?, ?, ?)',
+                [(job_id, index, start, count, QUEUED) for index, (start, count) in enumerate(ranges)]
+            )
+            conn.execute('COMMIT')
+
+    def _close_job(self, conn: sqlite3.Connection, row: sqlite3.Row, final: Dict[str, Any], now: float) -> None:
+        job = json.loads(row['job'])
+        job.update(final)
+        conn.execute(
+            'UPDATE jobs SET status = ?, job = ?, worker = NULL, updated_at = ? WHERE id = ?',
+            (final['status'], json.dumps(job), now, row['id'])
+        )
+
+    def claim_chunk(self, job_id: str, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Lease the next unencoded segment of a chunked job
+
+        Segments whose lease expired (the invocation was killed) are handed
+        out again. A cancelled job, or a segment that has failed max_attempts
+        times, closes the job instead. Returns None when nothing is claimable.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                job_row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+                if job_row is None or job_row['status'] != CHUNKED:
+                    conn.execute('COMMIT')
+                    return None
+
+                row = conn.execute(
+                    'SELECT * FROM chunks WHERE job_id = ? AND (status = ? OR (status = ? AND lease_expires < ?)) '
+                    'ORDER BY idx LIMIT 1',
+                    (job_id, QUEUED, PROCESSING, now)
+                ).fetchone()
+                final = None
+                if job_row['cancel_requested']:
+                    final = {'status': 'cancelled'}
+                elif row is not None and row['attempts'] >= self.max_attempts:
+                    final = {'status': 'failed', 'error': f"Segment {row['idx']} failed too many times"}
+                if final or row is None:
+                    if final:
+                        self._close_job(conn, job_row, final, now)
+                    conn.execute('COMMIT')
+                    return None
+
+                conn.execute(
+                    'UPDATE chunks SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1 '
+                    'WHERE job_id = ? AND idx = ?',
+                    (PROCESSING, worker_id, now + self.lease_seconds, job_id, row['idx'])
+                )
+                conn.execute('UPDATE jobs SET updated_at = ? WHERE id = ?', (now, job_id))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+        return {
+            'job': self._row_to_dict(job_row),
+            'index': row['idx'],
+            'start': row['start'],
+            'count': row['count'],
+            'attempt': row['attempts'] + 1,
+        }
+
+    def finish_chunk(self, job_id: str, index: int, worker_id: str, success: bool) -> bool:
+        """Mark a leased segment done, or return it for another attempt; ignored if the lease was lost"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'UPDATE chunks SET status = ?, worker = NULL, lease_expires = NULL '
+                'WHERE job_id = ? AND idx = ? AND worker = ? AND status = ?',
+                (DONE if success else QUEUED, job_id, index, worker_id, PROCESSING)
+            )
+        return cursor.rowcount == 1
+
+    def chunk_counts(self, job_id: str) -> Dict[str, int]:
+        """Segments of a chunked job by state ('queued', 'processing', 'done') plus 'total'"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT status, COUNT(*) AS n FROM chunks WHERE job_id = ? GROUP BY status', (job_id,)
+            ).fetchall()
+        counts = {QUEUED: 0, PROCESSING: 0, DONE: 0}
+        counts.update({row['status']: row['n'] for row in rows})
+        counts['total'] = sum(counts.values())
+        return counts
+
+    def claim_finalize(self, job_id: str, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Lease a chunked job whose segments are all done, to join them
+
+        The job moves to 'processing' like a claimed whole job, so it is
+        completed with finish(); if the lease expires it returns to
+        'chunked' and the next invocation joins the segments again.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(
+                    'UPDATE jobs SET status = ?, worker = NULL WHERE id = ? AND status = ? AND lease_expires < ? '
+                    'AND EXISTS (SELECT 1 FROM chunks WHERE job_id = jobs.id)',
+                    (CHUNKED, job_id, PROCESSING, now)
+                )
+                pending = conn.execute(
+                    'SELECT COUNT(*) FROM chunks WHERE job_id = ? AND status != ?', (job_id, DONE)
+                ).fetchone()[0]
+                cursor = conn.execute(
+                    'UPDATE jobs SET status = ?, worker = ?, lease_expires = ?, updated_at = ? '
+                    'WHERE id = ? AND status = ? AND cancel_requested = 0 AND ? = 0',
+                    (PROCESSING, worker_id, now + self.lease_seconds, now, job_id, CHUNKED, pending)
+                )
+                claimed = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return self._row_to_dict(claimed) if cursor.rowcount == 1 else None
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Lease the oldest runnable job to a worker
+
+        Runnable means queued, or processing with an expired lease (chunked
+        jobs excepted). Expired jobs that were cancelled, or already
+        attempted max_attempts times, are closed out instead.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                while True:
+                    row = conn.execute(
+                        'SELECT * FROM jobs WHERE (status = ? OR (status = ? AND lease_expires < ?)) '
+                        'AND id NOT IN (SELECT job_id FROM chunks) ORDER BY created_at LIMIT 1',
+                        (QUEUED, PROCESSING, now)
+                    ).fetchone()
+                    if row is None:
+                        conn.execute('COMMIT')
+                        return None
+
+                    # Abandoned jobs that were cancelled, or keep killing
+                    # their workers, are closed out instead of re-run
+                    final = None
+                    if row['cancel_requested']:
+                        final = {'status': 'cancelled'}
+                    elif row['attempts'] >= self.max_attempts:
+                        final = {'status': 'failed', 'error': 'Encode worker lost too many times'}
+                    if final:
+                        self._close_job(conn, row, final, now)
+                        continue
+
+                    conn.execute(
+                        'UPDATE jobs SET status = ?, worker = ?, lease_expires = ?, '
+                        'attempts = attempts + 1, updated_at = ? WHERE id = ?',
+                        (PROCESSING, worker_id, now + self.lease_seconds, now, row['id'])
+                    )
+                    claimed = conn.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone()
+                    conn.execute('COMMIT')
+                    return self._row_to_dict(claimed)
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def heartbeat(self, job_id: str, worker_id: str, job: Optional[Dict[str, Any]] = None) -> Dict[str, bool]:
+        """
+        Renew a worker's lease, optionally publishing the job's progress
+
+        Returns {'leased': ..., 'cancel_requested': ...}. A worker that has
+        lost its lease must stop and discard its work.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            if job is not None:
+                cursor = conn.execute(
+                    'UPDATE jobs SET lease_expires = ?, job = ?, updated_at = ? '
+                    'WHERE id = ? AND worker = ? AND status = ?',
+                    (now + self.lease_seconds, json.dumps(job), now, job_id, worker_id, PROCESSING)
+                )
+            else:
+                cursor = conn.execute(
+                    'UPDATE jobs SET lease_expires = ?, updated_at = ? '
+                    'WHERE id = ? AND worker = ? AND status = ?',
+                    (now + self.lease_seconds, now, job_id, worker_id, PROCESSING)
+                )
+            row = conn.execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+
+        return {
+            'leased': cursor.rowcount == 1,
+            'cancel_requested': bool(row and row['cancel_requested']),
+        }
+
+    def finish(self, job_id: str, worker_id: str, job: Dict[str, Any]) -> bool:
+        """Record a worker's final job state; ignored if the lease was lost"""
+        status = job.get('status')
+        if status not in TERMINAL_STATES:
+            raise ValueError(f'Cannot finish job with status {status!r}')
+
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET status = ?, job = ?, worker = NULL, lease_expires = NULL, updated_at = ? '
+                'WHERE id = ? AND worker = ? AND status = ?',
+                (status, json.dumps(job), time.time(), job_id, worker_id, PROCESSING)
+            )
+        return cursor.rowcount == 1
+
+    def request_cancel(self, job_id: str) -> Optional[str]:
+        """
+        Ask for a job to be cancelled and return its resulting status
+        Uploaded and queued jobs are cancelled immediately; running jobs are
+        stopped by their worker on its next heartbeat.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            if row['status'] in (UPLOADED, QUEUED, CHUNKED):
+                conn.execute(
+                    'UPDATE jobs SET status = ?, cancel_requested = 1, updated_at = ? WHERE id = ?',
+                    ('cancelled', now, job_id)
+                )
+                status = 'cancelled'
+            else:
+                conn.execute(
+                    'UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE id = ?', (now, job_id)
+                )
+                status = row['status']
+            conn.execute('COMMIT')
+        return status
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Current queue record for a job, or None"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def delete(self, job_id: str) -> None:
+        """Remove a job record (after its files have been cleaned up)"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+            conn.execute('DELETE FROM chunks WHERE job_id = ?', (job_id,))
+
+    def stats(self) -> Dict[str, int]:
+        """Number of jobs in each state"""
+        with self._connect() as conn:
+            rows = conn.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        return {row['status']: row['n'] for row in rows}
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Load Test
+Drives the full server-side flow (/upload -> /process -> /status polling ->
+/download) with synthetic PNG sequences from many concurrent users, and
+reports throughput, per-stage latency percentiles and error rates.
+
+Without --url a local app_new.py is started for the run; with --fake-ffmpeg
+it encodes through fake_ffmpeg.py, so the web tier's own overhead can be
+measured apart from encoding.
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from fake_ffmpeg import install as install_fake_ffmpeg
+
+STAGES = ('upload', 'process', 'encode', 'download', 'total')
+PERCENTILES = (50, 90, 95, 99)
+
+# Starts the app on a given port without the development server's debugger
+_SERVE = (
+    'import sys; from app_new import app; '
+    'app.run(host="127.0.0.1", port=int(sys.argv[1]), threaded=True, use_reloader=False)'
+)
+
+
+def synthetic_png(width: int, height: int, seed: int) -> bytes:
+    """RGBA PNG with a moving gradient and partial transparency, unique per seed"""
+    rows = []
+    for y in range(height):
+        row = bytearray([0])  # filter type: none
+        for x in range(width):
+            alpha = (x + y) * 255 // (width + height)
+            row += bytes(((x + seed) & 255, (y * 2 + seed) & 255, (seed >> 8) & 255, alpha))
+        rows.append(bytes(row))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(b''.join(rows), 1)) + chunk(b'IEND', b''))
+
+
+def multipart_body(files: List[Tuple[str, bytes]], field: str = 'files') -> Tuple[bytes, str]:
+    """multipart/form-data body and content type for (filename, data) pairs"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for filename, data in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: image/png\r\n\r\n'.encode() + data + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class Client:
+    """Minimal HTTP client; one connection per request, like independent users"""
+
+    def __init__(self, base_url: str, timeout: float):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        connection = connection_class(self.host, self.port, timeout=self.timeout)
+        try:
+            connection.request(method, self.prefix + path, body=body, headers=headers or {})
+            response = connection.getresponse()
+            return response.status, response.read()
+        finally:
+            connection.close()
+
+    def json(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Tuple[int, Dict[str, Any]]:
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        status, data = self.request(method, path, body, headers)
+        try:
+            return status, json.loads(data or b'{}')
+        except ValueError:
+            return status, {'error': data[:200].decode(errors='replace')}
+
+
+def run_flow(client: Client, index: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """One user's job end to end; returns per-stage seconds, or the stage that failed"""
+    result: Dict[str, Any] = {'ok': False, 'seconds': {}, 'bytes_up': 0, 'bytes_down': 0}
+
+    def fail(stage: str, status: Any, detail: Any) -> Dict[str, Any]:
+        result.update(failed_stage=stage, status=status, error=str(detail)[:200])
+        return result
+
+    try:
+        frames = [(f'frame_{i:04d}.png', synthetic_png(args.width, args.height, index * args.frames + i))
+                  for i in range(args.frames)]
+        body, content_type = multipart_body(frames)
+        result['bytes_up'] = len(body)
+
+        started = stage_start = time.perf_counter()
+        status, data = client.request('POST', '/upload', body, {'Content-Type': content_type})
+        result['seconds']['upload'] = time.perf_counter() - stage_start
+        if status != 200:
+            return fail('upload', status, data)
+        job_id = json.loads(data)['job_id']
+
+        stage_start = time.perf_counter()
+        status, response = client.json('POST', f'/process/{job_id}', {
+            'fps': args.fps, 'codec': args.codec, 'quality': args.quality, 'preview': False
+        })
+        result['seconds']['process'] = time.perf_counter() - stage_start
+        if status != 200:
+            return fail('process', status, response.get('error'))
+
+        stage_start = time.perf_counter()
+        deadline = stage_start + args.job_timeout
+        while True:
+            status, response = client.json('GET', f'/status/{job_id}')
+            if status != 200:
+                return fail('encode', status, response.get('error'))
+            if response['status'] not in ('uploaded', 'queued', 'processing'):
+                break
+            if time.perf_counter() > deadline:
+                return fail('encode', 'timeout', f'still {response["status"]} after {args.job_timeout}s')
+            time.sleep(args.poll_interval)
+        result['seconds']['encode'] = time.perf_counter() - stage_start
+        if response['status'] != 'completed':
+            return fail('encode', response['status'], response.get('error'))
+        result['processing_time'] = response.get('processing_time', 0)
+
+        stage_start = time.perf_counter()
+        status, data = client.request('GET', f'/download/{job_id}')
+        result['seconds']['download'] = time.perf_counter() - stage_start
+        if status != 200:
+            return fail('download', status, data[:200])
+        result['bytes_down'] = len(data)
+    except (OSError, http.client.HTTPException, ValueError, KeyError) as e:
+        stage = next((s for s in STAGES if s not in result['seconds']), 'total')
+        return fail(stage, 'exception', f'{type(e).__name__}: {e}')
+
+    result['seconds']['total'] = time.perf_counter() - started
+    result['ok'] = True
+    return result
+
+
+def summarize(results: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    """Throughput, latency percentiles per stage and error counts"""
+    completed = [r for r in results if r['ok']]
+    stages = {}
+    for stage in STAGES:
+        values = [r['seconds'][stage] for r in results if stage in r['seconds']]
+        stages[stage] = {f'p{p}': percentile(values, p) for p in PERCENTILES}
+        stages[stage].update(count=len(values), max=max(values) if values else None)
+
+    # Time each job spent outside the encoder: HTTP, staging, queueing, polling
+    overhead = [r['seconds']['total'] - r['processing_time'] for r in completed]
+    stages['overhead'] = {f'p{p}': percentile(overhead, p) for p in PERCENTILES}
+    stages['overhead'].update(count=len(overhead), max=max(overhead) if overhead else None)
+
+    errors: Dict[str, int] = {}
+    for r in results:
+        if not r['ok']:
+            key = f"{r['failed_stage']}: {r['status']}"
+            errors[key] = errors.get(key, 0) + 1
+
+    return {
+        'jobs': len(results),
+        'completed': len(completed),
+        'error_rate': (len(results) - len(completed)) / max(len(results), 1),
+        'wall_seconds': wall_seconds,
+        'jobs_per_second': len(completed) / wall_seconds if wall_seconds > 0 else 0,
+        'upload_mb_per_second': sum(r['bytes_up'] for r in results) / 1e6 / wall_seconds if wall_seconds > 0 else 0,
+        'latency': stages,
+        'errors': errors,
+        'sample_errors': [r['error'] for r in results if not r['ok']][:5],
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(args: argparse.Namespace, work_dir: str) -> Tuple[subprocess.Popen, str]:
+    """Run app_new.py locally for the test (rate limits off, state in work_dir)"""
+    env = dict(os.environ)
+    env.update({
+        'UPLOAD_FOLDER': work_dir,
+        'RATELIMIT_ENABLED': 'false',
+        'COST_MODEL_PATH': '',
+        'FFMPEG_CAPABILITIES_PATH': '',
+        'STATIC_CACHE_FOLDER': os.path.join(work_dir, 'static'),
+    })
+    if args.fake_ffmpeg:
+        bin_dir = os.path.join(work_dir, 'bin')
+        install_fake_ffmpeg(bin_dir)
+        env['PATH'] = bin_dir + os.pathsep + env.get('PATH', '')
+        env['FAKE_FFMPEG_SECONDS_PER_FRAME'] = str(args.fake_seconds_per_frame)
+        env['FAKE_FFMPEG_CPU'] = str(args.fake_cpu)
+        env['FAKE_FFMPEG_FAIL_RATE'] = str(args.fake_fail_rate)
+
+    port = _free_port()
+    log = open(os.path.join(work_dir, 'server.log'), 'w')
+    server = subprocess.Popen([sys.executable, '-c', _SERVE, str(port)], env=env, stdout=log, stderr=log,
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+    url = f'http://127.0.0.1:{port}'
+
+    client = Client(url, timeout=5)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited during startup; see {log.name}")
+        try:
+            if client.request('GET', '/health')[0] == 200:
+                return server, url
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('Server did not start within 30s')
+
+
+def print_report(summary: Dict[str, Any], args: argparse.Namespace) -> None:
+    print(f"\n{summary['completed']}/{summary['jobs']} jobs completed in {summary['wall_seconds']:.1f}s "
+          f"with {args.users} users ({summary['error_rate']:.1%} errors)")
+    print(f"Throughput: {summary['jobs_per_second']:.2f} jobs/s, "
+          f"{summary['upload_mb_per_second']:.2f} MB/s uploaded\n")
+
+    def fmt(value: Optional[float]) -> str:
+        return f"{value * 1000:>9.0f}" if value is not None else f"{'-':>9}"
+
+    print(f"{'stage (ms)':<10} {'count':>6}" + ''.join(f"{'p' + str(p):>9}" for p in PERCENTILES) + f"{'max':>9}")
+    for stage, stats in summary['latency'].items():
+        print(f"{stage:<10} {stats['count']:>6}" + ''.join(fmt(stats[f'p{p}']) for p in PERCENTILES)
+              + fmt(stats['max']))
+
+    if summary['errors']:
+        print("\nErrors:")
+        for key, count in sorted(summary['errors'].items(), key=lambda item: -item[1]):
+            print(f"  {key}: {count}")
+        for error in summary['sample_errors']:
+            print(f"    e.g. {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the upload/process/status/download flow')
+    parser.add_argument('--url', help='Server to test (default: start app_new.py locally)')
+    parser.add_argument('-u', '--users', type=int, default=10, help='Concurrent users (default: 10)')
+    parser.add_argument('-n', '--jobs', type=int, help='Total jobs to run (default: 2 per user)')
+    parser.add_argument('--frames', type=int, default=24, help='Frames per job (default: 24)')
+    parser.add_argument('--width', type=int, default=128, help='Frame width (default: 128)')
+    parser.add_argument('--height', type=int, default=128, help='Frame height (default: 128)')
+    parser.add_argument('-c', '--codec', default='vp9', help='Codec requested from /process (default: vp9)')
+    parser.add_argument('-q', '--quality', default='realtime', help='Quality tier (default: realtime)')
+    parser.add_argument('-fps', '--fps', type=int, default=24, help='Frame rate (default: 24)')
+    parser.add_argument('--poll-interval', type=float, default=0.5,
+                        help='Seconds between /status polls (default: 0.5)')
+    parser.add_argument('--job-timeout', type=float, default=300, help='Give up on a job after this many seconds')
+    parser.add_argument('--fake-ffmpeg', action='store_true',
+                        help='Have the local server encode with fake_ffmpeg.py instead of FFmpeg')
+    parser.add_argument('--fake-seconds-per-frame', type=float, default=0.01,
+                        help='Simulated encode time per frame (default: 0.01)')
+    parser.add_argument('--fake-cpu', type=float, default=1.0,
+                        help='Share of the simulated encode time spent busy on a CPU (default: 1.0)')
+    parser.add_argument('--fake-fail-rate', type=float, default=0.0,
+                        help='Share of simulated encodes that fail (default: 0)')
+    parser.add_argument('--json', help='Also write the summary to this JSON file')
+    args = parser.parse_args()
+
+    if args.url and args.fake_ffmpeg:
+        print("Error: --fake-ffmpeg applies to the local server; for --url, install the shims "
+              "on the server with `python fake_ffmpeg.py --install DIR`")
+        return 1
+    jobs = args.jobs or args.users * 2
+
+    with tempfile.TemporaryDirectory(prefix='load_test_') as work_dir:
+        server = None
+        try:
+            url = args.url
+            if not url:
+                server, url = start_server(args, work_dir)
+                print(f"Started app_new.py at {url}" + (" with fake FFmpeg" if args.fake_ffmpeg else ""))
+
+            client = Client(url, timeout=max(60.0, args.job_timeout))
+            print(f"Running {jobs} jobs of {args.frames} {args.width}x{args.height} frames "
+                  f"({args.codec}/{args.quality}) with {args.users} concurrent users...")
+
+            lock = threading.Lock()
+            done = [0]
+
+            def flow(index: int) -> Dict[str, Any]:
+                result = run_flow(client, index, args)
+                with lock:
+                    done[0] += 1
+                    if done[0] % max(1, jobs // 10) == 0:
+                        print(f"  {done[0]}/{jobs} jobs finished")
+                return result
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.users) as executor:
+                results = list(executor.map(flow, range(jobs)))
+            summary = summarize(results, time.perf_counter() - started)
+        finally:
+            if server:
+                server.terminate()
+                server.wait(timeout=10)
+
+    print_report(summary, args)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(dict(summary, settings=vars(args)), f, indent=2)
+        print(f"\nSummary written to {args.json}")
+
+    return 0 if summary['completed'] == summary['jobs'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
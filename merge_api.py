@@ -0,0 +1,235 @@
+"""
+Merge API
+Importable, non-interactive encoder for Python services: an asyncio `merge`
+coroutine and a blocking `merge_sync` wrapper. Nothing is printed or
+prompted; problems raise MergeError and results come back as a dict.
+"""
+
+import asyncio
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from alpha_crop import compute_crop, crop_filter
+from encoding_profiles import (DEFAULT_QUALITY, normalize_codec, normalize_quality, output_extension,
+                               stacked_alpha_layout)
+from frame_dedupe import collapse_runs, hash_frames, write_ffconcat
+from merge_transparent_video import (build_merge_commands, find_sequence_pattern, list_sequence_files,
+                                     validate_sequence)
+from png_probe import PNGProbeError, probe_sequence
+from target_size import correct_plan, plan_summary, plan_target_size
+
+ProgressCallback = Callable[[int, int], None]
+
+
+class MergeError(RuntimeError):
+    """Raised when a merge can't start or FFmpeg fails; stderr holds FFmpeg's output"""
+
+    def __init__(self, message: str, stderr: str = ''):
+        super().__init__(message)
+        self.stderr = stderr
+
+
+def _resolve_input(input_path: str, start_number: Optional[int], allow_missing: bool):
+    """Turn a directory or pattern into (pattern, start_number)"""
+    if os.path.isdir(input_path):
+        pattern, start, end, _ = find_sequence_pattern(input_path)
+        if pattern is None:
+            raise MergeError(f'No PNG sequence found in {input_path}')
+        missing = validate_sequence(input_path, pattern, start, end)
+        if missing and not allow_missing:
+            raise MergeError(f'{len(missing)} frames missing from the sequence (first: {missing[0]})')
+        return os.path.join(input_path, pattern), start if start_number is None else start_number
+
+    if '%' not in input_path:
+        raise MergeError('Input must be a directory or a pattern like frame_%04d.png')
+    return input_path, start_number
+
+
+async def _run_ffmpeg(cmd: List[str], processes: Set[asyncio.subprocess.Process], total_frames: int = 0,
+                      on_progress: Optional[ProgressCallback] = None) -> None:
+    """Run one FFmpeg command, reporting progress from -progress output"""
+    cmd = cmd[:-1] + ['-hide_banner', '-nostats', '-progress', 'pipe:1', cmd[-1]]
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+    except FileNotFoundError:
+        raise MergeError('FFmpeg not found')
+
+    processes.add(process)
+    try:
+        stderr_task = asyncio.ensure_future(process.stderr.read())
+        async for line in process.stdout:
+            key, _, value = line.decode(errors='replace').strip().partition('=')
+            if key == 'frame' and on_progress and value.isdigit():
+                on_progress(int(value), total_frames)
+        stderr = (await stderr_task).decode(errors='replace')
+        returncode = await process.wait()
+    finally:
+        processes.discard(process)
+
+    if returncode != 0:
+        raise MergeError(f'FFmpeg exited with code {returncode}', stderr)
+
+
+async def merge(input_path: str, output_file: Optional[str] = None, fps: int = 24, codec: str = 'prores_ks',
+                quality: Optional[str] = None, start_number: Optional[int] = None, frames: Optional[int] = None,
+                auto_crop: bool = False, collapse_duplicates: bool = False, target_size: Optional[int] = None,
+                allow_missing: bool = False, timeout: Optional[float] = None,
+                on_progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+    """
+    Merge a PNG sequence into a transparent video
+
+    Args:
+        input_path: Directory to auto-detect, or a pattern like 'dir/frame_%04d.png'
+        output_file: Output path (default: next to the frames, named by codec)
+        fps, codec, quality: Frame rate, codec and quality tier (see encoding_profiles)
+        start_number, frames: Optional first frame number and frame limit
+        auto_crop: Crop to the area that is visible in any frame
+        collapse_duplicates: Encode runs of identical frames once, as held frames
+        target_size: Maximum output size in bytes (VP9, VP8 and WebP only)
+        allow_missing: Encode anyway when a directory's sequence has gaps
+        timeout: Seconds before the whole merge, target-size sample encodes
+                 included, is abandoned (asyncio.TimeoutError)
+        on_progress: Called with (frames_done, total_frames) during the encode
+
+    Cancelling the task kills FFmpeg, stops any remaining sample encodes
+    and removes the partial output.
+
+    Returns a dict with output, output_size, codec, quality, frames,
+    encoded_frames, width, height, has_alpha, crop, video_seconds,
+    processing_seconds, target_size and alpha_layout (stacked H.264 only).
+    Raises MergeError on failure.
+    """
+    return await asyncio.wait_for(_merge(
+        input_path, output_file, fps, codec, quality, start_number, frames, auto_crop, collapse_duplicates,
+        target_size, allow_missing, on_progress
+    ), timeout)
+
+
+async def _merge(input_path: str, output_file: Optional[str], fps: int, codec: str, quality: Optional[str],
+                 start_number: Optional[int], frames: Optional[int], auto_crop: bool, collapse_duplicates: bool,
+                 target_size: Optional[int], allow_missing: bool,
+                 on_progress: Optional[ProgressCallback]) -> Dict[str, Any]:
+    """merge() without the timeout"""
+    started = time.monotonic()
+    codec = normalize_codec(codec)
+    quality = normalize_quality(quality or DEFAULT_QUALITY)
+    input_pattern, start_number = _resolve_input(input_path, start_number, allow_missing)
+    if output_file is None:
+        output_file = os.path.join(os.path.dirname(input_pattern), f'output.{output_extension(codec)}')
+
+    frame_files = await asyncio.to_thread(list_sequence_files, input_pattern, start_number, frames)
+    if not frame_files:
+        raise MergeError(f'No frames found matching {input_pattern}')
+    try:
+        probe = await asyncio.to_thread(probe_sequence, frame_files)
+    except PNGProbeError as e:
+        raise MergeError(str(e))
+
+    crop = await asyncio.to_thread(compute_crop, frame_files) if auto_crop and probe['has_alpha'] else None
+    width, height = (crop['width'], crop['height']) if crop else (probe['width'], probe['height'])
+
+    processes: Set[asyncio.subprocess.Process] = set()
+    with tempfile.TemporaryDirectory(prefix='merge_') as work_dir:
+        concat_manifest = None
+        encoded_frames = len(frame_files)
+        if collapse_duplicates:
+            runs = collapse_runs(frame_files, await asyncio.to_thread(hash_frames, frame_files))
+            if len(runs) < len(frame_files):
+                concat_manifest = write_ffconcat(runs, fps, os.path.join(work_dir, 'frames.ffconcat'))
+                encoded_frames = len(runs)
+
+        plan = None
+        if target_size:
+            # The sample encodes run in a worker thread that outlives a
+            # cancelled await, so it checks this before each encode
+            sample_processes: Set[subprocess.Popen] = set()
+            cancelled = threading.Event()
+
+            def run(cmd):
+                if cancelled.is_set():
+                    return subprocess.CompletedProcess(cmd, -1, '', 'Merge cancelled')
+                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+                sample_processes.add(process)
+                if cancelled.is_set():
+                    process.kill()
+                try:
+                    stdout, stderr = process.communicate()
+                finally:
+                    sample_processes.discard(process)
+                return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+            try:
+                plan = await asyncio.to_thread(
+                    plan_target_size, codec, quality, target_size, frame_files, fps, work_dir,
+                    encoded_frames=encoded_frames, width=width, height=height, has_alpha=probe['has_alpha'],
+                    filter_args=['-vf', crop_filter(crop)] if crop else None, run=run
+                )
+            except asyncio.CancelledError:
+                cancelled.set()
+                for process in list(sample_processes):
+                    process.kill()
+                raise
+            except FileNotFoundError:
+                raise MergeError('FFmpeg not found')
+            except (RuntimeError, ValueError) as e:
+                raise MergeError(str(e))
+
+        def commands(codec_args=None):
+            return build_merge_commands(
+                input_pattern, output_file, fps, codec, start_number, frames, quality, probe['has_alpha'],
+                crop, concat_manifest, (probe['width'], probe['height']), codec_args,
+                os.path.join(work_dir, 'palette.png')
+            )
+
+        async def encode():
+            nonlocal plan
+            for cmd in commands(plan and plan['args']):
+                await _run_ffmpeg(cmd, processes, encoded_frames, on_progress)
+
+            # One correction pass if the full encode still missed the target
+            if plan:
+                corrected = correct_plan(plan, os.path.getsize(output_file))
+                if corrected:
+                    plan = corrected
+                    for cmd in commands(plan['args']):
+                        await _run_ffmpeg(cmd, processes, encoded_frames, on_progress)
+
+        try:
+            await encode()
+        except BaseException:
+            for process in list(processes):
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+            if os.path.exists(output_file):
+                os.remove(output_file)
+            raise
+
+    return {
+        'output': output_file,
+        'output_size': os.path.getsize(output_file),
+        'codec': codec,
+        'quality': quality,
+        'frames': len(frame_files),
+        'encoded_frames': encoded_frames,
+        'width': width,
+        'height': height,
+        'has_alpha': probe['has_alpha'],
+        'crop': crop,
+        'video_seconds': len(frame_files) / fps,
+        'processing_seconds': time.monotonic() - started,
+        'target_size': plan_summary(plan) if plan else None,
+        'alpha_layout': stacked_alpha_layout(width, height) if codec == 'h264_stacked' else None,
+    }
+
+
+def merge_sync(*args, **kwargs) -> Dict[str, Any]:
+    """Blocking wrapper around merge() for callers without an event loop"""
+    return asyncio.run(merge(*args, **kwargs))
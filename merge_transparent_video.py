@@ -5,12 +5,30 @@ Merges PNG sequences with alpha channel into transparent videos
 """
 
 import argparse
+import atexit
 import os
 import sys
 import subprocess
 import re
+import json
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
 from pathlib import Path
 
+from alpha_cleanup import DEFAULT_ALPHA_HIGH, DEFAULT_ALPHA_LOW, clean_frames
+from alpha_crop import compute_crop, crop_filter
+from frame_dedupe import VFR_OUTPUT_ARGS, collapse_runs, concat_input_args, hash_frames, write_ffconcat
+from encoding_profiles import (DEFAULT_QUALITY, QUALITY_TIERS, build_codec_args, join_filter_args,
+                               stacked_alpha_layout)
+from ffmpeg_capabilities import CODEC_FALLBACKS, get_capabilities, has_codec
+from png_probe import PNGProbeError, probe_sequence, read_png_header
+from segments import encode_resumable, is_segmentable
+from sequence_watch import watch_sequence
+from target_size import TARGET_SIZE_CODECS, correct_plan, parse_size, plan_summary, plan_target_size
+from transcode import ALPHA_DECODERS
+
 
 def find_sequence_pattern(directory, prefix=""):
     """
@@ -59,101 +77,154 @@ def validate_sequence(directory, pattern, start, end):
     return missing
 
 
-def merge_png_sequence(input_pattern, output_file, fps=24, codec='prores_ks', 
-                      start_number=None, vframes=None, preset=None):
+def list_sequence_files(input_pattern, start_number=None, vframes=None):
     """
-    Merge PNG sequence into video with alpha channel
+    List the frame files FFmpeg will read for a pattern
+    Mirrors the image2 demuxer: without a start number the first frame is
+    searched for in 0-4, and reading stops at the first gap.
+    """
+    candidates = [start_number] if start_number is not None else range(5)
+    first = next((n for n in candidates if os.path.exists(input_pattern % n)), None)
+    if first is None:
+        return []
+
+    files = []
+    number = first
+    while os.path.exists(input_pattern % number):
+        files.append(input_pattern % number)
+        if vframes and len(files) >= vframes:
+            break
+        number += 1
+    return files
+
+
+def build_merge_commands(input_pattern, output_file, fps=24, codec='prores_ks',
+                         start_number=None, vframes=None, preset=None, has_alpha=True,
+                         crop=None, concat_manifest=None, frame_size=None, codec_args=None,
+                         palette_file=None):
+    """
+    Build the FFmpeg commands for a merge, in the order they must run
     
-    Args:
-        input_pattern: Path pattern like 'path/to/image_%04d.png'
-        output_file: Output video path
-        fps: Frame rate (default 24)
-        codec: Video codec (default 'prores_ks' for ProRes 4444)
-        start_number: Starting frame number
-        vframes: Number of frames to process
-        preset: Encoding preset for certain codecs
+    Takes the same arguments as merge_png_sequence. GIF output needs a
+    palette pass first, written to palette_file; every other codec is a
+    single command.
     """
     
     # Build FFmpeg command
     cmd = ['ffmpeg', '-y']  # -y to overwrite output
+    commands = []
     
     # Input options
-    cmd.extend(['-framerate', str(fps)])
+    if concat_manifest:
+        input_args = concat_input_args(concat_manifest)
+    else:
+        input_args = ['-framerate', str(fps)]
+        if start_number is not None:
+            input_args.extend(['-start_number', str(start_number)])
+        input_args.extend(['-i', input_pattern])
     
-    if start_number is not None:
-        cmd.extend(['-start_number', str(start_number)])
+    cmd.extend(input_args)
     
-    cmd.extend(['-i', input_pattern])
+    # Leading filter (e.g. auto-crop) applied before any codec-specific filters.
+    # The GIF graph also resamples to a constant rate, except for manifests
+    # whose held frames must not be re-expanded.
+    pre_filter = crop_filter(crop)
+    pre_chain = f'{pre_filter},' if pre_filter else ''
+    if not concat_manifest:
+        pre_chain += f'fps={fps},'
     
     # Video codec options
     if codec == 'gif':
         # For GIF, we need a two-pass process
-        import tempfile
-        palette_file = tempfile.mktemp(suffix='.png')
-        
         # First pass: generate palette
-        palette_cmd = [
-            'ffmpeg', '-y',
-            '-framerate', str(fps),
-            '-i', input_pattern,
-            '-vf', f'fps={fps},scale=640:-1:flags=lanczos,palettegen=stats_mode=diff:transparency_color=ffffff',
+        commands.append(['ffmpeg', '-y'] + input_args + [
+            '-vf', f'{pre_chain}scale=640:-1:flags=lanczos,palettegen=stats_mode=diff:transparency_color=ffffff',
             palette_file
-        ]
-        
-        if start_number is not None:
-            palette_cmd.insert(3, '-start_number')
-            palette_cmd.insert(4, str(start_number))
-        
-        print("Generating palette for optimized GIF...")
-        subprocess.run(palette_cmd, check=True)
+        ])
         
         # Second pass: create GIF using palette
-        cmd = [
-            'ffmpeg', '-y',
-            '-framerate', str(fps)
-        ]
-        
-        if start_number is not None:
-            cmd.extend(['-start_number', str(start_number)])
-            
+        cmd = ['ffmpeg', '-y'] + input_args
         cmd.extend([
-            '-i', input_pattern,
             '-i', palette_file,
-            '-lavfi', f'fps={fps},scale=640:-1:flags=lanczos [x]; [x][1:v] paletteuse=dither=bayer:bayer_scale=5:diff_mode=rectangle',
+            '-lavfi', f'{pre_chain}scale=640:-1:flags=lanczos [x]; [x][1:v] paletteuse=dither=bayer:bayer_scale=5:diff_mode=rectangle',
             '-gifflags', '+transdiff'
         ])
         
-        # Clean up palette file after use
-        import atexit
-        atexit.register(lambda: os.remove(palette_file) if os.path.exists(palette_file) else None)
-        
-    elif codec == 'prores_ks':
-        # ProRes 4444 with alpha
-        cmd.extend(['-c:v', 'prores_ks', '-profile:v', '4444', '-pix_fmt', 'yuva444p10le'])
-    elif codec == 'qtrle':
-        # QuickTime Animation codec
-        cmd.extend(['-c:v', 'qtrle'])
-    elif codec == 'vp9':
-        # VP9 with alpha in WebM
-        cmd.extend(['-c:v', 'libvpx-vp9', '-pix_fmt', 'yuva420p'])
-        if preset:
-            cmd.extend(['-deadline', preset])
-    elif codec == 'vp8':
-        # VP8 with alpha in WebM
-        cmd.extend(['-c:v', 'libvpx', '-pix_fmt', 'yuva420p'])
-    elif codec == 'png':
-        # PNG video (lossless but large)
-        cmd.extend(['-c:v', 'png'])
     else:
-        # Custom codec
-        cmd.extend(['-c:v', codec])
+        # Tuned arguments from the shared profile registry
+        if crop:
+            width, height = crop['width'], crop['height']
+        else:
+            width, height = frame_size or (None, None)
+        cmd.extend(join_filter_args(
+            codec_args or build_codec_args(codec, preset or DEFAULT_QUALITY, width, height, has_alpha),
+            ['-vf', pre_filter] if pre_filter else None
+        ))
     
-    # Frame limit if specified
-    if vframes:
+    # Frame limit if specified (a manifest already lists exactly the frames
+    # to encode, and collapsed runs would make the count wrong)
+    if vframes and not concat_manifest:
         cmd.extend(['-vframes', str(vframes)])
     
+    if concat_manifest:
+        cmd.extend(VFR_OUTPUT_ARGS)
+    
     # Output file
     cmd.append(output_file)
+    commands.append(cmd)
+    return commands
+
+
+def merge_png_sequence(input_pattern, output_file, fps=24, codec='prores_ks', 
+                      start_number=None, vframes=None, preset=None, has_alpha=True,
+                      crop=None, concat_manifest=None, frame_size=None, codec_args=None):
+    """
+    Merge PNG sequence into video with alpha channel
+    
+    Args:
+        input_pattern: Path pattern like 'path/to/image_%04d.png'
+        output_file: Output video path
+        fps: Frame rate (default 24)
+        codec: Video codec (default 'prores_ks' for ProRes 4444)
+        start_number: Starting frame number
+        vframes: Number of frames to process
+        preset: Quality tier ('realtime', 'good' or 'best'), applied to
+                every codec through the shared encoding profiles
+        has_alpha: Whether any frame carries transparency; when False a
+                   cheaper non-alpha pixel format is used
+        crop: Optional crop rectangle from alpha_crop.compute_crop()
+        concat_manifest: Optional ffconcat manifest with per-frame durations
+                         (see frame_dedupe); replaces input_pattern, and the
+                         output keeps the variable frame timing
+        frame_size: Optional (width, height) of the input frames, used to
+                    tune the profile for the output resolution
+        codec_args: Optional FFmpeg codec arguments replacing the profile's
+                    (e.g. from target_size.plan_target_size)
+    """
+    
+    palette_file = None
+    if codec == 'gif':
+        import tempfile
+        palette_file = tempfile.mktemp(suffix='.png')
+        
+        # Clean up palette file after use
+        import atexit
+        atexit.register(lambda: os.remove(palette_file) if os.path.exists(palette_file) else None)
+    
+    commands = build_merge_commands(
+        input_pattern, output_file, fps, codec, start_number, vframes, preset, has_alpha,
+        crop, concat_manifest, frame_size, codec_args, palette_file
+    )
+    cmd = commands[-1]
+    
+    try:
+        if len(commands) > 1:
+            print("Generating palette for optimized GIF...")
+            subprocess.run(commands[0], check=True)
+    except FileNotFoundError:
+        print("Error: FFmpeg not found. Please install FFmpeg first.")
+        print("Visit: https://ffmpeg.org/download.html")
+        return False
     
     print(f"Running command: {' '.join(cmd)}")
     
@@ -184,6 +255,183 @@ def merge_png_sequence(input_pattern, output_file, fps=24, codec='prores_ks',
         return False
 
 
+def merge_resumable(input_pattern, output_file, fps=24, codec='prores_ks', start_number=None,
+                    vframes=None, preset=None, has_alpha=True, crop=None, frame_size=None,
+                    codec_args=None, segment_frames=240):
+    """
+    Merge a PNG sequence as checkpointed segments that survive interruption
+    
+    Segments and their checkpoint are kept in '<output_file>.segments/';
+    running the same command again after a crash skips every finished
+    segment. Takes the same arguments as merge_png_sequence, except that
+    duplicate-frame manifests and GIF/WebP/APNG output are not supported.
+    """
+    frames = list_sequence_files(input_pattern, start_number, vframes)
+    if not frames:
+        print(f"Error: No frames found matching {input_pattern}")
+        return False
+    if start_number is None:
+        start_number = next(n for n in range(5) if os.path.exists(input_pattern % n))
+    
+    if crop:
+        width, height = crop['width'], crop['height']
+    else:
+        width, height = frame_size or (None, None)
+    if codec_args is None:
+        codec_args = build_codec_args(codec, preset or DEFAULT_QUALITY, width, height, has_alpha)
+    
+    def on_segment(index, total, resumed):
+        status = 'already done' if resumed else 'encoded'
+        print(f"Segment {index + 1}/{total} {status}")
+    
+    work_dir = f"{output_file}.segments"
+    try:
+        result = encode_resumable(
+            input_pattern, start_number, len(frames), fps, codec_args, output_file, work_dir,
+            segment_frames, ['-vf', crop_filter(crop)] if crop else None, on_segment=on_segment
+        )
+    except FileNotFoundError:
+        print("Error: FFmpeg not found. Please install FFmpeg first.")
+        return False
+    
+    if result.returncode != 0:
+        print(f"\nError: FFmpeg failed; rerun the same command to resume:\n{result.stderr}")
+        return False
+    
+    shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"\nSuccess! Video saved to: {output_file}")
+    return True
+
+
+def probe_video(input_file):
+    """
+    Read frame rate, frame count and codec of a video's first stream with ffprobe
+    Returns dict with codec, pix_fmt, fps (Fraction) and frame_count.
+    """
+    cmd = [
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'stream=codec_name,pix_fmt,r_frame_rate,avg_frame_rate,nb_frames,duration'
+                         ':format=duration',
+        '-of', 'json', input_file
+    ]
+    info = json.loads(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout)
+    if not info.get('streams'):
+        raise ValueError(f"No video stream found in {input_file}")
+    stream = info['streams'][0]
+
+    rate = stream.get('avg_frame_rate') or '0/1'
+    if rate in ('0/0', '0/1'):
+        rate = stream.get('r_frame_rate', '0/1')
+    fps = Fraction(rate) if rate not in ('0/0', '0/1') else Fraction(0)
+
+    frame_count = int(stream['nb_frames']) if stream.get('nb_frames', 'N/A') != 'N/A' else None
+    if frame_count is None:
+        # WebM/Matroska don't store a frame count; counting packets only demuxes
+        count_cmd = [
+            'ffprobe', '-v', 'error', '-select_streams', 'v:0', '-count_packets',
+            '-show_entries', 'stream=nb_read_packets', '-of', 'csv=p=0', input_file
+        ]
+        frame_count = int(subprocess.run(count_cmd, check=True, capture_output=True,
+                                         text=True).stdout.strip().split(',')[0])
+
+    return {
+        'codec': stream.get('codec_name'),
+        'pix_fmt': stream.get('pix_fmt'),
+        'fps': fps,
+        'frame_count': frame_count,
+    }
+
+
+def extract_png_sequence(input_file, output_dir, prefix='frame_', padding=None, start_number=0,
+                         workers=None, compression_level=3, bit_depth=8):
+    """
+    Explode a transparent video back into an RGBA PNG sequence
+
+    The frame range is split into contiguous segments that are decoded by
+    parallel FFmpeg processes, each seeking to its first frame and writing
+    its slice of the numbered sequence.
+
+    Args:
+        input_file: Video to extract (ProRes 4444, VP9/VP8 alpha WebM, ...)
+        output_dir: Directory for the PNG files
+        prefix: File name prefix; files are named like find_sequence_pattern
+                expects, e.g. frame_0001.png
+        padding: Digits in the frame number (default: at least 4)
+        start_number: Number of the first output frame
+        workers: Number of parallel segments (default: CPU count)
+        compression_level: PNG zlib level 0-9 (lower is faster, larger)
+        bit_depth: 8 for RGBA, 16 for RGBA64 (keeps 10-bit ProRes precision)
+
+    Returns the output pattern on success, None on failure.
+    """
+    try:
+        info = probe_video(input_file)
+    except FileNotFoundError:
+        print("Error: ffprobe not found. Please install FFmpeg first.")
+        return None
+    except (subprocess.CalledProcessError, ValueError) as e:
+        print(f"Error: Could not probe {input_file}: {e}")
+        return None
+
+    frame_count, fps = info['frame_count'], info['fps']
+    if not frame_count or not fps:
+        print("Error: Could not determine frame count and frame rate")
+        return None
+
+    if padding is None:
+        padding = max(4, len(str(start_number + frame_count - 1)))
+    pattern = f"{prefix}%0{padding}d.png"
+    os.makedirs(output_dir, exist_ok=True)
+
+    workers = max(1, min(workers or os.cpu_count() or 1, frame_count))
+    bounds = [round(frame_count * i / workers) for i in range(workers + 1)]
+    segments = [(bounds[i], bounds[i + 1]) for i in range(workers) if bounds[i + 1] > bounds[i]]
+    print(f"Extracting {frame_count} frames at {float(fps):.3f} fps in {len(segments)} segments...")
+
+    decoder = ALPHA_DECODERS.get(info['codec'])
+    pix_fmt = 'rgba64be' if bit_depth == 16 else 'rgba'
+
+    def extract_segment(segment):
+        first, end = segment
+        cmd = ['ffmpeg', '-y', '-v', 'error']
+        if first > 0:
+            # Seek half a frame early so timestamp rounding can't skip the
+            # segment's first frame; the accurate seek drops everything before
+            cmd.extend(['-ss', f'{(first - 0.5) / fps:.6f}'])
+        if decoder:
+            cmd.extend(['-c:v', decoder])
+        cmd.extend([
+            '-i', input_file,
+            '-frames:v', str(end - first),
+            '-fps_mode', 'passthrough',
+            '-pix_fmt', pix_fmt,
+            '-compression_level', str(compression_level),
+            '-start_number', str(start_number + first),
+            os.path.join(output_dir, pattern)
+        ])
+        return subprocess.run(cmd, capture_output=True, text=True)
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+            results = list(executor.map(extract_segment, segments))
+    except FileNotFoundError:
+        print("Error: FFmpeg not found. Please install FFmpeg first.")
+        return None
+
+    failed = [r for r in results if r.returncode != 0]
+    if failed:
+        print(f"Error: {len(failed)} segment(s) failed:\n{failed[0].stderr}")
+        return None
+
+    missing = validate_sequence(output_dir, pattern, start_number, start_number + frame_count - 1)
+    if missing:
+        print(f"Error: {len(missing)} frames were not written (first: {missing[0]})")
+        return None
+
+    print(f"\nSuccess! {frame_count} frames written to: {os.path.join(output_dir, pattern)}")
+    return os.path.join(output_dir, pattern)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Merge PNG sequences with transparency into video',
@@ -201,27 +449,127 @@ Examples:
 
   # Process specific frame range
   %(prog)s -i /path/to/frame_%%04d.png -o output.mov -s 100 -n 50
+
+  # Encode while frames are still being rendered
+  %(prog)s --watch -i /path/to/shot/ -o output.mov --expect-frames 2400
+
+  # Extract a transparent video back into a PNG sequence
+  %(prog)s --extract -i input.mov -o /path/to/frames/
         '''
     )
     
     parser.add_argument('-i', '--input', required=True,
                       help='Input directory or pattern (e.g., "frame_%%04d.png")')
     parser.add_argument('-o', '--output', required=True,
-                      help='Output video file')
+                      help='Output video file (or output directory with --extract)')
     parser.add_argument('-fps', '--framerate', type=int, default=24,
                       help='Frame rate (default: 24)')
     parser.add_argument('-c', '--codec', default='prores_ks',
-                      choices=['prores_ks', 'qtrle', 'vp9', 'vp8', 'png', 'gif'],
+                      choices=['prores_ks', 'qtrle', 'vp9', 'vp8', 'png', 'gif', 'webp', 'webp_lossless', 'apng', 'ffv1',
+                               'h264_stacked'],
                       help='Video codec (default: prores_ks for ProRes 4444)')
     parser.add_argument('-s', '--start', type=int,
                       help='Start frame number')
     parser.add_argument('-n', '--frames', type=int,
                       help='Number of frames to process')
-    parser.add_argument('--preset', choices=['good', 'best', 'realtime'],
-                      help='Encoding preset for VP9 codec')
+    parser.add_argument('--preset', choices=list(QUALITY_TIERS),
+                      help=f'Quality tier for any codec (default: {DEFAULT_QUALITY})')
+    parser.add_argument('--auto-crop', action='store_true',
+                      help='Crop to the union bounding box of visible pixels (requires NumPy and Pillow)')
+    parser.add_argument('--alpha-cleanup', action='store_true',
+                      help='Zero colour under transparent pixels and snap alpha noise before encoding '
+                           '(requires NumPy and Pillow)')
+    parser.add_argument('--alpha-low', type=int, default=DEFAULT_ALPHA_LOW,
+                      help=f'Alpha at or below this becomes fully transparent (default: {DEFAULT_ALPHA_LOW})')
+    parser.add_argument('--alpha-high', type=int, default=DEFAULT_ALPHA_HIGH,
+                      help=f'Alpha at or above this becomes fully opaque (default: {DEFAULT_ALPHA_HIGH})')
+    parser.add_argument('--collapse-duplicates', action='store_true',
+                      help='Encode runs of identical frames once with a longer duration (variable frame rate output)')
+    parser.add_argument('--no-probe', action='store_true',
+                      help='Skip the PNG header pre-flight check (size consistency and alpha detection)')
+    parser.add_argument('--target-size',
+                      help=f'Maximum output size, e.g. 5M or 750K ({", ".join(TARGET_SIZE_CODECS)} only); '
+                           'picks the rate control from short sample encodes')
+    parser.add_argument('--no-correction', action='store_true',
+                      help='With --target-size, skip the re-encode when the output still misses the target')
+    parser.add_argument('--watch', action='store_true',
+                      help='Follow a sequence that is still being rendered, encoding segments as frames land')
+    parser.add_argument('--resumable', action='store_true',
+                      help='Encode as checkpointed segments; rerunning after an interruption resumes')
+    parser.add_argument('--segment-frames', type=int, default=240,
+                      help='Frames per segment in --watch and --resumable mode (default: 240)')
+    parser.add_argument('--expect-frames', type=int,
+                      help='With --watch, close the sequence once this many frames have arrived')
+    parser.add_argument('--idle-timeout', type=float, default=60.0,
+                      help='With --watch, close the sequence after this many seconds without new frames (default: 60)')
+    parser.add_argument('--extract', action='store_true',
+                      help='Reverse mode: extract the input video into an RGBA PNG sequence')
+    parser.add_argument('--workers', type=int,
+                      help='Parallel segments for --extract (default: CPU count)')
+    parser.add_argument('--png-compression', type=int, default=3, choices=range(10), metavar='0-9',
+                      help='PNG compression level for --extract; lower is faster, larger (default: 3)')
+    parser.add_argument('--png-depth', type=int, default=8, choices=[8, 16],
+                      help='Bits per channel for --extract (default: 8)')
     
     args = parser.parse_args()
     
+    target_bytes = None
+    if args.target_size:
+        try:
+            target_bytes = parse_size(args.target_size)
+        except ValueError:
+            print(f"Error: Invalid --target-size {args.target_size}")
+            return 1
+        if args.codec not in TARGET_SIZE_CODECS:
+            print(f"Error: --target-size is only supported for {', '.join(TARGET_SIZE_CODECS)}")
+            return 1
+    
+    if args.resumable:
+        if not is_segmentable(args.codec):
+            print(f"Error: --resumable is not supported for {args.codec}")
+            return 1
+        if args.collapse_duplicates:
+            print("Error: --resumable can't be combined with --collapse-duplicates")
+            return 1
+    
+    # Check FFmpeg and its encoder up front (cached until ffmpeg changes)
+    if not args.extract:
+        capabilities = get_capabilities()
+        if not capabilities['available']:
+            print("Error: FFmpeg not found. Please install FFmpeg first.")
+            return 1
+        if not has_codec(capabilities, args.codec):
+            print(f"Error: This FFmpeg build ({capabilities['version']}) has no encoder for {args.codec}")
+            alternatives = [c for c in CODEC_FALLBACKS.get(args.codec, []) if has_codec(capabilities, c)]
+            if alternatives:
+                print(f"Available alternatives: {', '.join(alternatives)}")
+            return 1
+    
+    if args.watch:
+        if not os.path.isdir(args.input):
+            print("Error: --watch needs the directory the frames are rendered into")
+            return 1
+        success = watch_sequence(
+            args.input, args.output, find_sequence_pattern,
+            fps=args.framerate,
+            codec=args.codec,
+            preset=args.preset,
+            segment_frames=max(1, args.segment_frames),
+            expect_frames=args.expect_frames,
+            idle_timeout=args.idle_timeout
+        )
+        return 0 if success else 1
+    
+    if args.extract:
+        pattern = extract_png_sequence(
+            args.input, args.output,
+            start_number=args.start or 0,
+            workers=args.workers,
+            compression_level=args.png_compression,
+            bit_depth=args.png_depth
+        )
+        return 0 if pattern else 1
+    
     # Determine input pattern
     input_path = args.input
     start_number = args.start
@@ -266,6 +614,74 @@ Examples:
             print("       or be a directory path for auto-detection")
             return 1
     
+    # Pre-flight: read only the PNG headers to catch size mismatches and
+    # detect sequences without any transparency before FFmpeg runs
+    has_alpha = True
+    frame_size = None
+    if not args.no_probe:
+        frame_files = list_sequence_files(input_pattern, start_number, args.frames)
+        if not frame_files:
+            print(f"Error: No frames found matching {input_pattern}")
+            return 1
+
+        try:
+            probe = probe_sequence(frame_files)
+        except PNGProbeError as e:
+            print(f"Error: {e}")
+            return 1
+
+        has_alpha = probe['has_alpha']
+        frame_size = (probe['width'], probe['height'])
+        print(f"Probed {probe['frame_count']} frames: {probe['width']}x{probe['height']}, "
+              f"alpha: {'yes' if has_alpha else 'no'}")
+        if not has_alpha:
+            print("No transparency found; using a non-alpha pixel format")
+
+    # Optional: clean invisible colour and alpha noise into temporary copies
+    # (the source frames are never modified)
+    if args.alpha_cleanup and has_alpha:
+        cleanup_dir = tempfile.mkdtemp(prefix='alpha_cleanup_', dir=os.path.dirname(os.path.abspath(args.output)))
+        atexit.register(shutil.rmtree, cleanup_dir, True)
+        frame_files = list_sequence_files(input_pattern, start_number, args.frames)
+        try:
+            result = clean_frames(
+                frame_files, [os.path.join(cleanup_dir, os.path.basename(f)) for f in frame_files],
+                low=args.alpha_low, high=args.alpha_high
+            )
+        except (RuntimeError, ValueError) as e:
+            print(f"Error: {e}")
+            return 1
+        input_pattern = os.path.join(cleanup_dir, os.path.basename(input_pattern))
+        print(f"Alpha cleanup: {result['changed']} of {result['frames']} frames changed "
+              f"in {result['seconds']:.1f}s")
+    
+    # Optional: crop away borders that are transparent in every frame
+    crop = None
+    if args.auto_crop:
+        try:
+            crop = compute_crop(list_sequence_files(input_pattern, start_number, args.frames))
+        except (RuntimeError, ValueError) as e:
+            print(f"Error: {e}")
+            return 1
+
+        if crop:
+            print(f"Auto-crop: {crop['width']}x{crop['height']} at offset "
+                  f"({crop['x']}, {crop['y']}) of {crop['source_width']}x{crop['source_height']}")
+        else:
+            print("Auto-crop: nothing to crop")
+    
+    # Optional: hash frames and hold duplicates instead of re-encoding them
+    concat_manifest = None
+    if args.collapse_duplicates:
+        frame_files = list_sequence_files(input_pattern, start_number, args.frames)
+        runs = collapse_runs(frame_files, hash_frames(frame_files))
+        if len(runs) < len(frame_files):
+            concat_manifest = f"{args.output}.ffconcat"
+            write_ffconcat(runs, args.framerate, concat_manifest)
+            print(f"Collapsed {len(frame_files)} frames into {len(runs)} unique runs")
+        else:
+            print("No duplicate frames found")
+    
     # Determine output format based on file extension
     output_ext = Path(args.output).suffix.lower()
     
@@ -276,18 +692,96 @@ Examples:
     elif output_ext in ['.mov', '.mp4'] and args.codec in ['vp9', 'vp8']:
         print(f"Warning: {args.codec} codec may not be compatible with {output_ext} format")
         print("Recommended codecs for MOV/MP4: prores_ks, qtrle")
+    elif output_ext == '.webp' and args.codec not in ['webp', 'webp_lossless']:
+        print(f"Warning: {args.codec} codec may not be compatible with WebP format")
+        print("Recommended codecs for WebP: webp, webp_lossless")
+    elif output_ext in ['.apng', '.png'] and args.codec != 'apng':
+        print(f"Warning: {args.codec} codec may not be compatible with {output_ext} format")
+        print("Recommended codec for animated PNG: apng")
+    elif args.codec == 'h264_stacked' and output_ext not in ['.mp4', '.mov']:
+        print(f"Warning: h264_stacked codec may not be compatible with {output_ext} format")
+        print("Recommended container for stacked H.264: .mp4")
+    elif args.codec == 'ffv1' and output_ext not in ['.mkv', '.avi']:
+        print(f"Warning: ffv1 codec may not be compatible with {output_ext} format")
+        print("Recommended container for FFV1: .mkv")
+    
+    # Optional: choose rate control for a target size from sample encodes
+    plan = None
+    if target_bytes:
+        if crop:
+            width, height = crop['width'], crop['height']
+        else:
+            width, height = frame_size or (None, None)
+        print(f"Sampling encodes for a target size of {target_bytes / (1024 * 1024):.2f} MB...")
+        try:
+            plan = plan_target_size(
+                args.codec, args.preset, target_bytes,
+                list_sequence_files(input_pattern, start_number, args.frames), args.framerate,
+                os.path.dirname(os.path.abspath(args.output)),
+                encoded_frames=len(runs) if concat_manifest else None,
+                width=width, height=height, has_alpha=has_alpha,
+                filter_args=['-vf', crop_filter(crop)] if crop else None
+            )
+        except FileNotFoundError:
+            print("Error: FFmpeg not found. Please install FFmpeg first.")
+            return 1
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            return 1
+        summary = plan_summary(plan)
+        print(f"Chose {summary['setting']}, predicted {summary['predicted_bytes'] / (1024 * 1024):.2f} MB")
+        if not plan['reachable']:
+            print("Warning: target size is below what the codec can reach; using its smallest setting")
     
     # Merge the sequence
-    success = merge_png_sequence(
+    encode_args = dict(
         input_pattern=input_pattern,
         output_file=args.output,
         fps=args.framerate,
         codec=args.codec,
         start_number=start_number,
         vframes=args.frames,
-        preset=args.preset
+        preset=args.preset,
+        has_alpha=has_alpha,
+        crop=crop,
+        concat_manifest=concat_manifest,
+        frame_size=frame_size
     )
     
+    def encode(codec_args):
+        if args.resumable:
+            resumable_args = {k: v for k, v in encode_args.items() if k != 'concat_manifest'}
+            return merge_resumable(codec_args=codec_args, segment_frames=max(1, args.segment_frames),
+                                   **resumable_args)
+        return merge_png_sequence(codec_args=codec_args, **encode_args)
+    
+    success = encode(plan and plan['args'])
+    
+    # One correction pass if the full encode still missed the target
+    if success and plan and not args.no_correction:
+        corrected = correct_plan(plan, os.path.getsize(args.output))
+        if corrected:
+            print(f"Output is {os.path.getsize(args.output) / (1024 * 1024):.2f} MB; "
+                  f"re-encoding with {plan_summary(corrected)['setting']}")
+            success = encode(corrected['args'])
+    
+    # Stacked outputs get a sidecar telling players where the alpha plane is
+    if success and args.codec == 'h264_stacked':
+        if crop:
+            width, height = crop['width'], crop['height']
+        elif frame_size:
+            width, height = frame_size
+        else:
+            header = read_png_header(list_sequence_files(input_pattern, start_number, 1)[0])
+            width, height = header['width'], header['height']
+        layout_file = f"{os.path.splitext(args.output)[0]}.layout.json"
+        with open(layout_file, 'w') as f:
+            json.dump(stacked_alpha_layout(width, height), f, indent=2)
+        print(f"Alpha layout written to: {layout_file}")
+    
+    if concat_manifest and os.path.exists(concat_manifest):
+        os.remove(concat_manifest)
+    
     return 0 if success else 1
 
 
@@ -0,0 +1,370 @@
+"""
+Output Storage
+Where finished encodes are kept, so any web node can serve a download that
+another node or worker produced: a local (or shared) folder, or an
+S3-compatible bucket written with streaming multipart uploads and served by
+presigned redirect or ranged reads.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Iterator, Optional, Tuple
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError:  # pragma: no cover - optional dependency
+    boto3 = None
+    BotoConfig = None
+    ClientError = Exception
+
+# S3 multipart parts must be at least 5 MiB (except the last)
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def _require_boto3():
+    if boto3 is None:
+        raise RuntimeError('S3 output storage requires boto3 (pip install boto3)')
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    First (start, end) byte range of a Range header, inclusive and clamped to size
+
+    Returns None when there is no usable range (serve the whole object) and
+    raises ValueError for a range that lies past the end (HTTP 416).
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+    first, _, last = header[len('bytes='):].split(',')[0].strip().partition('-')
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        elif last:
+            start, end = max(0, size - int(last)), size - 1
+        else:
+            return None
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise ValueError(f'Range not satisfiable for {size} bytes')
+    return start, end
+
+
+class OutputWriter(ABC):
+    """Write-once destination for one output; nothing is visible until close()"""
+
+    @abstractmethod
+    def write(self, data: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+    @abstractmethod
+    def abort(self) -> None:
+        ...
+
+
+class OutputStorage(ABC):
+    """
+    Interface shared by the storage backends
+
+    Keys are '/'-separated relative names such as '<job_id>/output.webm'.
+    """
+
+    name = 'storage'
+
+    @abstractmethod
+    def writer(self, key: str) -> OutputWriter:
+        ...
+
+    @abstractmethod
+    def size(self, key: str) -> Optional[int]:
+        """Stored size in bytes, or None if the key doesn't exist"""
+
+    @abstractmethod
+    def read(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Chunks of bytes [start, end] (inclusive; end None reads to the end)"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    def download_url(self, key: str, filename: str, expires: int) -> Optional[str]:
+        """A URL clients can fetch the object from directly, or None to proxy it"""
+        return None
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Path of the stored file if it is on this host's filesystem"""
+        return None
+
+    def upload_file(self, key: str, path: str) -> int:
+        """Copy a finished file into storage in chunks; returns its size"""
+        writer = self.writer(key)
+        size = 0
+        try:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+                    writer.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+        return size
+
+    def upload_growing_file(self, key: str, path: str, finished: Callable[[], bool],
+                            poll_seconds: float = 0.25) -> int:
+        """
+        Copy a file into storage while another process is still appending to it
+
+        Reads until finished() is true and the end of the file has been
+        reached. Only for outputs written strictly front to back (the
+        streaming containers). If the encode fails, the caller deletes the key.
+        """
+        writer = self.writer(key)
+        size = 0
+        try:
+            while not os.path.exists(path):
+                if finished():
+                    break
+                time.sleep(poll_seconds)
+            with open(path, 'rb') as f:
+                while True:
+                    done = finished()
+                    chunk = f.read(_CHUNK_SIZE)
+                    if chunk:
+                        writer.write(chunk)
+                        size += len(chunk)
+                    elif done:
+                        break
+                    else:
+                        time.sleep(poll_seconds)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+        return size
+
+
+class _LocalWriter(OutputWriter):
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        fd, self.temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.partial')
+        self.file = os.fdopen(fd, 'wb')
+
+    def write(self, data: bytes) -> None:
+        self.file.write(data)
+
+    def close(self) -> None:
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+
+    def abort(self) -> None:
+        self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+class LocalStorage(OutputStorage):
+    """Outputs in a folder; share it (e.g. NFS) to let every web node serve them"""
+
+    name = 'local'
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f'Invalid storage key: {key}')
+        return path
+
+    def writer(self, key: str) -> OutputWriter:
+        return _LocalWriter(self._path(key))
+
+    def upload_file(self, key: str, path: str) -> int:
+        # Same filesystem: a hard link is enough
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            if os.path.exists(target):
+                os.remove(target)
+            os.link(path, target)
+            return os.path.getsize(target)
+        except OSError:
+            return super().upload_file(key, path)
+
+    def size(self, key: str) -> Optional[int]:
+        path = self._path(key)
+        return os.path.getsize(path) if os.path.isfile(path) else None
+
+    def read(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        with open(self._path(key), 'rb') as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(_CHUNK_SIZE if remaining is None else min(_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, key: str) -> None:
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+        directory = os.path.dirname(path)
+        if directory != self.root and os.path.isdir(directory) and not os.listdir(directory):
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def local_path(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        return path if os.path.isfile(path) else None
+
+
+class _MultipartWriter(OutputWriter):
+    """
+    Streams into an S3 multipart upload, one part per part_size bytes
+
+    Only one part is buffered at a time. Outputs smaller than a part are
+    sent with a single PUT instead.
+    """
+
+    def __init__(self, client, bucket: str, key: str, part_size: int):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(MIN_PART_SIZE, part_size)
+        self.buffer = bytearray()
+        self.upload_id: Optional[str] = None
+        self.parts = []
+
+    def _upload_part(self, data: bytes) -> None:
+        if self.upload_id is None:
+            self.upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key)['UploadId']
+        number = len(self.parts) + 1
+        response = self.client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                           PartNumber=number, Body=data)
+        self.parts.append({'PartNumber': number, 'ETag': response['ETag']})
+
+    def write(self, data: bytes) -> None:
+        self.buffer += data
+        while len(self.buffer) >= self.part_size:
+            part = bytes(self.buffer[:self.part_size])
+            del self.buffer[:self.part_size]
+            self._upload_part(part)
+
+    def close(self) -> None:
+        if self.upload_id is None:
+            self.client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer))
+            self.buffer.clear()
+            return
+        try:
+            if self.buffer:
+                self._upload_part(bytes(self.buffer))
+                self.buffer.clear()
+            self.client.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                                  MultipartUpload={'Parts': self.parts})
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self) -> None:
+        self.buffer.clear()
+        if self.upload_id is not None:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            self.upload_id = None
+
+
+class S3Storage(OutputStorage):
+    """
+    Outputs in an S3-compatible bucket (AWS S3, MinIO, R2, ...)
+
+    Credentials come from the usual boto3 sources (environment, profile,
+    instance role). Set endpoint_url for non-AWS services or a local MinIO.
+    """
+
+    name = 's3'
+
+    def __init__(self, bucket: str, prefix: str = '', endpoint_url: Optional[str] = None,
+                 region: Optional[str] = None, part_size: int = DEFAULT_PART_SIZE, client=None):
+        if client is None:
+            _require_boto3()
+            client = boto3.client(
+                's3', endpoint_url=endpoint_url or None, region_name=region or None,
+                config=BotoConfig(signature_version='s3v4', s3={'addressing_style': 'path'} if endpoint_url else {})
+            )
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.part_size = part_size
+
+    def _key(self, key: str) -> str:
+        return f'{self.prefix}/{key}' if self.prefix else key
+
+    def writer(self, key: str) -> OutputWriter:
+        return _MultipartWriter(self.client, self.bucket, self._key(key), self.part_size)
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(key))['ContentLength']
+        except ClientError as e:
+            if str(e.response.get('Error', {}).get('Code')) in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def read(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        request = {'Bucket': self.bucket, 'Key': self._key(key)}
+        if start or end is not None:
+            request['Range'] = f"bytes={start}-{'' if end is None else end}"
+        body = self.client.get_object(**request)['Body']
+        try:
+            yield from body.iter_chunks(_CHUNK_SIZE)
+        finally:
+            body.close()
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def download_url(self, key: str, filename: str, expires: int) -> Optional[str]:
+        return self.client.generate_presigned_url('get_object', ExpiresIn=expires, Params={
+            'Bucket': self.bucket,
+            'Key': self._key(key),
+            'ResponseContentDisposition': f'attachment; filename="{filename}"',
+            'ResponseContentType': 'application/octet-stream',
+        })
+
+
+def create_storage(kind: Optional[str], path: Optional[str] = None, bucket: Optional[str] = None,
+                   prefix: str = '', endpoint_url: Optional[str] = None, region: Optional[str] = None,
+                   part_size: int = DEFAULT_PART_SIZE) -> Optional[OutputStorage]:
+    """
+    Storage backend for a configuration ('' or None: outputs stay in job folders)
+
+    Raises ValueError for unknown kinds or missing settings.
+    """
+    if not kind:
+        return None
+    if kind == 'local':
+        if not path:
+            raise ValueError('Local output storage needs a folder (OUTPUT_STORAGE_PATH)')
+        return LocalStorage(path)
+    if kind == 's3':
+        if not bucket:
+            raise ValueError('S3 output storage needs a bucket (OUTPUT_S3_BUCKET)')
+        return S3Storage(bucket, prefix, endpoint_url, region, part_size)
+    raise ValueError(f'Unknown output storage: {kind}')
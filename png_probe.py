@@ -0,0 +1,129 @@
+"""
+PNG Header Probing
+Reads only the PNG header chunks of each frame to validate a sequence before encoding
+"""
+
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Union
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# A complete PNG always ends with this zero-length IEND chunk (length, type, CRC)
+PNG_TRAILER = b'\x00\x00\x00\x00IEND\xaeB`\x82'
+
+# IHDR color types that carry an alpha channel (grayscale+alpha, RGBA)
+ALPHA_COLOR_TYPES = {4, 6}
+
+Source = Union[str, os.PathLike, BinaryIO]
+
+
+class PNGProbeError(ValueError):
+    """Raised when a frame is not a PNG or the sequence is inconsistent"""
+
+
+def _read_header(stream: BinaryIO, name: str) -> Dict[str, Any]:
+    """Parse the signature, IHDR and any tRNS chunk from an open stream"""
+    head = stream.read(33)
+    if len(head) < 33 or head[:8] != PNG_SIGNATURE or head[12:16] != b'IHDR':
+        raise PNGProbeError(f'{name} is not a valid PNG file')
+
+    width, height, bit_depth, color_type = struct.unpack('>IIBB', head[16:26])
+    has_alpha = color_type in ALPHA_COLOR_TYPES
+
+    # Palette, grayscale and RGB images can still be transparent through a
+    # tRNS chunk, which always precedes the first IDAT. Walk the chunk
+    # headers (8 bytes each) and skip over their payloads.
+    if not has_alpha:
+        while True:
+            chunk = stream.read(8)
+            if len(chunk) < 8:
+                break
+            length, chunk_type = struct.unpack('>I4s', chunk)
+            if chunk_type == b'tRNS':
+                has_alpha = True
+                break
+            if chunk_type in (b'IDAT', b'IEND'):
+                break
+            stream.seek(length + 4, os.SEEK_CUR)
+
+    return {
+        'name': name,
+        'width': width,
+        'height': height,
+        'bit_depth': bit_depth,
+        'color_type': color_type,
+        'has_alpha': has_alpha,
+    }
+
+
+def read_png_header(source: Source) -> Dict[str, Any]:
+    """
+    Read dimensions and alpha information from a PNG without decoding it
+
+    Args:
+        source: File path, or a seekable binary stream (e.g. an uploaded file).
+                Streams are rewound to their original position afterwards.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return _read_header(f, os.path.basename(os.fspath(source)))
+
+    # Werkzeug FileStorage exposes the underlying file as .stream
+    stream = getattr(source, 'stream', source)
+    name = getattr(source, 'filename', None) or getattr(stream, 'name', 'upload')
+    position = stream.tell()
+    try:
+        return _read_header(stream, str(name))
+    finally:
+        stream.seek(position)
+
+
+def is_complete_png(path: Union[str, os.PathLike]) -> bool:
+    """Whether a PNG file has been fully written (it ends with the IEND chunk)"""
+    try:
+        with open(path, 'rb') as f:
+            if f.read(8) != PNG_SIGNATURE:
+                return False
+            f.seek(-len(PNG_TRAILER), os.SEEK_END)
+            return f.read() == PNG_TRAILER
+    except OSError:
+        return False
+
+
+def probe_sequence(sources: Iterable[Source], max_workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Probe every frame header in parallel and summarise the sequence
+
+    Raises PNGProbeError if any frame is not a PNG or if frame dimensions differ.
+    Returns a dict with frame_count, width, height, has_alpha and max_bit_depth.
+    """
+    sources = list(sources)
+    if not sources:
+        raise PNGProbeError('No frames to probe')
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        headers: List[Dict[str, Any]] = list(executor.map(read_png_header, sources))
+
+    first = headers[0]
+    mismatched = [
+        h for h in headers
+        if (h['width'], h['height']) != (first['width'], first['height'])
+    ]
+    if mismatched:
+        sample = ', '.join(f"{h['name']} ({h['width']}x{h['height']})" for h in mismatched[:3])
+        more = f' and {len(mismatched) - 3} more' if len(mismatched) > 3 else ''
+        raise PNGProbeError(
+            f"Inconsistent frame sizes: expected {first['width']}x{first['height']} "
+            f"from {first['name']}, got {sample}{more}"
+        )
+
+    return {
+        'frame_count': len(headers),
+        'width': first['width'],
+        'height': first['height'],
+        'has_alpha': any(h['has_alpha'] for h in headers),
+        'max_bit_depth': max(h['bit_depth'] for h in headers),
+    }
+
@@ -0,0 +1,192 @@
+"""
+Segmented Encoding
+Encodes a frame sequence as independent segments and joins them with a
+stream-copy concat, so parts of an encode can run early (watch mode) or be
+kept across restarts (resumable encodes)
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from encoding_profiles import container_args, join_filter_args, normalize_codec
+
+# Codecs whose segments can be joined without re-encoding. Animated image
+# formats (GIF, WebP, APNG) can't be stream-copied into one file.
+SEGMENTABLE_CODECS = {'vp9', 'vp8', 'prores_ks', 'qtrle', 'png', 'ffv1', 'h264_stacked'}
+
+# Checkpoint manifest kept next to the segments of a resumable encode
+CHECKPOINT_NAME = 'checkpoint.json'
+
+Runner = Callable[[List[str]], subprocess.CompletedProcess]
+
+
+def _run(cmd: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run(cmd, capture_output=True, text=True)
+
+
+def is_segmentable(codec: str) -> bool:
+    return normalize_codec(codec) in SEGMENTABLE_CODECS
+
+
+def segment_ranges(first: int, frame_count: int, segment_frames: int) -> List[Tuple[int, int]]:
+    """Split frame_count frames starting at first into (start, count) ranges"""
+    return [
+        (start, min(segment_frames, first + frame_count - start))
+        for start in range(first, first + frame_count, segment_frames)
+    ]
+
+
+def segment_command(input_pattern: str, start: int, count: int, fps: float, codec_args: List[str],
+                    segment_file: str, filter_args: Optional[List[str]] = None) -> List[str]:
+    """FFmpeg command encoding frames [start, start + count) of a pattern into one segment"""
+    return [
+        'ffmpeg', '-y', '-v', 'error',
+        '-framerate', str(fps), '-start_number', str(start), '-i', input_pattern,
+        '-frames:v', str(count),
+    ] + join_filter_args(codec_args, filter_args) + [segment_file]
+
+
+def encode_segment(input_pattern: str, start: int, count: int, fps: float, codec_args: List[str],
+                   segment_file: str, filter_args: Optional[List[str]] = None,
+                   run: Optional[Runner] = None) -> subprocess.CompletedProcess:
+    """
+    Encode one segment atomically
+
+    The segment is written under a temporary name and renamed on success,
+    so a segment file that exists is always complete.
+    """
+    base, ext = os.path.splitext(segment_file)
+    partial_file = f'{base}.partial{ext}'
+    result = (run or _run)(segment_command(input_pattern, start, count, fps, codec_args, partial_file,
+                                           filter_args))
+    if result.returncode == 0 and os.path.exists(partial_file):
+        os.replace(partial_file, segment_file)
+    elif os.path.exists(partial_file):
+        os.remove(partial_file)
+    return result
+
+
+def concat_segments(segment_files: Sequence[str], output_file: str, run: Optional[Runner] = None,
+                    codec_args: Optional[List[str]] = None) -> subprocess.CompletedProcess:
+    """
+    Join encoded segments into the output with a stream copy
+
+    Metadata is copied from the first segment, and the container options in
+    codec_args (the arguments the segments were encoded with) are applied
+    again, so the output matches a single-pass encode.
+    """
+    list_file = f'{output_file}.segments.txt'
+    with open(list_file, 'w') as f:
+        f.write('ffconcat version 1.0\n')
+        for path in segment_files:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    try:
+        return (run or _run)([
+            'ffmpeg', '-y', '-v', 'error',
+            '-f', 'concat', '-safe', '0', '-i', list_file,
+            '-c', 'copy', '-map_metadata', '0'
+        ] + container_args(codec_args or []) + [output_file])
+    finally:
+        os.remove(list_file)
+
+
+def segment_fingerprint(input_pattern: str, start: int, count: int) -> str:
+    """
+    Fingerprint of the frames [start, start + count) of a pattern
+
+    Built from each frame's size and modification time, so it changes when
+    any frame of the segment is re-rendered (or goes missing) without
+    reading the images.
+    """
+    hasher = hashlib.sha256()
+    for number in range(start, start + count):
+        try:
+            stat = os.stat(input_pattern % number)
+            hasher.update(f'{number}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode())
+        except OSError:
+            hasher.update(f'{number}:missing\n'.encode())
+    return hasher.hexdigest()[:16]
+
+
+def _load_checkpoint(path: str, signature: Dict[str, Any]) -> Dict[str, str]:
+    """Completed segment names (and their frame fingerprints) from a checkpoint written for the same encode"""
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    completed = checkpoint.get('completed')
+    if checkpoint.get('signature') != signature or not isinstance(completed, dict):
+        return {}
+    return completed
+
+
+def _save_checkpoint(path: str, signature: Dict[str, Any], completed: Dict[str, str]) -> None:
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({'signature': signature, 'completed': completed}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def encode_resumable(input_pattern: str, start_number: int, frame_count: int, fps: float,
+                     codec_args: List[str], output_file: str, work_dir: str, segment_frames: int,
+                     filter_args: Optional[List[str]] = None, run: Optional[Runner] = None,
+                     on_segment: Optional[Callable[[int, int, bool], None]] = None) -> subprocess.CompletedProcess:
+    """
+    Encode a sequence as checkpointed segments, resuming earlier progress
+
+    Each finished segment is recorded in work_dir/checkpoint.json together
+    with the encode's parameters and a fingerprint of its frames (see
+    segment_fingerprint). Re-running the same encode (after a crash,
+    preemption or restart) skips every recorded segment whose frames are
+    unchanged, so re-rendering some frames re-encodes only their segments;
+    a checkpoint for different parameters is discarded. on_segment is
+    called with (index, total, resumed) after each segment.
+
+    Returns the first failed FFmpeg result, or the result of the final concat.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    extension = os.path.splitext(output_file)[1]
+    checkpoint_path = os.path.join(work_dir, CHECKPOINT_NAME)
+    signature = {
+        'input': input_pattern,
+        'start_number': start_number,
+        'frame_count': frame_count,
+        'fps': fps,
+        'codec_args': codec_args,
+        'filter_args': filter_args or [],
+        'segment_frames': segment_frames,
+    }
+    completed = {
+        name: fingerprint for name, fingerprint in _load_checkpoint(checkpoint_path, signature).items()
+        if os.path.exists(os.path.join(work_dir, name))
+    }
+
+    ranges = segment_ranges(start_number, frame_count, segment_frames)
+    segment_files = []
+    for index, (start, count) in enumerate(ranges):
+        name = f'segment_{index:05d}{extension}'
+        segment_file = os.path.join(work_dir, name)
+        segment_files.append(segment_file)
+
+        # Taken before encoding, so a frame rewritten mid-encode is caught next run
+        fingerprint = segment_fingerprint(input_pattern, start, count)
+        resumed = completed.get(name) == fingerprint
+        if not resumed:
+            result = encode_segment(input_pattern, start, count, fps, codec_args, segment_file, filter_args, run)
+            if result.returncode != 0:
+                return result
+            completed[name] = fingerprint
+            _save_checkpoint(checkpoint_path, signature, completed)
+
+        if on_segment:
+            on_segment(index, len(ranges), resumed)
+
+    return concat_segments(segment_files, output_file, run, codec_args)
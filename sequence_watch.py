@@ -0,0 +1,180 @@
+"""
+Sequence Watch Mode
+Follows a PNG sequence while a renderer is still writing it, encoding each
+completed run of contiguous frames as a segment and joining the segments
+once the sequence closes (by frame count or idle timeout)
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import shutil
+import struct
+import sys
+import time
+
+from encoding_profiles import DEFAULT_QUALITY, build_codec_args, normalize_codec, output_extension
+from png_probe import is_complete_png, read_png_header
+from segments import concat_segments, encode_segment, is_segmentable
+
+# inotify event flags (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class Inotify:
+    """Minimal inotify binding over ctypes; raises OSError where unavailable"""
+
+    def __init__(self, directory, mask=IN_CLOSE_WRITE | IN_MOVED_TO):
+        if not sys.platform.startswith('linux'):
+            raise OSError('inotify is only available on Linux')
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f'inotify_add_watch failed for {directory}')
+
+    def wait(self, timeout):
+        """Block until files are written or moved in, or timeout; returns their names"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        names = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            names.append(os.fsdecode(data[offset:offset + length].rstrip(b'\0')))
+            offset += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+def watch_sequence(directory, output_file, find_pattern, fps=24, codec='prores_ks', preset=None,
+                   segment_frames=240, expect_frames=None, idle_timeout=60.0, poll_interval=1.0):
+    """
+    Encode a sequence as it is rendered into directory
+
+    Frames are taken in order from the sequence's first frame; a frame
+    counts once it is fully written (see png_probe.is_complete_png). Every
+    segment_frames contiguous frames are encoded straight away, and the
+    sequence closes when expect_frames frames have landed or nothing new
+    has arrived for idle_timeout seconds.
+
+    Args:
+        find_pattern: Pattern detection (merge_transparent_video.find_sequence_pattern)
+
+    Returns True on success.
+    """
+    codec = normalize_codec(codec)
+    if not is_segmentable(codec):
+        print(f"Error: Watch mode needs a codec whose segments can be joined, not {codec}")
+        return False
+
+    try:
+        watcher = Inotify(directory)
+        print(f"Watching {directory} (inotify)")
+    except OSError:
+        watcher = None
+        print(f"Watching {directory} (polling every {poll_interval}s)")
+
+    segment_dir = f"{output_file}.segments"
+    os.makedirs(segment_dir, exist_ok=True)
+    extension = output_extension(codec)
+
+    pattern = None
+    codec_args = None
+    next_frame = encoded_upto = first = 0
+    segment_files = []
+    last_progress = time.monotonic()
+
+    def encode(start, count):
+        segment_file = os.path.join(segment_dir, f'segment_{len(segment_files):05d}.{extension}')
+        result = encode_segment(os.path.join(directory, pattern), start, count, fps, codec_args, segment_file)
+        if result.returncode != 0:
+            print(f"Error: Segment {start}-{start + count - 1} failed:\n{result.stderr}")
+            return False
+        segment_files.append(segment_file)
+        print(f"Encoded frames {start}-{start + count - 1} ({len(segment_files)} segments)")
+        return True
+
+    try:
+        while True:
+            if pattern is None:
+                try:
+                    pattern, first, _, _ = find_pattern(directory)
+                except OSError:
+                    pattern = None
+                if pattern:
+                    next_frame = encoded_upto = first
+                    print(f"Detected pattern: {pattern} starting at frame {first}")
+
+            if pattern:
+                # Advance over every contiguous, fully written frame
+                while is_complete_png(os.path.join(directory, pattern % next_frame)):
+                    if codec_args is None:
+                        header = read_png_header(os.path.join(directory, pattern % next_frame))
+                        # Later frames may add transparency, so keep the alpha plane
+                        codec_args = build_codec_args(codec, preset or DEFAULT_QUALITY,
+                                                      header['width'], header['height'], True)
+                    next_frame += 1
+                    last_progress = time.monotonic()
+                    if expect_frames and next_frame - first >= expect_frames:
+                        break
+
+                while next_frame - encoded_upto >= segment_frames:
+                    if not encode(encoded_upto, segment_frames):
+                        return False
+                    encoded_upto += segment_frames
+
+                if expect_frames and next_frame - first >= expect_frames:
+                    print(f"All {expect_frames} frames arrived")
+                    break
+
+            idle = time.monotonic() - last_progress
+            if idle >= idle_timeout:
+                print(f"No new frames for {idle_timeout:.0f}s; closing the sequence")
+                break
+
+            timeout = min(poll_interval, idle_timeout - idle)
+            if watcher:
+                watcher.wait(timeout)
+            else:
+                time.sleep(timeout)
+    except KeyboardInterrupt:
+        print("\nInterrupted; encoding the frames received so far")
+    finally:
+        if watcher:
+            watcher.close()
+
+    if pattern is None or next_frame == first:
+        print("Error: No frames arrived")
+        shutil.rmtree(segment_dir, ignore_errors=True)
+        return False
+
+    if expect_frames and next_frame - first < expect_frames:
+        print(f"Warning: Only {next_frame - first} of {expect_frames} frames arrived")
+
+    if next_frame > encoded_upto and not encode(encoded_upto, next_frame - encoded_upto):
+        return False
+
+    result = concat_segments(segment_files, output_file, codec_args=codec_args)
+    if result.returncode != 0:
+        print(f"Error: Joining segments failed:\n{result.stderr}")
+        return False
+
+    shutil.rmtree(segment_dir, ignore_errors=True)
+    print(f"\nSuccess! {next_frame - first} frames saved to: {output_file}")
+    return True
@@ -13,6 +13,7 @@ import {
 } from './types';
 import { AppError } from './utils/errors';
 import { ffmpegService } from './services/ffmpeg';
+import { serverEncoder, SERVER_CODECS } from './services/server';
 import { deviceDetector, addResponsiveClasses } from './utils/device';
 
 class TransparentVideoApp {
@@ -210,6 +211,13 @@ class TransparentVideoApp {
         }
 
         if (codecSelect) {
+            // Server-only codecs need uploads enabled on the server
+            if (!this.config?.features.fileUploads) {
+                Array.from(codecSelect.options)
+                    .filter(option => SERVER_CODECS.includes(option.value as ProcessingOptions['codec']))
+                    .forEach(option => option.remove());
+            }
+
             codecSelect.addEventListener('change', (e) => {
                 const codec = (e.target as HTMLSelectElement).value as ProcessingOptions['codec'];
                 this.state.processingOptions.codec = codec;
@@ -333,7 +341,9 @@ class TransparentVideoApp {
             console.log('🎬 Starting video processing...');
 
             const startTime = performance.now();
-            const outputBlob = await ffmpegService.processFiles(
+            // Codecs the browser build can't encode are sent to the server
+            const encoder = serverEncoder.handles(this.state.processingOptions.codec) ? serverEncoder : ffmpegService;
+            const outputBlob = await encoder.processFiles(
                 this.state.selectedFiles,
                 this.state.processingOptions,
                 this.onProgress
@@ -698,13 +708,19 @@ class TransparentVideoApp {
         }
     }
 
-    private getOutputFormat(codec: string): 'webm' | 'mp4' | 'gif' | 'mov' {
-        const formatMap: Record<string, 'webm' | 'mp4' | 'gif' | 'mov'> = {
+    private getOutputFormat(codec: string): ProcessingOptions['outputFormat'] {
+        const formatMap: Record<string, ProcessingOptions['outputFormat']> = {
             'vp9': 'webm',
             'vp8': 'webm',
             'h264': 'mp4',
             'gif': 'gif',
-            'prores': 'mov'
+            'prores': 'mov',
+            'qtrle': 'mov',
+            'webp': 'webp',
+            'webp_lossless': 'webp',
+            'apng': 'apng',
+            'ffv1': 'mkv',
+            'h264_stacked': 'mp4'
         };
         return formatMap[codec] || 'webm';
     }
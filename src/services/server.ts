@@ -0,0 +1,199 @@
+/**
+ * Server-side encoding through the job API of app_new.py
+ * Used for codecs the in-browser FFmpeg build cannot encode
+ */
+
+import { ProcessingOptions } from '../types';
+import { AppError } from '../utils/errors';
+
+// Codecs only the server encodes
+export const SERVER_CODECS: ReadonlyArray<ProcessingOptions['codec']> = [
+    'qtrle', 'webp', 'webp_lossless', 'apng', 'ffv1', 'h264_stacked'
+];
+
+const STATUS_POLL_INTERVAL_MS = 1000;
+
+// Browsers allow about six concurrent requests per host over HTTP/1.1
+const MAX_CHUNK_REQUESTS = 6;
+const CHUNK_RETRY_DELAY_MS = 1000;
+
+interface JobStatus {
+    status: string;
+    progress: number;
+    error?: string;
+}
+
+export class ServerEncoder {
+    private static instance: ServerEncoder;
+
+    private constructor() {}
+
+    public static getInstance(): ServerEncoder {
+        if (!ServerEncoder.instance) {
+            ServerEncoder.instance = new ServerEncoder();
+        }
+        return ServerEncoder.instance;
+    }
+
+    public handles(codec: ProcessingOptions['codec']): boolean {
+        return SERVER_CODECS.includes(codec);
+    }
+
+    public async processFiles(
+        files: File[],
+        options: ProcessingOptions,
+        onProgress?: (progress: number) => void
+    ): Promise<Blob> {
+        // Frames are encoded in name order, as in the browser
+        const sortedFiles = [...files].sort((a, b) => a.name.localeCompare(b.name));
+
+        const jobId = await this.upload(sortedFiles);
+        const job = await this.request(`/process/${jobId}`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ fps: options.fps, codec: options.codec, quality: options.quality })
+        }, 'PROCESSING_FAILED');
+
+        // Chunked jobs are encoded by our own requests, one segment each
+        if (job.chunks && job.chunk_url) {
+            void this.runChunks(job.chunk_url, job.chunks);
+        }
+
+        await this.waitForCompletion(jobId, onProgress);
+
+        const response = await fetch(`/download/${jobId}`);
+        if (!response.ok) {
+            throw await this.responseError(response, 'DOWNLOAD_FAILED');
+        }
+        return response.blob();
+    }
+
+    /**
+     * Upload frames and return the job ID
+     *
+     * Hash-first: the server is asked which frames it is missing (by SHA-256)
+     * and only those are sent, with a manifest naming every frame. Falls back
+     * to sending every frame when hashing or the check is unavailable, or
+     * when frames were evicted between the check and the upload (409).
+     */
+    public async upload(files: File[]): Promise<string> {
+        if (window.crypto?.subtle) {
+            try {
+                const digests = await Promise.all(files.map(file => this.sha256Hex(file)));
+                const check = await fetch('/upload/check', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ digests })
+                });
+
+                if (check.ok) {
+                    const missing = new Set<string>((await check.json()).missing);
+                    const formData = new FormData();
+                    formData.append('manifest', JSON.stringify(
+                        files.map((file, i) => ({ name: file.name, digest: digests[i] }))
+                    ));
+                    files.forEach((file, i) => {
+                        if (missing.delete(digests[i])) {
+                            formData.append('files', file, file.name);
+                        }
+                    });
+
+                    const response = await fetch('/upload', { method: 'POST', body: formData });
+                    if (response.status !== 409) {
+                        if (!response.ok) {
+                            throw await this.responseError(response, 'UPLOAD_FAILED');
+                        }
+                        return (await response.json()).job_id;
+                    }
+                }
+            } catch (error) {
+                if (error instanceof AppError) {
+                    throw error;
+                }
+                console.warn('Hash-first upload failed, sending every frame:', error);
+            }
+        }
+
+        const formData = new FormData();
+        files.forEach(file => formData.append('files', file, file.name));
+        const data = await this.request('/upload', { method: 'POST', body: formData }, 'UPLOAD_FAILED');
+        return data.job_id;
+    }
+
+    /**
+     * Call the chunk endpoint from parallel loops until the job is finished
+     * Each call encodes one segment and the last one joins them; failures
+     * are left to status polling to report.
+     */
+    private async runChunks(chunkUrl: string, chunkCount: number): Promise<void> {
+        let finished = false;
+        const worker = async () => {
+            while (!finished) {
+                try {
+                    const response = await fetch(chunkUrl, { method: 'POST' });
+                    if (response.status === 202 || response.status === 429) {
+                        await new Promise(resolve => setTimeout(resolve, CHUNK_RETRY_DELAY_MS));
+                        continue;
+                    }
+                    const data = await response.json();
+                    if (!response.ok || data.status !== 'processing') {
+                        finished = true;
+                    }
+                } catch {
+                    finished = true;
+                }
+            }
+        };
+
+        const workers: Promise<void>[] = [];
+        for (let i = 0; i < Math.min(chunkCount, MAX_CHUNK_REQUESTS); i++) {
+            workers.push(worker());
+        }
+        await Promise.all(workers);
+    }
+
+    private async waitForCompletion(jobId: string, onProgress?: (progress: number) => void): Promise<void> {
+        for (;;) {
+            const job: JobStatus = await this.request(`/status/${jobId}`, {}, 'STATUS_FAILED');
+            onProgress?.(job.progress ?? 0);
+
+            if (job.status === 'completed') {
+                return;
+            }
+            if (job.status === 'failed' || job.status === 'cancelled') {
+                throw new AppError({
+                    code: 'PROCESSING_FAILED',
+                    message: job.error || `Encoding ${job.status} on the server.`,
+                    timestamp: new Date()
+                });
+            }
+            await new Promise(resolve => setTimeout(resolve, STATUS_POLL_INTERVAL_MS));
+        }
+    }
+
+    private async sha256Hex(file: File): Promise<string> {
+        const hash = await window.crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+        return Array.from(new Uint8Array(hash)).map(b => b.toString(16).padStart(2, '0')).join('');
+    }
+
+    private async request(url: string, init: RequestInit, code: string): Promise<any> {
+        const response = await fetch(url, init);
+        if (!response.ok) {
+            throw await this.responseError(response, code);
+        }
+        return response.json();
+    }
+
+    private async responseError(response: Response, code: string): Promise<AppError> {
+        let message = `Server request failed (HTTP ${response.status}).`;
+        try {
+            message = (await response.json()).error || message;
+        } catch {
+            // Not a JSON error body
+        }
+        return new AppError({ code, message, details: { status: response.status }, timestamp: new Date() });
+    }
+}
+
+// Singleton export
+export const serverEncoder = ServerEncoder.getInstance();
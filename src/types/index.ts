@@ -49,9 +49,9 @@ export interface AppConfig {
 // Processing Options
 export interface ProcessingOptions {
     fps: number;
-    codec: 'vp9' | 'vp8' | 'gif' | 'prores' | 'qtrle' | 'h264';
+    codec: 'vp9' | 'vp8' | 'gif' | 'prores' | 'qtrle' | 'h264' | 'webp' | 'webp_lossless' | 'apng' | 'ffv1' | 'h264_stacked';
     quality: 'best' | 'good' | 'realtime';
-    outputFormat: 'webm' | 'mp4' | 'gif' | 'mov';
+    outputFormat: 'webm' | 'mp4' | 'gif' | 'mov' | 'webp' | 'apng' | 'mkv';
     scale?: {
         width?: number;
         height?: number;
@@ -0,0 +1,89 @@
+"""
+Job Staging Area
+Places job directories in a RAM-backed filesystem (tmpfs, /dev/shm) under a
+global memory budget, spilling jobs that don't fit to the disk upload folder
+"""
+
+import os
+import shutil
+import threading
+from typing import Dict, Optional, Tuple
+
+
+def default_memory_root() -> Optional[str]:
+    """/dev/shm when it exists and is writable, else None (disk only)"""
+    shm = '/dev/shm'
+    if os.path.isdir(shm) and os.access(shm, os.W_OK):
+        return os.path.join(shm, 'sequenceconverter')
+    return None
+
+
+class StagingArea:
+    """
+    Allocates per-job directories in memory or on disk
+
+    Each memory-staged job reserves its expected footprint against the
+    budget until it is released, so concurrent jobs can never exhaust RAM;
+    anything that would exceed the budget (or the tmpfs free space) is
+    placed on disk instead.
+    """
+
+    def __init__(self, disk_root: str, memory_root: Optional[str], memory_budget_bytes: int):
+        self.disk_root = disk_root
+        self.memory_root = memory_root if memory_budget_bytes > 0 else None
+        self.memory_budget_bytes = memory_budget_bytes
+        self._reservations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def memory_reserved_bytes(self) -> int:
+        with self._lock:
+            return sum(self._reservations.values())
+
+    def _memory_free_bytes(self) -> int:
+        try:
+            return shutil.disk_usage(self.memory_root).free
+        except OSError:
+            return 0
+
+    def allocate(self, job_id: str, expected_bytes: int, memory: bool = True) -> Tuple[str, bool]:
+        """
+        Create the job directory
+
+        Returns (path, in_memory). expected_bytes should cover the frames
+        plus every intermediate and output file the job will write. With
+        memory=False the job always goes to disk.
+        """
+        if self.memory_root and memory:
+            with self._lock:
+                reserved = sum(self._reservations.values())
+                fits = reserved + expected_bytes <= self.memory_budget_bytes
+                if fits:
+                    os.makedirs(self.memory_root, exist_ok=True)
+                    fits = expected_bytes <= self._memory_free_bytes()
+                if fits:
+                    self._reservations[job_id] = expected_bytes
+
+            if fits:
+                job_dir = os.path.join(self.memory_root, f'job_{job_id}')
+                os.makedirs(job_dir, exist_ok=True)
+                return job_dir, True
+
+        job_dir = os.path.join(self.disk_root, f'job_{job_id}')
+        os.makedirs(job_dir, exist_ok=True)
+        return job_dir, False
+
+    def release(self, job_id: str) -> None:
+        """Return a job's memory reservation to the budget (the caller removes the directory)"""
+        with self._lock:
+            self._reservations.pop(job_id, None)
+
+    def stats(self) -> Dict[str, object]:
+        """Budget usage for the stats endpoint"""
+        with self._lock:
+            return {
+                'memory_enabled': self.memory_root is not None,
+                'memory_jobs': len(self._reservations),
+                'memory_reserved_mb': round(sum(self._reservations.values()) / (1024 * 1024), 1),
+                'memory_budget_mb': round(self.memory_budget_bytes / (1024 * 1024), 1),
+            }
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Static Assets
+Serves the static folder with content-hashed URLs, brotli/gzip variants
+compressed once ahead of time, and ETag revalidation. url_for('static', ...)
+links carry the file's hash (app.js -> app.0123456789.js), so those URLs are
+cached forever; unhashed URLs (e.g. the FFmpeg core's own wasm fetch) are
+revalidated and answered with 304 when unchanged.
+
+Run `python static_assets.py` at build time to precompress everything up
+front; otherwise variants are compressed in the background at startup.
+"""
+
+import argparse
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import sys
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+from flask import Flask, Response, abort, request, send_file
+from werkzeug.utils import safe_join
+
+# Text-like files worth compressing; images and video are already compressed
+COMPRESSIBLE_EXTENSIONS = {'.js', '.mjs', '.css', '.wasm', '.svg', '.json', '.html', '.txt', '.xml', '.map'}
+# Smaller files gain less than the extra headers cost
+MIN_COMPRESS_BYTES = 1024
+# Variants that don't save at least this fraction are not kept
+MIN_SAVING = 0.1
+
+HASH_LENGTH = 10
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+# Content-Encoding tokens, best first, and the file suffix of each variant
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+# A hashed URL: name.<hash>.ext
+_HASHED_NAME = re.compile(r'^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[A-Za-z0-9]+)$' % HASH_LENGTH)
+
+_CHUNK_SIZE = 1024 * 1024
+
+mimetypes.add_type('application/wasm', '.wasm')
+mimetypes.add_type('text/javascript', '.mjs')
+
+
+def file_hash(path: str) -> str:
+    """Short content hash used in asset URLs and ETags"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(filename: str, digest: str) -> str:
+    """'ffmpeg/ffmpeg.min.js' -> 'ffmpeg/ffmpeg.min.<digest>.js'"""
+    base, ext = os.path.splitext(filename)
+    return f'{base}.{digest}{ext}' if ext else filename
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Accept-Encoding as {coding: q}; codings with q=0 are refused"""
+    accepted: Dict[str, float] = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        match = re.search(r'q=([0-9.]+)', params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(header: Optional[str], available: List[str]) -> Optional[str]:
+    """Best available variant the client accepts (None: send the file as is)"""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    ranked = [(accepted.get(coding, wildcard), -index, coding)
+              for index, (coding, _) in enumerate(ENCODINGS) if coding in available]
+    ranked = [entry for entry in ranked if entry[0] > 0]
+    return max(ranked)[2] if ranked else None
+
+
+def _compress(data: bytes, coding: str) -> bytes:
+    if coding == 'br':
+        return brotli.compress(data, quality=11)
+    # mtime=0 keeps the output identical across builds
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for GET)"""
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    tags = [tag.strip() for tag in header.split(',')]
+    return etag in tags or f'W/{etag}' in tags
+
+
+class StaticAssets:
+    """
+    Content-hashed, precompressed delivery of a Flask app's static folder
+
+    Hashes are recomputed whenever a file's size or modification time
+    changes. Compressed variants are stored in cache_folder under the
+    content hash, so each version of a file is compressed only once, even
+    across restarts and deploys that share the folder.
+    """
+
+    def __init__(self, static_folder: str, cache_folder: Optional[str] = None):
+        self.static_folder = os.path.abspath(static_folder)
+        self.cache_folder = cache_folder or os.path.join(self.static_folder, '.precompressed')
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask, precompress: bool = True) -> None:
+        """
+        Serve app's static endpoint through this object
+
+        url_for('static', filename=...) then returns hashed URLs. With
+        precompress, variants missing from the cache are built in a
+        background thread; files are sent uncompressed until theirs exist.
+        """
+        app.view_functions['static'] = self.send
+        app.url_defaults(self._hash_url)
+        if precompress:
+            threading.Thread(target=self.precompress, daemon=True, name='StaticPrecompress').start()
+
+    def _hash_url(self, endpoint: str, values: Dict[str, Any]) -> None:
+        if endpoint == 'static' and 'filename' in values:
+            entry = self.entry(values['filename'])
+            if entry:
+                values['filename'] = hashed_name(values['filename'], entry['hash'])
+
+    def _path(self, filename: str) -> Optional[str]:
+        """Absolute path of a static file, or None if missing or hidden"""
+        if any(part.startswith('.') for part in filename.split('/')):
+            return None
+        path = safe_join(self.static_folder, filename)
+        return path if path and os.path.isfile(path) else None
+
+    def entry(self, filename: str) -> Optional[Dict[str, Any]]:
+        """{'path', 'hash', 'size'} for a static file, rehashed when it changes"""
+        path = self._path(filename)
+        if path is None:
+            return None
+        stat = os.stat(path)
+        key = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            entry = self._entries.get(filename)
+            if entry and entry['key'] == key:
+                return entry
+        entry = {'path': path, 'hash': file_hash(path), 'size': stat.st_size, 'key': key}
+        with self._lock:
+            self._entries[filename] = entry
+        return entry
+
+    def variant_path(self, entry: Dict[str, Any], coding: str) -> str:
+        """Cache location of a compressed variant (keyed by content, not name)"""
+        suffix = dict(ENCODINGS)[coding]
+        ext = os.path.splitext(entry['path'])[1]
+        return os.path.join(self.cache_folder, entry['hash'][:2], f"{entry['hash']}{ext}{suffix}")
+
+    def available_encodings(self, entry: Dict[str, Any]) -> List[str]:
+        return [coding for coding, _ in ENCODINGS if os.path.exists(self.variant_path(entry, coding))]
+
+    def compress(self, filename: str) -> List[str]:
+        """Write the missing variants of one file; returns the encodings it has"""
+        entry = self.entry(filename)
+        if entry is None:
+            return []
+        ext = os.path.splitext(filename)[1].lower()
+        if ext not in COMPRESSIBLE_EXTENSIONS or entry['size'] < MIN_COMPRESS_BYTES:
+            return []
+
+        data = None
+        for coding, _ in ENCODINGS:
+            target = self.variant_path(entry, coding)
+            if os.path.exists(target) or (coding == 'br' and brotli is None):
+                continue
+            if data is None:
+                with open(entry['path'], 'rb') as f:
+                    data = f.read()
+            compressed = _compress(data, coding)
+            if len(compressed) > len(data) * (1 - MIN_SAVING):
+                continue
+
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(compressed)
+                os.replace(temp_path, target)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        return self.available_encodings(entry)
+
+    def filenames(self) -> List[str]:
+        """Every servable file in the static folder (relative, '/'-separated)"""
+        names = []
+        for dirpath, dirnames, files in os.walk(self.static_folder):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            relative = os.path.relpath(dirpath, self.static_folder)
+            for name in files:
+                if not name.startswith('.'):
+                    names.append(name if relative == '.' else f'{relative}/{name}'.replace(os.sep, '/'))
+        return sorted(names)
+
+    def precompress(self) -> Dict[str, List[str]]:
+        """Compress every compressible file; a read-only cache folder leaves files uncompressed"""
+        results = {}
+        for filename in self.filenames():
+            try:
+                encodings = self.compress(filename)
+            except OSError:
+                break
+            if encodings:
+                results[filename] = encodings
+        return results
+
+    def resolve(self, filename: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Entry for a requested name and whether it was requested by its current hash"""
+        entry = self.entry(filename)
+        if entry:
+            return entry, False
+        match = _HASHED_NAME.match(filename)
+        if not match:
+            return None, False
+        entry = self.entry(match.group('stem') + match.group('ext'))
+        return entry, bool(entry and entry['hash'] == match.group('hash'))
+
+    def send(self, filename: str) -> Response:
+        """
+        Static view: the best variant for Accept-Encoding, or 304 on a matching ETag
+
+        A hashed URL for an older version still gets the current file, but
+        without the immutable caching, so it can't be pinned under that URL.
+        """
+        entry, hashed = self.resolve(filename)
+        if entry is None:
+            abort(404)
+
+        compressible = os.path.splitext(entry['path'])[1].lower() in COMPRESSIBLE_EXTENSIONS
+        coding = choose_encoding(request.headers.get('Accept-Encoding'), self.available_encodings(entry))
+        etag = f'"{entry["hash"]}-{coding}"' if coding else f'"{entry["hash"]}"'
+        headers = {'ETag': etag, 'Cache-Control': IMMUTABLE_CACHE if hashed else REVALIDATE_CACHE}
+        if compressible:
+            headers['Vary'] = 'Accept-Encoding'
+
+        if _etag_matches(request.headers.get('If-None-Match'), etag):
+            return Response(status=304, headers=headers)
+
+        mimetype = mimetypes.guess_type(entry['path'])[0] or 'application/octet-stream'
+        if coding:
+            response = send_file(self.variant_path(entry, coding), mimetype=mimetype, conditional=False,
+                                 etag=False, max_age=None)
+            response.headers['Content-Encoding'] = coding
+        else:
+            # Uncompressed files keep byte-range support (e.g. video seeking)
+            response = send_file(entry['path'], mimetype=mimetype, conditional=True, etag=False, max_age=None)
+        response.headers.update(headers)
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompress static assets (brotli and gzip)')
+    parser.add_argument('--static', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'),
+                        help='Static folder (default: ./static)')
+    parser.add_argument('--cache', default=os.getenv('STATIC_CACHE_FOLDER'),
+                        help='Where variants are stored (default: STATIC_CACHE_FOLDER or <static>/.precompressed)')
+    args = parser.parse_args()
+
+    if brotli is None:
+        print("Warning: Brotli is not installed (pip install Brotli); writing gzip variants only")
+    results = StaticAssets(args.static, args.cache).precompress()
+    for filename, encodings in results.items():
+        print(f"{filename}: {', '.join(encodings)}")
+    print(f"Precompressed {len(results)} files")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
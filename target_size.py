@@ -0,0 +1,213 @@
+"""
+Target File Size
+Chooses rate-control settings that land an encode under a requested file size.
+Short clips spread across the sequence are encoded at a few settings, a size
+model is fitted to the results, and one full encode is run with the chosen
+setting (plus an optional correction pass if it still comes out too large).
+"""
+
+import math
+import os
+import subprocess
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from encoding_profiles import build_codec_args, normalize_codec, output_extension
+from frame_dedupe import concat_input_args, write_ffconcat
+
+# Rate-control knob per codec: (flag, lowest, highest, probe values).
+# Output size is close to exponential in CRF and WebP quality, so the model
+# fits log(bytes per frame) as a straight line through the probe points.
+RATE_KNOBS = {
+    'vp9': ('-crf', 4, 63, (20, 35, 50)),
+    'vp8': ('-crf', 4, 63, (8, 20, 40)),
+    'webp': ('-quality', 0, 100, (40, 70, 90)),
+}
+TARGET_SIZE_CODECS = tuple(RATE_KNOBS)
+
+# Sample clips of consecutive frames, so inter-frame prediction is measured
+SAMPLE_CLIPS = 4
+SAMPLE_CLIP_FRAMES = 6
+
+# Aim a little under the target to absorb model error and container overhead
+SIZE_MARGIN = 0.95
+
+Runner = Callable[[List[str]], subprocess.CompletedProcess]
+
+
+def _run(cmd: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run(cmd, capture_output=True, text=True)
+
+
+def parse_size(value: str) -> int:
+    """Parse a size like '5M', '750K', '1.5MB' or '2000000' into bytes"""
+    text = str(value).strip().upper().rstrip('B')
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    multiplier = units.get(text[-1:], 1)
+    if multiplier != 1:
+        text = text[:-1]
+    size = int(float(text) * multiplier)
+    if size <= 0:
+        raise ValueError(f'Invalid size: {value}')
+    return size
+
+
+def sample_frames(frames: Sequence[str], clips: int = SAMPLE_CLIPS,
+                  clip_frames: int = SAMPLE_CLIP_FRAMES) -> List[str]:
+    """Short runs of consecutive frames spread evenly across the sequence"""
+    if len(frames) <= clips * clip_frames:
+        return list(frames)
+    step = (len(frames) - clip_frames) / (clips - 1)
+    picked: List[str] = []
+    for clip in range(clips):
+        start = round(clip * step)
+        picked.extend(frames[start:start + clip_frames])
+    return picked
+
+
+def set_arg(args: List[str], flag: str, value: Any) -> List[str]:
+    """Copy of an FFmpeg argument list with flag's value replaced (or appended)"""
+    args = list(args)
+    if flag in args:
+        args[args.index(flag) + 1] = str(value)
+    else:
+        args.extend([flag, str(value)])
+    return args
+
+
+def _fit(points: Sequence[Dict[str, Any]]):
+    """Least-squares fit of log(bytes per frame) = a + b * value"""
+    xs = [p['value'] for p in points]
+    ys = [math.log(max(1.0, p['bytes_per_frame'])) for p in points]
+    n = len(points)
+    mean_x, mean_y = sum(xs) / n, sum(ys) / n
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    b = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x if var_x else 0.0
+    return mean_y - b * mean_x, b
+
+
+def _solve(plan: Dict[str, Any]) -> None:
+    """Pick the knob value whose predicted size meets the target, in place"""
+    flag, low, high, _ = RATE_KNOBS[plan['codec']]
+    a, b = plan['fit']
+    goal = math.log(plan['target_bytes'] * SIZE_MARGIN / plan['encoded_frames'])
+
+    if b == 0:
+        # Size didn't respond to the knob (e.g. tiny or static frames)
+        value = min(plan['samples'], key=lambda p: p['bytes_per_frame'])['value']
+    else:
+        exact = (goal - a) / b
+        # Round towards the smaller output
+        value = math.ceil(exact) if b < 0 else math.floor(exact)
+    value = max(low, min(high, value))
+
+    predicted = math.exp(a + b * value) * plan['encoded_frames']
+    plan['value'] = value
+    plan['predicted_bytes'] = int(predicted)
+    plan['reachable'] = predicted <= plan['target_bytes']
+    plan['args'] = set_arg(plan['base_args'], flag, value)
+
+
+def plan_target_size(codec: str, quality: str, target_bytes: int, frames: Sequence[str], fps: float,
+                     work_dir: str, encoded_frames: Optional[int] = None, width: Optional[int] = None,
+                     height: Optional[int] = None, has_alpha: bool = True,
+                     filter_args: Optional[List[str]] = None, run: Optional[Runner] = None) -> Dict[str, Any]:
+    """
+    Probe-encode samples and choose codec arguments for a target size
+
+    Args:
+        codec: One of TARGET_SIZE_CODECS
+        quality: Quality tier for every other encoder setting
+        target_bytes: Requested maximum output size
+        frames: Every frame of the sequence, in order
+        fps: Frame rate of the sequence
+        work_dir: Directory for the temporary sample encodes
+        encoded_frames: Frames the full encode will contain, if fewer than
+                        len(frames) (held duplicates are collapsed)
+        width, height, has_alpha: As for build_codec_args
+        filter_args: Output filter arguments (e.g. crop) for the samples
+        run: Callable that runs an FFmpeg command (defaults to subprocess.run)
+
+    Returns a plan dict with the chosen 'value', the full 'args', the
+    'predicted_bytes' and whether the target is 'reachable' at all.
+    Raises ValueError for unsupported codecs and RuntimeError if the
+    sample encodes fail.
+    """
+    codec = normalize_codec(codec)
+    if codec not in RATE_KNOBS:
+        raise ValueError(f"Target size is only supported for {', '.join(TARGET_SIZE_CODECS)}")
+
+    run = run or _run
+    flag, _, _, probe_values = RATE_KNOBS[codec]
+    base_args = build_codec_args(codec, quality, width, height, has_alpha)
+
+    # VP8 treats -b:v as a ceiling in CRF mode; cap it at the target's average bitrate
+    if codec == 'vp8':
+        duration = len(frames) / fps
+        base_args = set_arg(base_args, '-b:v', max(1, int(target_bytes * 8 * SIZE_MARGIN / duration)))
+
+    samples = sample_frames(frames)
+    manifest = write_ffconcat([(path, 1) for path in samples], fps,
+                              os.path.join(work_dir, 'target_probe.ffconcat'))
+    points = []
+    try:
+        for value in probe_values:
+            probe_file = os.path.join(work_dir, f'target_probe_{value}.{output_extension(codec)}')
+            cmd = ['ffmpeg', '-y', '-v', 'error'] + concat_input_args(manifest)
+            cmd += set_arg(base_args, flag, value) + (filter_args or []) + [probe_file]
+            result = run(cmd)
+            if result.returncode != 0 or not os.path.exists(probe_file):
+                raise RuntimeError(f'Sample encode failed: {result.stderr}')
+            points.append({'value': value, 'bytes_per_frame': os.path.getsize(probe_file) / len(samples)})
+            os.remove(probe_file)
+    finally:
+        os.remove(manifest)
+
+    plan = {
+        'codec': codec,
+        'target_bytes': target_bytes,
+        'encoded_frames': encoded_frames or len(frames),
+        'samples': points,
+        'fit': _fit(points),
+        'base_args': base_args,
+        'passes': 1,
+    }
+    _solve(plan)
+    return plan
+
+
+def correct_plan(plan: Dict[str, Any], actual_bytes: int) -> Optional[Dict[str, Any]]:
+    """
+    Adjust a plan after a full encode came out over the target
+
+    The fitted slope is kept and the intercept is shifted so the model
+    agrees with the actual size. Returns None if the encode already fits
+    or the knob is at its limit.
+    """
+    if actual_bytes <= plan['target_bytes']:
+        return None
+
+    flag, low, high, _ = RATE_KNOBS[plan['codec']]
+    a, b = plan['fit']
+    corrected = dict(plan, fit=(a + math.log(actual_bytes / max(1, plan['predicted_bytes'])), b))
+    corrected['passes'] = plan['passes'] + 1
+    _solve(corrected)
+
+    if corrected['value'] == plan['value']:
+        # Model says we're already there; step one unit towards smaller output
+        step = 1 if b < 0 else -1
+        corrected['value'] = max(low, min(high, plan['value'] + step))
+        corrected['args'] = set_arg(plan['base_args'], flag, corrected['value'])
+    if corrected['value'] == plan['value']:
+        return None
+    return corrected
+
+
+def plan_summary(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-friendly description of a plan for job status"""
+    return {
+        'target_bytes': plan['target_bytes'],
+        'predicted_bytes': plan['predicted_bytes'],
+        'setting': f"{RATE_KNOBS[plan['codec']][0].lstrip('-')}={plan['value']}",
+        'reachable': plan['reachable'],
+        'passes': plan['passes'],
+    }
@@ -0,0 +1,161 @@
+/**
+ * Unit tests for the server encoding service
+ */
+
+import { ServerEncoder, SERVER_CODECS } from '../../src/services/server';
+import { AppError } from '../../src/utils/errors';
+
+const mockFetch = global.fetch as jest.MockedFunction<typeof fetch>;
+
+function jsonResponse(body: any, status = 200): Response {
+  return {
+    ok: status >= 200 && status < 300,
+    status,
+    json: jest.fn().mockResolvedValue(body),
+    blob: jest.fn().mockResolvedValue(new Blob(['video']))
+  } as any;
+}
+
+function formFiles(init: RequestInit | undefined): string[] {
+  return (init!.body as FormData).getAll('files').map(file => (file as File).name);
+}
+
+describe('ServerEncoder', () => {
+  let serverEncoder: ServerEncoder;
+  let mockFiles: File[];
+
+  beforeEach(() => {
+    serverEncoder = ServerEncoder.getInstance();
+    mockFetch.mockReset();
+
+    mockFiles = [
+      new File(['frame1'], 'frame001.png', { type: 'image/png' }),
+      new File(['frame2'], 'frame002.png', { type: 'image/png' })
+    ];
+    mockFiles.forEach(file => {
+      (file as any).arrayBuffer = jest.fn().mockResolvedValue(
+        new Uint8Array(Array.from(file.name, c => c.charCodeAt(0))).buffer
+      );
+    });
+
+    // One digest byte per frame: frame001.png -> '31', frame002.png -> '32'
+    Object.defineProperty(window, 'crypto', {
+      configurable: true,
+      value: {
+        subtle: {
+          digest: jest.fn(async (_algorithm: string, data: ArrayBuffer) => {
+            const bytes = new Uint8Array(data);
+            return new Uint8Array([bytes[bytes.length - 5]]).buffer;
+          })
+        }
+      }
+    });
+  });
+
+  describe('Codec routing', () => {
+    it('should handle only server codecs', () => {
+      SERVER_CODECS.forEach(codec => expect(serverEncoder.handles(codec)).toBe(true));
+      expect(serverEncoder.handles('vp9')).toBe(false);
+    });
+  });
+
+  describe('Hash-first upload', () => {
+    it('should send only the frames the server is missing', async () => {
+      mockFetch
+        .mockResolvedValueOnce(jsonResponse({ missing: ['32'] }))
+        .mockResolvedValueOnce(jsonResponse({ job_id: 'job-1' }));
+
+      await expect(serverEncoder.upload(mockFiles)).resolves.toBe('job-1');
+
+      expect(mockFetch.mock.calls[0][0]).toBe('/upload/check');
+      expect(JSON.parse(mockFetch.mock.calls[0][1]!.body as string)).toEqual({ digests: ['31', '32'] });
+
+      const uploadInit = mockFetch.mock.calls[1][1];
+      expect(JSON.parse((uploadInit!.body as FormData).get('manifest') as string)).toEqual([
+        { name: 'frame001.png', digest: '31' },
+        { name: 'frame002.png', digest: '32' }
+      ]);
+      expect(formFiles(uploadInit)).toEqual(['frame002.png']);
+    });
+
+    it('should fall back to a full upload when frames were evicted', async () => {
+      mockFetch
+        .mockResolvedValueOnce(jsonResponse({ missing: [] }))
+        .mockResolvedValueOnce(jsonResponse({ error: 'Frames expired' }, 409))
+        .mockResolvedValueOnce(jsonResponse({ job_id: 'job-2' }));
+
+      await expect(serverEncoder.upload(mockFiles)).resolves.toBe('job-2');
+      expect(formFiles(mockFetch.mock.calls[2][1])).toEqual(['frame001.png', 'frame002.png']);
+    });
+
+    it('should report upload errors from the server', async () => {
+      mockFetch
+        .mockResolvedValueOnce(jsonResponse({ missing: ['31', '32'] }))
+        .mockResolvedValueOnce(jsonResponse({ error: 'Too many files' }, 400));
+
+      await expect(serverEncoder.upload(mockFiles)).rejects.toThrow(AppError);
+    });
+  });
+
+  describe('Encoding', () => {
+    it('should upload, process, poll and download', async () => {
+      mockFetch
+        .mockResolvedValueOnce(jsonResponse({ missing: ['31', '32'] }))
+        .mockResolvedValueOnce(jsonResponse({ job_id: 'job-3' }))
+        .mockResolvedValueOnce(jsonResponse({ status: 'processing' }))
+        .mockResolvedValueOnce(jsonResponse({ status: 'completed', progress: 100 }))
+        .mockResolvedValueOnce(jsonResponse({}));
+      const onProgress = jest.fn();
+
+      const blob = await serverEncoder.processFiles(
+        mockFiles, { fps: 24, codec: 'webp', quality: 'good', outputFormat: 'webp' }, onProgress
+      );
+
+      expect(blob).toBeInstanceOf(Blob);
+      expect(mockFetch.mock.calls.map(call => call[0])).toEqual([
+        '/upload/check', '/upload', '/process/job-3', '/status/job-3', '/download/job-3'
+      ]);
+      expect(onProgress).toHaveBeenCalledWith(100);
+    });
+
+    it('should fail with the server error', async () => {
+      mockFetch
+        .mockResolvedValueOnce(jsonResponse({ missing: ['31', '32'] }))
+        .mockResolvedValueOnce(jsonResponse({ job_id: 'job-4' }))
+        .mockResolvedValueOnce(jsonResponse({ status: 'processing' }))
+        .mockResolvedValueOnce(jsonResponse({ status: 'failed', progress: 0, error: 'FFmpeg processing failed' }));
+
+      await expect(serverEncoder.processFiles(
+        mockFiles, { fps: 24, codec: 'apng', quality: 'good', outputFormat: 'apng' }
+      )).rejects.toThrow('FFmpeg processing failed');
+    });
+
+    it('should encode chunked jobs through parallel chunk requests', async () => {
+      let chunkCalls = 0;
+      mockFetch.mockImplementation(async (input: RequestInfo | URL) => {
+        switch (input) {
+          case '/upload/check':
+            return jsonResponse({ missing: ['31', '32'] });
+          case '/upload':
+            return jsonResponse({ job_id: 'job-5' });
+          case '/process/job-5':
+            return jsonResponse({ status: 'queued', chunks: 3, chunk_url: '/process/job-5/chunk' });
+          case '/process/job-5/chunk':
+            chunkCalls++;
+            return jsonResponse({ status: chunkCalls < 3 ? 'processing' : 'completed' });
+          case '/status/job-5':
+            return jsonResponse(chunkCalls < 3
+              ? { status: 'processing', progress: 50 }
+              : { status: 'completed', progress: 100 });
+          default:
+            return jsonResponse({});
+        }
+      });
+
+      await expect(serverEncoder.processFiles(
+        mockFiles, { fps: 24, codec: 'qtrle', quality: 'good', outputFormat: 'mov' }
+      )).resolves.toBeInstanceOf(Blob);
+      expect(chunkCalls).toBeGreaterThanOrEqual(3);
+    });
+  });
+});
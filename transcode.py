@@ -0,0 +1,164 @@
+"""
+Transcoding
+Converts an existing transparent video to another codec or container without
+going through PNGs: a stream copy when the source stream already fits the
+target, otherwise a single decode straight into the target codec's encoder
+"""
+
+import json
+import re
+import subprocess
+from fractions import Fraction
+from typing import Any, Dict, List, Optional, Tuple
+
+from encoding_profiles import (DEFAULT_QUALITY, build_codec_args, normalize_codec, output_extension,
+                               stacked_alpha_layout)
+
+# Decoders that keep the alpha plane (FFmpeg's native VP8/VP9 decoders drop it)
+ALPHA_DECODERS = {'vp9': 'libvpx-vp9', 'vp8': 'libvpx'}
+
+# ffprobe codec_name of the stream each registry codec writes. Codecs without
+# an entry (WebP has no animated decoder, stacked H.264 can't be told apart
+# from plain H.264) are always re-encoded.
+SOURCE_CODECS = {
+    'vp9': 'vp9',
+    'vp8': 'vp8',
+    'prores_ks': 'prores',
+    'qtrle': 'qtrle',
+    'png': 'png',
+    'ffv1': 'ffv1',
+    'gif': 'gif',
+    'apng': 'apng',
+}
+
+# Containers each codec can be written to; the first is the default
+CODEC_CONTAINERS = {
+    'vp9': ('webm', 'mkv'),
+    'vp8': ('webm', 'mkv'),
+    'prores_ks': ('mov', 'mkv'),
+    'qtrle': ('mov', 'mkv'),
+    'png': ('mov', 'mkv'),
+    'ffv1': ('mkv',),
+    'h264_stacked': ('mp4', 'mov'),
+    'gif': ('gif',),
+    'webp': ('webp',),
+    'webp_lossless': ('webp',),
+    'apng': ('apng',),
+}
+
+# Uploaded files accepted as transcode sources
+SOURCE_EXTENSIONS = {'mov', 'webm', 'mkv', 'mp4', 'gif', 'apng'}
+
+# Pixel formats that carry an alpha channel (pal8: GIF/APNG palettes with a
+# transparent entry)
+_ALPHA_PIX_FMT = re.compile(r'^(yuva|rgba|bgra|argb|abgr|gbrap|ya\d|pal8)')
+
+# One-pass GIF: the palette is generated and applied in the same filter graph
+GIF_FILTER = (
+    'scale=640:-1:flags=lanczos,split[a][b];'
+    '[a]palettegen=stats_mode=diff:transparency_color=ffffff[p];'
+    '[b][p]paletteuse=dither=bayer:bayer_scale=5:diff_mode=rectangle'
+)
+
+
+def _frame_rate(stream: Dict[str, Any]) -> Optional[Fraction]:
+    for key in ('avg_frame_rate', 'r_frame_rate'):
+        rate = stream.get(key) or '0/0'
+        if rate not in ('0/0', '0/1'):
+            return Fraction(rate)
+    return None
+
+
+def probe_source(path: str, timeout: int = 30) -> Dict[str, Any]:
+    """
+    Describe a video's first stream with ffprobe
+
+    Returns codec, pix_fmt, width, height, fps (float or None), duration
+    (seconds or None), container (ffprobe format names) and has_alpha.
+    Raises ValueError if the file has no readable video stream.
+    """
+    cmd = [
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'stream=codec_name,pix_fmt,width,height,r_frame_rate,avg_frame_rate'
+                         ':stream_tags=alpha_mode:format=format_name,duration',
+        '-of', 'json', path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    try:
+        info = json.loads(result.stdout or '{}')
+    except ValueError:
+        info = {}
+    if result.returncode != 0 or not info.get('streams'):
+        raise ValueError('No readable video stream found')
+
+    stream = info['streams'][0]
+    pix_fmt = stream.get('pix_fmt') or ''
+    # VP8/VP9 keep alpha in a side stream flagged by the alpha_mode tag
+    tags = {key.lower(): value for key, value in (stream.get('tags') or {}).items()}
+    fps = _frame_rate(stream)
+    duration = info.get('format', {}).get('duration')
+    return {
+        'codec': stream.get('codec_name'),
+        'pix_fmt': pix_fmt,
+        'width': stream.get('width'),
+        'height': stream.get('height'),
+        'fps': float(fps) if fps else None,
+        'duration': float(duration) if duration not in (None, 'N/A') else None,
+        'container': info.get('format', {}).get('format_name'),
+        'has_alpha': bool(_ALPHA_PIX_FMT.match(pix_fmt)) or str(tags.get('alpha_mode')) == '1',
+    }
+
+
+def target_containers(codec: str) -> Tuple[str, ...]:
+    """Containers a registry codec can be transcoded into (default first)"""
+    codec = normalize_codec(codec)
+    return CODEC_CONTAINERS.get(codec, (output_extension(codec),))
+
+
+def can_stream_copy(source: Dict[str, Any], codec: str, container: str) -> bool:
+    """Whether the source stream can be remuxed as-is into codec/container"""
+    codec = normalize_codec(codec)
+    return (SOURCE_CODECS.get(codec) is not None and source.get('codec') == SOURCE_CODECS[codec]
+            and container in target_containers(codec))
+
+
+def plan_transcode(source: Dict[str, Any], codec: str, quality: Optional[str] = DEFAULT_QUALITY,
+                   container: Optional[str] = None, reencode: bool = False) -> Dict[str, Any]:
+    """
+    Decide how to turn a probed source into codec (optionally in container)
+
+    Returns {'mode': 'copy' or 'encode', 'codec', 'container',
+    'input_args', 'output_args'} plus 'alpha_layout' for stacked H.264.
+    The source is stream-copied when its codec already matches the target
+    (unless reencode is set), so the quality tier only applies to encodes.
+    Raises ValueError for containers the codec can't be written to.
+    """
+    codec = normalize_codec(codec)
+    containers = target_containers(codec)
+    container = (container or containers[0]).lower().lstrip('.')
+    if container not in containers:
+        raise ValueError(f"{codec} can be written to {', '.join(containers)}, not {container}")
+
+    plan: Dict[str, Any] = {'codec': codec, 'container': container}
+    if not reencode and can_stream_copy(source, codec, container):
+        plan.update(mode='copy', input_args=[], output_args=['-map', '0:v:0', '-c:v', 'copy'])
+        return plan
+
+    decoder = ALPHA_DECODERS.get(source.get('codec'))
+    plan.update(mode='encode', input_args=['-c:v', decoder] if decoder else [])
+    if codec == 'gif':
+        plan['output_args'] = ['-map', '0:v:0', '-vf', GIF_FILTER, '-gifflags', '+transdiff']
+        return plan
+
+    width, height = source.get('width'), source.get('height')
+    plan['output_args'] = ['-map', '0:v:0'] + build_codec_args(codec, quality, width, height,
+                                                               source.get('has_alpha', True))
+    if codec == 'h264_stacked':
+        plan['alpha_layout'] = stacked_alpha_layout(width, height)
+    return plan
+
+
+def transcode_command(input_file: str, output_file: str, plan: Dict[str, Any]) -> List[str]:
+    """FFmpeg command carrying out a plan (video stream only; audio and data streams are dropped)"""
+    return (['ffmpeg', '-y', '-v', 'error'] + plan['input_args'] + ['-i', input_file]
+            + plan['output_args'] + [output_file])